@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from examples import gemini_client
+from examples.mock_gemini_server import MockGeminiServer
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: OFFLINE BENCHMARK SUITE
+# -------------------------------------------------------------------------
+# Runs every capability against the local mock server and reports
+# throughput, p50/p95/p99 latency, bytes uploaded and response parse time.
+# Results are written as JSON and can be compared against a previous run:
+#
+#   python benchmarks/run_benchmarks.py --output baseline.json
+#   python benchmarks/run_benchmarks.py --compare baseline.json --threshold 0.15
+#
+# The compare step exits with status 1 if any metric regressed by more than
+# the threshold, so it can gate CI.
+# -------------------------------------------------------------------------
+
+PERCEPTION_PROMPT = """
+Detect all robots. Return bounding boxes as a JSON array with labels.
+Format: [{"box_2d": [ymin, xmin, ymax, xmax], "label": "label"}] normalized to 0-1000.
+"""
+
+CANNED_RESPONSES = [
+    ("JSON Plan:", '```json\n[{"action": "move_to", "target": "table"}, {"action": "find_object", "target": "apple"}, '
+                   '{"action": "pick_object", "target": "apple"}, {"action": "move_to", "target": "trash_bin"}, '
+                   '{"action": "place_object", "target": "trash_bin"}]\n```'),
+    ("safety auditor", '{"violations": [{"offset_s": 3, "rule": "2", "reason": "Human hand inside red zone"}]}'),
+    ("functionResponse", "Recycling: Plastic #5 (PP) is accepted curbside."),
+    ("recycling robot", [
+        {"functionCall": {"name": "mock_search_tool", "args": {"query": "Is #5 plastic recyclable?"}}},
+        {"functionCall": {"name": "lookup_resin_code", "args": {"code": 5}}},
+    ]),
+    ("Detect all robots", '```json\n' + json.dumps(
+        [{"box_2d": [100 + i, 100, 400 + i, 500], "label": f"robot_{i}"} for i in range(20)]) + '\n```'),
+]
+
+# (metric path, "higher"/"lower" is better, absolute change ignored as noise)
+COMPARED_METRICS = [
+    (("ops_per_s",), "higher", 0.0),
+    (("latency_ms", "p50"), "lower", 1.0),
+    (("latency_ms", "p95"), "lower", 1.0),
+    (("latency_ms", "p99"), "lower", 1.0),
+    (("bytes_per_op",), "lower", 64),
+    (("parse_ms", "mean"), "lower", 0.05),
+    (("error_rate",), "lower", 0.02),
+]
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    def register(fn):
+        SCENARIOS[name] = fn
+        return fn
+    return register
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    value = fn(*args)
+    return value, time.perf_counter() - start
+
+
+def _run_ops(op, inputs, concurrency):
+    """Runs `op` over `inputs` on a thread pool; returns [(ok, latency_s)]."""
+    def run_one(item):
+        start = time.perf_counter()
+        try:
+            ok = op(item)
+        except Exception:
+            ok = False
+        return bool(ok), time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(run_one, inputs))
+
+
+def synthetic_frame(i, size=(1920, 1080)):
+    """A camera-like JPEG: smooth gradient plus sensor noise."""
+    w, h = size
+    rng = np.random.default_rng(i)
+    gradient = np.linspace(0, 200, w, dtype=np.float32)[None, :, None] + np.zeros((h, 1, 3), dtype=np.float32)
+    frame = np.clip(gradient + rng.normal(0, 6, (h, w, 3)), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(frame).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def synthetic_video(path, seconds=60, fps=5, size=(320, 240)):
+    import cv2
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    for i in range(seconds * fps):
+        frame = np.full((size[1], size[0], 3), i % 255, dtype=np.uint8)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+@scenario("perception")
+def bench_perception(iterations, concurrency, workdir):
+    from examples.basic_spatial_query import parse_json_response
+    from examples.perception_engine import PerceptionEngine
+
+    frames = [synthetic_frame(i) for i in range(iterations)]
+    engine = PerceptionEngine(max_in_flight=concurrency, payload_options={"max_edge": 1024})
+    results = engine.run(frames, PERCEPTION_PROMPT)
+    parse_times = [_timed(parse_json_response, r.text)[1] for r in results if r.ok]
+    return [(r.ok, r.latency_s) for r in results], parse_times
+
+
+@scenario("planning")
+def bench_planning(iterations, concurrency, workdir):
+    from examples import task_decomposition
+
+    commands = [f"Find the apple on table {i} and throw it away" for i in range(iterations)]
+    ops = _run_ops(task_decomposition.plan_mission, commands, concurrency)
+    parse_times = [_timed(task_decomposition.parse_plan, CANNED_RESPONSES[0][1])[1] for _ in commands]
+    return ops, parse_times
+
+
+@scenario("tool_use")
+def bench_tool_use(iterations, concurrency, workdir):
+    from examples import tool_use_recycling
+
+    items = [f"Plastic container with symbol #{i % 7 + 1}" for i in range(iterations)]
+    def op(item):
+        decision = tool_use_recycling.run_agentic_robot(item)
+        return decision is not None and not decision.deadline_exceeded
+
+    return _run_ops(op, items, concurrency), []
+
+
+@scenario("video")
+def bench_video(iterations, concurrency, workdir):
+    from examples import video_anomaly_detection as vad
+
+    path = synthetic_video(os.path.join(workdir, "bench.mp4"))
+    window = vad.VideoWindow(0, 0.0, 20.0)
+
+    def op(_):
+        report = vad.analyze_video_safety(path, "2. No humans in Red Zone.", sample_fps=1.0,
+                                          window_s=20.0, overlap_s=5.0, max_in_flight=concurrency)
+        return report is not None and not report["failed_windows"]
+
+    # Each op already fans out over windows, so ops themselves run one at a time
+    ops = _run_ops(op, range(max(1, iterations // 10)), 1)
+    parse_times = [_timed(vad.window_violations, window, CANNED_RESPONSES[1][1])[1] for _ in range(len(ops))]
+    return ops, parse_times
+
+
+def summarize(ops, parse_times, wall_s, server_before, server_after):
+    latencies = sorted(latency for _, latency in ops)
+    parse_sorted = sorted(parse_times)
+    errors = sum(1 for ok, _ in ops if not ok)
+    uploaded = server_after["bytes_received"] - server_before["bytes_received"]
+    requests = server_after["requests"] - server_before["requests"]
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        "ops": len(ops),
+        "errors": errors,
+        "error_rate": errors / len(ops) if ops else 0.0,
+        "wall_s": round(wall_s, 3),
+        "ops_per_s": round(len(ops) / wall_s, 3) if wall_s else None,
+        "requests": requests,
+        "requests_per_s": round(requests / wall_s, 3) if wall_s else None,
+        "latency_ms": {
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else None,
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+        },
+        "bytes_uploaded": uploaded,
+        "bytes_per_op": round(uploaded / len(ops)) if ops else 0,
+        "parse_ms": {
+            "mean": ms(sum(parse_sorted) / len(parse_sorted)) if parse_sorted else None,
+            "p95": ms(percentile(parse_sorted, 95)),
+        },
+    }
+
+
+def run_suite(names, iterations, concurrency, latency_s, jitter_s, error_rate, seed=0):
+    server = MockGeminiServer(latency_s=latency_s, jitter_s=jitter_s, error_rate=error_rate,
+                              responses=CANNED_RESPONSES, seed=seed).start()
+    env_backup = {k: os.environ.get(k) for k in ("GEMINI_API_KEY", "GEMINI_BASE_URL")}
+    os.environ["GEMINI_API_KEY"] = "mock-benchmark"
+    os.environ["GEMINI_BASE_URL"] = server.base_url
+    gemini_client.reset_client()
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "iterations": iterations,
+            "concurrency": concurrency,
+            "mock": {"latency_s": latency_s, "jitter_s": jitter_s, "error_rate": error_rate, "seed": seed},
+        },
+        "scenarios": {},
+    }
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            for name in names:
+                before = server.stats()
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    ops, parse_times = SCENARIOS[name](iterations, concurrency, workdir)
+                wall_s = time.perf_counter() - start
+                results["scenarios"][name] = summarize(ops, parse_times, wall_s, before, server.stats())
+    finally:
+        server.stop()
+        gemini_client.reset_client()
+        for key, value in env_backup.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    return results
+
+
+def _get(metrics, path):
+    for key in path:
+        if not isinstance(metrics, dict):
+            return None
+        metrics = metrics.get(key)
+    return metrics
+
+
+def compare_results(baseline, current, threshold=0.15):
+    """
+    Returns a list of human-readable regressions: metrics that got worse by
+    more than `threshold` (relative) and more than the metric's noise floor.
+    """
+    regressions = []
+    for name, metrics in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        for path, better, noise_floor in COMPARED_METRICS:
+            old, new = _get(base, path), _get(metrics, path)
+            if old is None or new is None:
+                continue
+            delta = new - old if better == "lower" else old - new
+            if delta <= noise_floor:
+                continue
+            relative = delta / abs(old) if old else float("inf")
+            if relative > threshold:
+                regressions.append(f"{name}.{'.'.join(path)}: {old} -> {new} ({relative:+.0%} worse)")
+    return regressions
+
+
+def print_table(results):
+    print("\n📊 Benchmark Results (mock server):")
+    print("-" * 100)
+    print(f"  {'scenario':<12}{'ops/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'KB/op':>10}{'parse ms':>10}{'errors':>8}{'reqs':>8}")
+    for name, m in results["scenarios"].items():
+        lat = m["latency_ms"]
+        parse = m["parse_ms"]["mean"]
+        print(f"  {name:<12}{m['ops_per_s'] or 0:>9.2f}{lat['p50'] or 0:>10.1f}{lat['p95'] or 0:>10.1f}"
+              f"{lat['p99'] or 0:>10.1f}{m['bytes_per_op'] / 1024:>10.1f}"
+              f"{(parse if parse is not None else 0):>10.3f}{m['errors']:>8}{m['requests']:>8}")
+    print("-" * 100)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks against a local mock Gemini server.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset to run")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock base latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="mock extra uniform latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    results = run_suite(names, args.iterations, args.concurrency, args.latency, args.jitter,
+                        args.error_rate, args.seed)
+    print_table(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Saved results to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, results, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"   - {line}")
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.threshold:.0%} versus {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: CLI COLD-START BENCHMARK
+# -------------------------------------------------------------------------
+# Measures how long `import cli` takes in a fresh interpreter, for the
+# current tree and optionally for an older git revision, e.g.:
+#
+#   python benchmarks/startup_benchmark.py --baseline-ref HEAD~1
+#
+# Each sample is a new process, so nothing is warm except the OS file cache.
+# -------------------------------------------------------------------------
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+TIMER_SNIPPET = (
+    "import time, sys; sys.path.insert(0, '.'); t = time.perf_counter(); "
+    "import cli; print(time.perf_counter() - t)"
+)
+
+
+def time_import(tree, env, runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", TIMER_SNIPPET],
+            cwd=tree, env=env, capture_output=True, text=True, check=True,
+        )
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def export_ref(ref, dest):
+    """Extracts the tree at git `ref` into `dest` without touching the worktree."""
+    archive = subprocess.run(["git", "archive", "--format=tar", ref], cwd=REPO_ROOT,
+                             capture_output=True, check=True).stdout
+    tar_path = os.path.join(dest, "tree.tar")
+    with open(tar_path, "wb") as f:
+        f.write(archive)
+    with tarfile.open(tar_path) as tar:
+        tar.extractall(dest)
+    os.remove(tar_path)
+    return dest
+
+
+def describe(label, samples):
+    return {
+        "label": label,
+        "runs": len(samples),
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CLI cold-start import time.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--baseline-ref", help="git revision to compare against, e.g. HEAD~1")
+    args = parser.parse_args()
+
+    # A dummy key exercises the client-construction path that used to run at import
+    env = dict(os.environ, GEMINI_API_KEY=os.environ.get("GEMINI_API_KEY", "benchmark-dummy-key"))
+
+    results = [describe("current", time_import(REPO_ROOT, env, args.runs))]
+    if args.baseline_ref:
+        with tempfile.TemporaryDirectory() as tmp:
+            tree = export_ref(args.baseline_ref, tmp)
+            results.insert(0, describe(args.baseline_ref, time_import(tree, env, args.runs)))
+
+    print("\n🚀 CLI cold start (`import cli`):")
+    print("--------------------------------------------------")
+    for r in results:
+        print(f"  {r['label']:<20} median {r['median_ms']:8.1f} ms   min {r['min_ms']:8.1f} ms   ({r['runs']} runs)")
+    print("--------------------------------------------------")
+    if len(results) == 2 and results[1]["median_ms"]:
+        print(f"  Speedup: {results[0]['median_ms'] / results[1]['median_ms']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 
 #!/usr/bin/env python3
+import importlib
 import os
 import sys
 import time
@@ -14,20 +15,19 @@ import questionary
 # Ensure strict pathing for relative imports if run from root
 sys.path.append(os.path.join(os.path.dirname(__file__), 'examples'))
 
-try:
-    from examples import basic_spatial_query
-    from examples import task_decomposition
-    from examples import tool_use_recycling
-    from examples import video_anomaly_detection
-except ImportError as e:
-    # If package import fails, try direct import (context dependent)
+def load_capability(name):
+    """
+    Imports an example module on first selection. Importing the google-genai
+    SDK dominates startup time, so the menu appears before any of it loads.
+    """
     try:
-        import basic_spatial_query
-        import task_decomposition
-        import tool_use_recycling
-        import video_anomaly_detection
-    except ImportError:
-        pass # Will handle later or assuming run from root with python -m
+        return importlib.import_module(f"examples.{name}")
+    except ModuleNotFoundError as e:
+        # Only a missing examples package falls back to a direct import (context
+        # dependent); a dependency missing inside the module is reported as is
+        if e.name not in ("examples", f"examples.{name}"):
+            raise
+        return importlib.import_module(name)
 
 load_dotenv()
 console = Console()
@@ -63,6 +63,14 @@ def main():
 
     check_api_key()
 
+    metrics_port = os.getenv("GEMINI_METRICS_PORT")
+    if metrics_port:
+        instrumentation = load_capability("instrumentation")
+        scheduler = load_capability("scheduler")
+        server = instrumentation.get_telemetry().serve_metrics(
+            port=int(metrics_port), extra_sources=[scheduler.get_scheduler().prometheus_text])
+        rprint(f"[dim]📈 Prometheus metrics at {server.url}[/dim]")
+
     while True:
         try:
             choice = questionary.select(
@@ -72,7 +80,8 @@ def main():
                     "2. 🧠  Brain & Planning (Task Decomposition)",
                     "3. 🛠️  Agentic Capabilities (Tool Use)",
                     "4. 🛡️  Safety & Auditing (Video Analysis)",
-                    "5. Exit"
+                    "5. 📊  Telemetry Dashboard (Live)",
+                    "6. Exit"
                 ]
             ).ask()
         except KeyboardInterrupt:
@@ -118,6 +127,7 @@ def main():
                     default="Detect all humans and specific robot models (e.g. Unitree, Tesla) and return bounding boxes."
                 ).ask()
 
+                basic_spatial_query = load_capability("basic_spatial_query")
                 basic_spatial_query.robot_perception_query(
                     image_path, 
                     f"""{user_prompt}
@@ -131,22 +141,30 @@ def main():
         elif "Planning" in choice:
             rprint("[italic]Running: examples/task_decomposition.py[/italic]")
             command = Prompt.ask("Enter a robot command", default="Find the apple on the kitchen table and throw it away")
+            task_decomposition = load_capability("task_decomposition")
             task_decomposition.plan_mission(command)
             rprint("\n[bold green]✅ Planning Demo Complete[/bold green]")
 
         elif "Agentic" in choice:
             rprint("[italic]Running: examples/tool_use_recycling.py[/italic]")
             item = Prompt.ask("What object does the robot see?", default="Plastic container with symbol #5")
+            tool_use_recycling = load_capability("tool_use_recycling")
             tool_use_recycling.run_agentic_robot(item)
             rprint("\n[bold green]✅ Agentic Demo Complete[/bold green]")
 
         elif "Safety" in choice:
             rprint("[italic]Running: examples/video_anomaly_detection.py[/italic]")
+            video_anomaly_detection = load_capability("video_anomaly_detection")
             video_anomaly_detection.analyze_video_safety(
                 "robot_incident_log_001.mp4",
                 "1. Max speed 0.5m/s. 2. No humans in Red Zone. 3. Grip securely."
             )
             rprint("\n[bold green]✅ Safety Demo Complete[/bold green]")
+
+        elif "Telemetry" in choice:
+            rprint("[italic]Per-call latency spans, tokens and upload size for this session. Press Ctrl+C to stop.[/italic]")
+            instrumentation = load_capability("instrumentation")
+            instrumentation.live_dashboard(console=console)
         
         input("\nPress Enter to return to menu...")
         console.clear()
@@ -1,8 +1,26 @@
-from google import genai
 from google.genai import types
 import os
+import time
 from PIL import Image
-from dotenv import load_dotenv
+
+try:
+    from examples.gemini_client import get_client
+    from examples.response_cache import make_key
+    from examples.image_payload import optimize_image, sniff_mime
+    from examples.overlay import render_detections
+    from examples.streaming import stream_items
+    from examples.instrumentation import get_telemetry
+    from examples.scheduler import get_scheduler
+    from examples.thinking_budget import classify_prompt, thinking_tokens
+except ImportError:
+    from gemini_client import get_client
+    from response_cache import make_key
+    from image_payload import optimize_image, sniff_mime
+    from overlay import render_detections
+    from streaming import stream_items
+    from instrumentation import get_telemetry
+    from scheduler import get_scheduler
+    from thinking_budget import classify_prompt, thinking_tokens
 
 # -------------------------------------------------------------------------
 # GEMINI ROBOTICS: BASIC SPATIAL QUERY
@@ -11,124 +29,212 @@ from dotenv import load_dotenv
 # 2D coordinates of objects in a scene, simulating a "perception" step.
 # -------------------------------------------------------------------------
 
-# 1. SETUP
-load_dotenv()
-api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
-    # Try looking for it in the environment variable if .env fails
-    api_key = os.environ.get("GEMINI_API_KEY")
-
-if not api_key:
-    print("⚠️ Warning: GEMINI_API_KEY not found. Please set it in .env or environment.")
-    # For demo purposes, we might proceed but it will fail on the API call
-else:
-    print("✅ API Key loaded.")
-
-# 2. CLIENT CONFIGURATION
-# We use the new google.genai client for gemini-robotics-er-1.5-preview
-try:
-    client = genai.Client(api_key=api_key)
-except Exception as e:
-    print(f"Error initializing client: {e}")
-    client = None
+# 1. SETUP & CLIENT CONFIGURATION
+# The google.genai client for gemini-robotics-er-1.5-preview is created lazily
+# on first use and shared by every capability (see gemini_client.py).
 
-def robot_perception_query(image_path, prompt_text):
+MODEL_ID = "gemini-robotics-er-1.5-preview"
+
+def robot_perception_query(image_path, prompt_text, cache=None, optimize=True,
+                           max_edge=1024, image_format="JPEG", quality=85, gate=None,
+                           budget_controller=None, deadline_s=None, store=None, stamp=None, robot_id=None):
+    """
+    Runs a spatial query on one image and draws the result.
+    With `optimize`, the image is downsized to `max_edge` and re-encoded in
+    memory before upload (see image_payload.py).
+    Pass a `response_cache.ResponseCache` as `cache` to reuse answers for
+    identical image bytes + prompt + config. Pass a `frame_gate.FrameGate`
+    as `gate` to skip the call when the frame barely differs from the last
+    one analyzed. Pass a `thinking_budget.ThinkingBudgetController` as
+    `budget_controller` to pick the thinking budget per call (falling back
+    to 0 when `deadline_s` is too tight). Pass a
+    `detection_store.DetectionStore` as `store` to log the detections for
+    later replay at the frame's `stamp` (epoch seconds, default: when the
+    image was read) under `robot_id` (default: the current
+    `scheduler.robot_scope`). Returns the response text.
+    """
     print(f"🤖 Robot: analyzing {image_path}...")
     
     if not os.path.exists(image_path):
         print(f"❌ Error: Image file '{image_path}' not found.")
         return
 
+    if gate is not None:
+        decision = gate.check(image_path)
+        if not decision.send:
+            print(f"♻️  Frame unchanged (change {decision.score:.3f} < {gate.threshold}), reusing previous detections.")
+            return gate.record_skipped()
+
     # Load image bytes for the new API
     with open(image_path, 'rb') as f:
         image_bytes = f.read()
+    stamp = time.time() if stamp is None else stamp
+
+    budget = None
+    if budget_controller is not None:
+        budget = budget_controller.choose(classify_prompt(prompt_text), deadline_s)
+
+    config = types.GenerateContentConfig(
+        temperature=0.5,
+        # Thinking is supported in ER 1.5, good for reasoning
+        thinking_config=types.ThinkingConfig(thinking_budget=budget.budget if budget else 1024) 
+    )
+
+    payload_options = {"max_edge": max_edge, "image_format": image_format, "quality": quality} if optimize else None
+
+    cache_key = None
+    response_text = None
+    if cache is not None:
+        # Keyed on the original bytes so a hit skips re-encoding too
+        cache_key = make_key(MODEL_ID, prompt_text, image_bytes, config, extra=payload_options)
+        response_text = cache.get(cache_key)
+        if response_text is not None:
+            print("⚡ Cache hit: reusing previous response.")
 
     # 3. SPATIAL PROMPT
+    model_latency_s = None
     try:
-        response = client.models.generate_content(
-            model="gemini-robotics-er-1.5-preview",
-            contents=[
-                types.Part.from_bytes(
-                    data=image_bytes,
-                    mime_type='image/jpeg', # Adjust mime type if needed
-                ),
-                prompt_text
-            ],
+        with get_telemetry().trace("perception", model=MODEL_ID) as call:
+            if response_text is None:
+                with call.span("encode"):
+                    if optimize:
+                        payload = optimize_image(image_bytes, **payload_options)
+                        upload_bytes, mime_type = payload.data, payload.mime_type
+                    else:
+                        upload_bytes, mime_type = image_bytes, sniff_mime(image_bytes) or 'image/jpeg'
+                if optimize:
+                    print(payload.report())
+
+                client = get_client()
+                if client is None:
+                    print("❌ Error: No Gemini client available. Check GEMINI_API_KEY.")
+                    call.fail("No Gemini client available")
+                    return
+                call.add_bytes(len(upload_bytes) + len(prompt_text.encode("utf-8")))
+                response = get_scheduler().call(
+                    lambda: client.models.generate_content(
+                        model=MODEL_ID,
+                        contents=[
+                            types.Part.from_bytes(
+                                data=upload_bytes,
+                                mime_type=mime_type,
+                            ),
+                            prompt_text
+                        ],
+                        config=config
+                    ),
+                    "perception",
+                    trace=call,
+                )
+                # Time queued behind other capabilities is not model latency
+                model_latency_s = call.record.spans["model"]
+                call.record_usage(response)
+                response_text = response.text
+                if cache is not None and response_text:
+                    cache.put(cache_key, response_text)
+            else:
+                call.set(cache="response")
+
+            print("\n🔍 Gemini Perception Output:")
+            print("--------------------------------------------------")
+            print(response_text)
+            print("--------------------------------------------------")
+
+            if gate is not None:
+                gate.record_sent(response_text)
+
+            with call.span("parse"):
+                detections = parse_json_response(response_text)
+            if budget is not None and model_latency_s is not None:
+                call.set(thinking_budget=budget.budget)
+                budget_controller.record(budget, model_latency_s, valid=isinstance(detections, list),
+                                         thinking_tokens=thinking_tokens(response))
+            if store is not None and isinstance(detections, list):
+                store.append(detections, t=stamp, robot_id=robot_id)
+            with call.span("render"):
+                visualize_results(image_path, response_text, detections=detections)
+            return response_text
+
+    except Exception as e:
+        print(f"❌ API Error: {e}")
+
+def robot_perception_query_stream(image_path, prompt_text, stats=None, optimize=True,
+                                  max_edge=1024, image_format="JPEG", quality=85):
+    """
+    Streaming variant of `robot_perception_query`: yields each detection
+    dict as soon as it is complete instead of waiting for the full response.
+    Pass a `streaming.StreamStats` to read time-to-first-item and total latency.
+    """
+    with open(image_path, 'rb') as f:
+        image_bytes = f.read()
+
+    with get_telemetry().trace("perception", model=MODEL_ID, streaming=True) as call:
+        with call.span("encode"):
+            if optimize:
+                payload = optimize_image(image_bytes, max_edge=max_edge, image_format=image_format, quality=quality)
+                upload_bytes, mime_type = payload.data, payload.mime_type
+            else:
+                upload_bytes, mime_type = image_bytes, sniff_mime(image_bytes) or 'image/jpeg'
+        call.add_bytes(len(upload_bytes) + len(prompt_text.encode("utf-8")))
+
+        yield from stream_items(
+            get_client(),
+            MODEL_ID,
+            contents=[types.Part.from_bytes(data=upload_bytes, mime_type=mime_type), prompt_text],
             config=types.GenerateContentConfig(
                 temperature=0.5,
-                # Thinking is supported in ER 1.5, good for reasoning
-                thinking_config=types.ThinkingConfig(thinking_budget=1024) 
-            )
+                thinking_config=types.ThinkingConfig(thinking_budget=1024)
+            ),
+            stats=stats,
+            trace=call,
         )
-        
-        print("\n🔍 Gemini Perception Output:")
-        print("--------------------------------------------------")
-        print(response.text)
-        print("--------------------------------------------------")
-        
-        visualize_results(image_path, response.text)
-        
-    except Exception as e:
-        print(f"❌ API Error: {e}")
 
-def visualize_results(image_path, response_text):
+def parse_json_response(response_text):
+    """
+    Extracts the JSON payload from a model response.
+    Handles both ```json fenced blocks and raw JSON. Returns None if unparseable.
+    """
+    import json
+    import re
+
+    # 1. Cleaner: Extract JSON block if it's wrapped in markdown
+    json_match = re.search(r'```json\s*(.*?)\s*```', response_text, re.DOTALL)
+    try:
+        if json_match:
+            return json.loads(json_match.group(1))
+        # Try raw parsing if no markdown code blocks
+        return json.loads(response_text)
+    except (TypeError, ValueError):
+        return None
+
+def visualize_results(image_path, response_text, output_path="output_perception.jpg", detections=None):
     """
     Parses the JSON output from Gemini and draws it on the image.
     Assumes format: [{'point': [y, x], 'label': 'name'}] normalized 0-1000
     or [{'box_2d': [ymin, xmin, ymax, xmax], 'label': 'name'}]
+    `image_path` may also be an already-decoded PIL image or array. Set
+    `output_path=None` to skip writing; the annotated image is returned.
+    Pass already parsed `detections` to skip parsing `response_text`.
     """
     try:
-        from PIL import ImageDraw
-        import json
-        import re
-        
-        # 1. Cleaner: Extract JSON block if it's wrapped in markdown
-        json_match = re.search(r'```json\s*(.*?)\s*```', response_text, re.DOTALL)
-        if json_match:
-            data = json.loads(json_match.group(1))
-        else:
-            # Try raw parsing if no markdown code blocks
-            try:
-                data = json.loads(response_text)
-            except:
-                print("⚠️ Could not parse JSON directly.")
-                return
-            
+        data = detections if detections is not None else parse_json_response(response_text)
+        if data is None:
+            print("⚠️ Could not parse JSON directly.")
+            return
+
         if not isinstance(data, list):
             print("⚠️ Response was not a list, skipping visualization.")
             return
 
-        img = Image.open(image_path)
-        draw = ImageDraw.Draw(img)
-        width, height = img.size
-        
-        print(f"\n🎨 Drawing {len(data)} detected items on 'output_perception.jpg'...")
-        
-        for item in data:
-            # Handle Point
-            if 'point' in item:
-                y, x = item['point']
-                pixel_x = int((x / 1000) * width)
-                pixel_y = int((y / 1000) * height)
-                r = 10
-                draw.ellipse((pixel_x-r, pixel_y-r, pixel_x+r, pixel_y+r), fill='red', outline='white', width=2)
-                if 'label' in item:
-                    draw.text((pixel_x + 15, pixel_y - 10), item['label'], fill="white")
-            
-            # Handle Bounding Box
-            elif 'box_2d' in item:
-                ymin, xmin, ymax, xmax = item['box_2d']
-                pixel_xmin = int((xmin / 1000) * width)
-                pixel_xmax = int((xmax / 1000) * width)
-                pixel_ymin = int((ymin / 1000) * height)
-                pixel_ymax = int((ymax / 1000) * height)
-                
-                draw.rectangle([pixel_xmin, pixel_ymin, pixel_xmax, pixel_ymax], outline='red', width=3)
-                if 'label' in item:
-                    draw.text((pixel_xmin, pixel_ymin - 15), item['label'], fill="red")
-
-        img.save("output_perception.jpg")
-        print("✅ Saved visualization to: output_perception.jpg")
+        # Paths are opened with EXIF orientation applied exactly as the
+        # uploaded payload was, so normalized coordinates land on the same pixels
+        print(f"\n🎨 Drawing {len(data)} detected items" + (f" on '{output_path}'..." if output_path else "..."))
+        img = render_detections(image_path, data)
+
+        if output_path:
+            img.save(output_path)
+            print(f"✅ Saved visualization to: {output_path}")
+        return img
         
     except Exception as e:
         print(f"⚠️ Could not visualize results: {e}")
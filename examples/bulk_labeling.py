@@ -0,0 +1,279 @@
+from google.genai import types
+import json
+import os
+import random
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+import multiprocessing
+
+try:
+    from examples import gemini_client
+    from examples.basic_spatial_query import MODEL_ID, parse_json_response
+    from examples.image_payload import optimize_image, sniff_mime
+    from examples import scheduler
+except ImportError:
+    import gemini_client
+    from basic_spatial_query import MODEL_ID, parse_json_response
+    from image_payload import optimize_image, sniff_mime
+    import scheduler
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: BULK LABELING JOBS
+# -------------------------------------------------------------------------
+# Pre-labels large image datasets with the spatial query prompt.
+#
+#   manifest.jsonl:  {"id": "cam0/000001", "image": "frames/000001.jpg", "prompt": "..."}
+#   python examples/bulk_labeling.py manifest.jsonl labels.jsonl --workers 8
+#
+# Images are labeled by a pool of worker processes; the parent is the only
+# writer of the append-only output, one JSON line per image. The output is
+# also the checkpoint: rerunning the same command skips every id already
+# in it, so a crashed job resumes exactly where it stopped. Transient API
+# errors (429/5xx, timeouts) and unparseable answers are retried with
+# jittered exponential backoff. Large jobs can be split across machines
+# with --num-shards/--shard-index.
+# -------------------------------------------------------------------------
+
+DEFAULT_LABEL_PROMPT = """Detect all humans and specific robot models (e.g. Unitree, Tesla) and return bounding boxes.
+Return bounding boxes as a JSON array with labels.
+Format: [{"box_2d": [ymin, xmin, ymax, xmax], "label": "label"}] normalized to 0-1000."""
+
+
+class TransientError(Exception):
+    pass
+
+
+@dataclass
+class JobStats:
+    total: int = 0          # manifest entries in this shard
+    skipped: int = 0        # already present in the output
+    ok: int = 0
+    failed: int = 0
+    retries: int = 0
+    elapsed_s: float = 0.0
+
+    @property
+    def processed(self):
+        return self.ok + self.failed
+
+    @property
+    def rate(self):
+        return self.processed / self.elapsed_s if self.elapsed_s else 0.0
+
+    @property
+    def eta_s(self):
+        remaining = self.total - self.skipped - self.processed
+        return remaining / self.rate if self.rate else None
+
+    def summary(self):
+        done = self.skipped + self.processed
+        eta = f"{self.eta_s:.0f}s" if self.eta_s is not None else "n/a"
+        return (f"📦 {done}/{self.total} labeled ({self.ok} ok, {self.failed} failed, {self.skipped} resumed, "
+                f"{self.retries} retries)  {self.rate:.2f} img/s  ETA {eta}")
+
+
+def record_id(entry):
+    return str(entry.get("id") or entry["image"])
+
+
+def in_shard(entry_id, shard_index, num_shards):
+    return num_shards <= 1 or zlib.crc32(entry_id.encode("utf-8")) % num_shards == shard_index
+
+
+def read_manifest(manifest_path, shard_index=0, num_shards=1):
+    """Yields manifest entries of this shard with image paths resolved against the manifest's folder."""
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                print(f"⚠️ Skipping malformed manifest line {line_no}")
+                continue
+            if not in_shard(record_id(entry), shard_index, num_shards):
+                continue
+            entry["image"] = os.path.join(base, entry["image"])
+            yield entry
+
+
+def load_checkpoint(output_path, retry_failed=False):
+    """
+    Returns the ids already written to `output_path`. A partially written
+    last line (from a crash mid-write) is cut off so appends stay valid.
+    With `retry_failed`, failed records are dropped from the file (it is
+    rewritten with the latest ok record per id) since they are about to be
+    relabeled, so the output keeps one record per id.
+    """
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+    latest, count = {}, 0
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        latest[record["id"]] = (record, line)
+        count += 1
+    if not retry_failed:
+        return set(latest)
+
+    kept = {entry_id: line for entry_id, (record, line) in latest.items() if record.get("status") == "ok"}
+    if len(kept) != count:
+        tmp = output_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.writelines(line + b"\n" for line in kept.values())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, output_path)
+    return set(kept)
+
+
+def is_transient(error):
+    return isinstance(error, TransientError) or scheduler.is_transient(error)
+
+
+def _init_worker(workers=1):
+    # Never reuse a connection pool inherited from the parent process
+    gemini_client.reset_client()
+    # Every worker admits its own calls, so each gets its share of the GEMINI_RPM/TPM budget
+    scheduler.set_scheduler(scheduler.scheduler_from_env(share=workers))
+
+
+def label_image(entry, prompt, max_attempts=4, backoff_s=1.0, payload_options=None):
+    """Labels one manifest entry. Runs in a worker process; returns the output record."""
+    start = time.perf_counter()
+    record = {"id": record_id(entry), "image": entry["image"], "status": "failed", "detections": None,
+              "error": None, "attempts": 0, "latency_s": None, "bytes_uploaded": 0, "worker": os.getpid()}
+    try:
+        with open(entry["image"], "rb") as f:
+            image_bytes = f.read()
+        if payload_options is not None:
+            payload = optimize_image(image_bytes, **payload_options)
+            data, mime_type = payload.data, payload.mime_type
+        else:
+            data, mime_type = image_bytes, sniff_mime(image_bytes) or "image/jpeg"
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        return record
+
+    config = types.GenerateContentConfig(temperature=0.5, thinking_config=types.ThinkingConfig(thinking_budget=0))
+    contents = [types.Part.from_bytes(data=data, mime_type=mime_type), entry.get("prompt") or prompt]
+    record["bytes_uploaded"] = len(data)
+
+    for attempt in range(1, max_attempts + 1):
+        record["attempts"] = attempt
+        try:
+            client = gemini_client.get_client()
+            if client is None:
+                raise RuntimeError("No Gemini client available. Check GEMINI_API_KEY.")
+            # This loop retries on its own, so the scheduler only admits
+            response = scheduler.get_scheduler().call(
+                lambda: client.models.generate_content(model=MODEL_ID, contents=contents, config=config),
+                "perception", max_attempts=1)
+            detections = parse_json_response(response.text or "")
+            if not isinstance(detections, list):
+                raise TransientError("Response was not a JSON list")
+            record.update(status="ok", detections=detections, error=None)
+            break
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            if attempt == max_attempts or not is_transient(e):
+                break
+            time.sleep(backoff_s * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+    record["latency_s"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def run_labeling_job(manifest_path, output_path, prompt=DEFAULT_LABEL_PROMPT, workers=4, max_attempts=4,
+                     backoff_s=1.0, payload_options=None, shard_index=0, num_shards=1, retry_failed=False,
+                     max_items=None, progress_every_s=5.0, fsync_every=50):
+    """
+    Labels every manifest entry of this shard that is not yet in
+    `output_path`. `max_items` stops after that many new records (smoke
+    runs). Returns JobStats.
+    """
+    done = load_checkpoint(output_path, retry_failed)
+    stats = JobStats()
+    for entry in read_manifest(manifest_path, shard_index, num_shards):
+        stats.total += 1
+        stats.skipped += record_id(entry) in done
+    todo = (e for e in read_manifest(manifest_path, shard_index, num_shards) if record_id(e) not in done)
+    if stats.skipped:
+        print(f"↩️  Resuming: {stats.skipped} of {stats.total} already labeled in {output_path}")
+
+    start = time.perf_counter()
+    last_progress = start
+    budget = max_items if max_items is not None else float("inf")
+    context = multiprocessing.get_context("spawn")
+    pending = set()
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                initargs=(workers,)) as pool:
+        try:
+            while True:
+                # Keep a few tasks queued per worker without reading the whole manifest up front
+                while len(pending) < workers * 4 and budget > 0:
+                    entry = next(todo, None)
+                    if entry is None:
+                        budget = 0
+                        break
+                    pending.add(pool.submit(label_image, entry, prompt, max_attempts, backoff_s, payload_options))
+                    budget -= 1
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record = future.result()
+                    out.write(json.dumps(record) + "\n")
+                    out.flush()
+                    stats.ok += record["status"] == "ok"
+                    stats.failed += record["status"] != "ok"
+                    stats.retries += max(0, record["attempts"] - 1)
+                    if stats.processed % fsync_every == 0:
+                        os.fsync(out.fileno())
+                stats.elapsed_s = time.perf_counter() - start
+                if progress_every_s is not None and time.perf_counter() - last_progress >= progress_every_s:
+                    last_progress = time.perf_counter()
+                    print(stats.summary())
+        finally:
+            for future in pending:
+                future.cancel()
+            out.flush()
+            os.fsync(out.fileno())
+    stats.elapsed_s = time.perf_counter() - start
+    print(stats.summary())
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Resumable bulk labeling: JSONL manifest in, JSONL labels out.")
+    parser.add_argument("manifest")
+    parser.add_argument("output")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-attempts", type=int, default=4)
+    parser.add_argument("--max-edge", type=int, default=1024, help="resize before upload (0 = send originals)")
+    parser.add_argument("--shard-index", type=int, default=0)
+    parser.add_argument("--num-shards", type=int, default=1)
+    parser.add_argument("--retry-failed", action="store_true", help="relabel entries that failed last run")
+    parser.add_argument("--max-items", type=int)
+    args = parser.parse_args()
+
+    run_labeling_job(
+        args.manifest, args.output, workers=args.workers, max_attempts=args.max_attempts,
+        payload_options={"max_edge": args.max_edge} if args.max_edge else None,
+        shard_index=args.shard_index, num_shards=args.num_shards,
+        retry_failed=args.retry_failed, max_items=args.max_items,
+    )
@@ -0,0 +1,328 @@
+from google.genai import types
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from examples.gemini_client import get_client
+    from examples.instrumentation import get_telemetry
+    from examples.scheduler import get_scheduler
+except ImportError:
+    from gemini_client import get_client
+    from instrumentation import get_telemetry
+    from scheduler import get_scheduler
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: MANAGED CONTEXT CACHE
+# -------------------------------------------------------------------------
+# Auditors ask many follow-up questions about one incident video. Sending
+# the clip with every question re-uploads and re-tokenizes minutes of
+# video each time. Instead the video is uploaded once through the Files
+# API and frozen together with the safety guidelines in a Gemini context
+# cache (cachedContents); follow-up questions only send the question.
+#
+#   cache = ContextCache(ttl_s=3600)
+#   with cache.acquire("incident.mp4", guidelines) as video:
+#       print(video.ask("When does the operator enter the red zone?"))
+#   print(cache.stats())
+#
+# Handles are refcounted: a cache in use is never deleted, idle ones are
+# reused until their TTL runs out and evicted (LRU) beyond `max_entries`.
+# An expired cache that is still leased is replaced for new acquires and
+# its upload deleted when the last lease on it is released.
+# A handle close to expiry gets its TTL extended instead of re-uploading.
+# -------------------------------------------------------------------------
+
+MODEL_ID = "gemini-robotics-er-1.5-preview"
+
+DEFAULT_TTL_S = 60 * 60
+# Extend a cache's TTL on acquire when less than this is left
+REFRESH_MARGIN_S = 5 * 60
+FILE_POLL_S = 2.0
+
+SYSTEM_PROMPT = """
+You are a robot safety auditor. The attached video is a recording of a robot
+work cell. Answer questions about it against these Safety Guidelines, citing
+timestamps as MM:SS:
+
+{guidelines}
+"""
+
+
+class CachedContext:
+    """One uploaded video + guidelines frozen in a context cache."""
+
+    def __init__(self, key, video_path, guidelines):
+        self.key = key
+        self.video_path = video_path
+        self.guidelines = guidelines
+        self.name = None           # cachedContents/...
+        self.file_name = None      # files/...
+        self.cached_tokens = 0
+        self.upload_bytes = 0
+        self.expires_at = 0.0
+        self.refcount = 0
+        self.queries = 0
+        self.error = None
+        self.stale = False         # replaced after expiry; cleaned up by the last release
+        self.ready = threading.Event()
+
+    def remaining_s(self, now):
+        return self.expires_at - now
+
+
+class ContextLease:
+    """A reference to a CachedContext; release it (or use `with`) when done."""
+
+    def __init__(self, cache, entry):
+        self.cache = cache
+        self.entry = entry
+        self.released = False
+
+    @property
+    def name(self):
+        return self.entry.name
+
+    def ask(self, question, config=None):
+        return self.cache.ask(self, question, config)
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.cache.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class ContextCache:
+    """
+    Creates and tracks context caches keyed by (video file, guidelines,
+    model). `clock` must be wall time: cache expiry is set by the server.
+    """
+
+    def __init__(self, client=None, model=MODEL_ID, ttl_s=DEFAULT_TTL_S, refresh_margin_s=REFRESH_MARGIN_S,
+                 max_entries=8, clock=time.time):
+        self.client = client
+        self.model = model
+        self.ttl_s = ttl_s
+        self.refresh_margin_s = refresh_margin_s
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.uploads = 0
+        self.refreshes = 0
+        self.queries = 0
+        self.tokens_cached = 0     # tokenized once at cache creation
+        self.cached_tokens_served = 0
+        self.prompt_tokens = 0
+        self.upload_bytes = 0
+
+    def _client(self):
+        client = self.client or get_client()
+        if client is None:
+            raise RuntimeError("No Gemini client available. Check GEMINI_API_KEY.")
+        return client
+
+    def _key(self, video_path, guidelines):
+        stat = os.stat(video_path)
+        return (os.path.realpath(video_path), stat.st_size, stat.st_mtime_ns, guidelines, self.model)
+
+    def acquire(self, video_path, guidelines):
+        """
+        Returns a ContextLease on the cache for this video and guidelines,
+        uploading and creating it on first use. Concurrent acquires of the
+        same video share one upload.
+        """
+        key = self._key(video_path, guidelines)
+        expired = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.ready.is_set() and entry.remaining_s(self.clock()) <= 0:
+                # Expired on the server; a new cache (and upload) is needed. Leases still
+                # holding the old entry keep its upload until the last one is released.
+                self._entries.pop(key)
+                if entry.refcount:
+                    entry.stale = True
+                else:
+                    expired = entry
+                entry = None
+            create = entry is None
+            if create:
+                entry = CachedContext(key, video_path, guidelines)
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+            entry.refcount += 1
+        if expired is not None:
+            self._delete_file(expired)
+
+        if create:
+            try:
+                self._create(entry)
+            except Exception as e:
+                entry.error = e
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        self._entries.pop(key)
+                raise
+            finally:
+                entry.ready.set()
+            self._evict_idle()
+        else:
+            entry.ready.wait()
+            if entry.error is not None:
+                raise entry.error
+            if entry.remaining_s(self.clock()) < self.refresh_margin_s:
+                self._refresh(entry)
+        return ContextLease(self, entry)
+
+    def release(self, lease):
+        entry = lease.entry
+        with self._lock:
+            entry.refcount -= 1
+            orphaned = entry.stale and entry.refcount == 0
+        if orphaned:
+            self._discard(entry)
+        self._evict_idle()
+
+    def _create(self, entry):
+        client = self._client()
+        with get_telemetry().trace("video", model=self.model, cache="create") as call:
+            with call.span("upload"):
+                video = client.files.upload(file=entry.video_path)
+                while video.state is not None and video.state.name == "PROCESSING":
+                    time.sleep(FILE_POLL_S)
+                    video = client.files.get(name=video.name)
+            entry.file_name = video.name
+            if video.state is not None and video.state.name == "FAILED":
+                self._delete_file(entry)
+                raise RuntimeError(f"Video processing failed for '{entry.video_path}'")
+
+            entry.upload_bytes = os.path.getsize(entry.video_path)
+            call.add_bytes(entry.upload_bytes)
+            created_at = self.clock()
+            with call.span("model"):
+                cached = client.caches.create(model=self.model, config=types.CreateCachedContentConfig(
+                    display_name=os.path.basename(entry.video_path),
+                    system_instruction=SYSTEM_PROMPT.format(guidelines=entry.guidelines),
+                    contents=[types.Content(role="user", parts=[
+                        types.Part.from_uri(file_uri=video.uri, mime_type=video.mime_type)])],
+                    ttl=f"{int(self.ttl_s)}s",
+                ))
+            entry.name = cached.name
+            entry.expires_at = created_at + self.ttl_s
+            entry.cached_tokens = (cached.usage_metadata.total_token_count or 0) if cached.usage_metadata else 0
+            call.set(cached_tokens=entry.cached_tokens)
+        with self._lock:
+            self.uploads += 1
+            self.upload_bytes += entry.upload_bytes
+            self.tokens_cached += entry.cached_tokens
+
+    def _refresh(self, entry):
+        refreshed_at = self.clock()
+        self._client().caches.update(name=entry.name, config=types.UpdateCachedContentConfig(
+            ttl=f"{int(self.ttl_s)}s"))
+        with self._lock:
+            entry.expires_at = refreshed_at + self.ttl_s
+            self.refreshes += 1
+
+    def ask(self, lease, question, config=None):
+        """Answers `question` against the cached video; only the question is sent."""
+        if lease.released:
+            raise RuntimeError("Context lease was already released")
+        entry = lease.entry
+        config = config or types.GenerateContentConfig(temperature=0.2)
+        config = config.model_copy(update={"cached_content": entry.name})
+        with get_telemetry().trace("video", model=self.model, cache="context") as call:
+            call.add_bytes(len(question.encode("utf-8")))
+            client = self._client()
+            response = get_scheduler().call(
+                lambda: client.models.generate_content(model=self.model, contents=question, config=config),
+                "video", trace=call)
+            call.record_usage(response)
+        usage = response.usage_metadata
+        with self._lock:
+            entry.queries += 1
+            self.queries += 1
+            if usage is not None:
+                self.cached_tokens_served += usage.cached_content_token_count or 0
+                self.prompt_tokens += usage.prompt_token_count or 0
+        return response.text
+
+    def _evict_idle(self):
+        """Drops expired idle entries, then least recently used idle ones beyond `max_entries`."""
+        now = self.clock()
+        with self._lock:
+            idle = [e for e in self._entries.values() if e.refcount == 0 and e.ready.is_set()]
+            doomed = [e for e in idle if e.remaining_s(now) <= 0]
+            overflow = len(self._entries) - len(doomed) - self.max_entries
+            doomed += [e for e in idle if e not in doomed][:max(0, overflow)]
+            for entry in doomed:
+                self._entries.pop(entry.key, None)
+        for entry in doomed:
+            self._discard(entry)
+
+    def _discard(self, entry):
+        client = self.client or get_client()
+        if client is None:
+            return
+        if entry.name and entry.remaining_s(self.clock()) > 0:
+            try:
+                client.caches.delete(name=entry.name)
+            except Exception as e:
+                print(f"⚠️ Could not delete context cache {entry.name}: {e}")
+        self._delete_file(entry)
+
+    def _delete_file(self, entry):
+        client = self.client or get_client()
+        if client is None or not entry.file_name:
+            return
+        try:
+            client.files.delete(name=entry.file_name)
+        except Exception as e:
+            print(f"⚠️ Could not delete uploaded file {entry.file_name}: {e}")
+
+    def close(self):
+        """Deletes every idle cache and its uploaded video. Caches still leased are left alone."""
+        with self._lock:
+            idle = [e for e in self._entries.values() if e.refcount == 0 and e.ready.is_set()]
+            for entry in idle:
+                self._entries.pop(entry.key, None)
+        for entry in idle:
+            self._discard(entry)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "uploads": self.uploads,
+                "refreshes": self.refreshes,
+                "queries": self.queries,
+                "upload_bytes": self.upload_bytes,
+                "tokens_cached": self.tokens_cached,
+                "cached_tokens_served": self.cached_tokens_served,
+                # Tokens that would have been re-sent without the cache
+                "tokens_saved": max(0, self.cached_tokens_served - self.tokens_cached),
+                "cached_token_ratio": (self.cached_tokens_served / self.prompt_tokens) if self.prompt_tokens else 0.0,
+            }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_context_cache():
+    """The shared ContextCache, so follow-up questions anywhere in the process reuse uploads."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ContextCache()
+    return _default_cache
@@ -0,0 +1,488 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: the single-writer rule is not enforced
+    fcntl = None
+
+try:
+    from examples.overlay import detections_to_arrays
+    from examples.scheduler import current_robot_id
+except ImportError:
+    from overlay import detections_to_arrays
+    from scheduler import current_robot_id
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: DETECTION STORE
+# -------------------------------------------------------------------------
+# Perception results and safety violations used to be printed and lost,
+# so post-incident analysis meant re-running the model. This append-only
+# store keeps them on disk as one memory-mapped file per column:
+#
+#   t.f64        frame timestamp (epoch seconds)
+#   robot.u16    robot ID, dictionary-encoded (0 = unknown)
+#   label.u32    label, dictionary-encoded
+#   kind.u8      box / point / violation
+#   coords.f32   [ymin, xmin, ymax, xmax]; points use [y, x, nan, nan]
+#   detail.u32   violation reason, dictionary-encoded (0 = none)
+#
+# Rows are grouped in blocks of `block_rows`. Each block's min/max
+# timestamp (blocks.f64) and the labels it contains (block_labels.u32) are
+# the index: a query only touches the blocks that can match, so "all
+# humans within 2s of violation X" reads a few blocks out of days of logs.
+#
+#   store = DetectionStore("logs/detections")
+#   store.append(detections, t=frame_time, robot_id="amr-7")
+#   v = store.query(kind="violation")[0]
+#   humans = store.near(v["t"], window_s=2.0, labels=["human"])
+#
+# One process writes a store (enforced with a lock on .lock); any number
+# may read it with read_only=True. meta.json is only replaced after the
+# columns and index are written, so a crashed writer loses at most its last
+# unflushed rows and a reader never maps rows that are still being written.
+# Readers re-read meta.json before every query and never modify the files;
+# only the writer trims what a crashed writer left behind.
+# -------------------------------------------------------------------------
+
+KINDS = ("box", "point", "violation")
+COLUMNS = {
+    "t": (np.float64, ()),
+    "robot": (np.uint16, ()),
+    "label": (np.uint32, ()),
+    "kind": (np.uint8, ()),
+    "coords": (np.float32, (4,)),
+    "detail": (np.uint32, ()),
+}
+_EXTENSIONS = {"t": "f64", "robot": "u16", "label": "u32", "kind": "u8", "coords": "f32", "detail": "u32"}
+DEFAULT_BLOCK_ROWS = 4096
+FORMAT_VERSION = 1
+
+
+def _row_bytes(dtype, shape):
+    return np.dtype(dtype).itemsize * int(np.prod(shape or (1,)))
+
+
+class QueryResult:
+    """Matching rows as parallel arrays (struct-of-arrays), decoded on demand."""
+
+    def __init__(self, store, rows, columns):
+        self.store = store
+        self.rows = rows
+        self.t = columns["t"]
+        self.robot_codes = columns["robot"]
+        self.label_codes = columns["label"]
+        self.kinds = columns["kind"]
+        self.coords = columns["coords"]
+        self.detail_codes = columns["detail"]
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def labels(self):
+        return [self.store.labels[code] for code in self.label_codes]
+
+    @property
+    def robot_ids(self):
+        return [self.store.robots[code] for code in self.robot_codes]
+
+    def __getitem__(self, i):
+        """One row as an overlay-ready dict (`box_2d` or `point`) plus t, robot_id, kind and row."""
+        kind = KINDS[self.kinds[i]]
+        record = {"row": int(self.rows[i]), "t": float(self.t[i]), "robot_id": self.store.robots[self.robot_codes[i]],
+                  "label": self.store.labels[self.label_codes[i]], "kind": kind}
+        if kind == "box":
+            record["box_2d"] = [float(v) for v in self.coords[i]]
+        elif kind == "point":
+            record["point"] = [float(v) for v in self.coords[i, :2]]
+        else:
+            record["reason"] = self.store.details[self.detail_codes[i]]
+        return record
+
+    def to_records(self):
+        return [self[i] for i in range(len(self))]
+
+
+class DetectionStore:
+    """
+    Append-only columnar log of detections and violations in `path`.
+    Appends are buffered and written every `flush_rows` rows or
+    `flush_interval_s` seconds (and before every query). With
+    `read_only=True` the store only queries, seeing rows as they are committed.
+    """
+
+    def __init__(self, path, block_rows=DEFAULT_BLOCK_ROWS, flush_rows=1024, flush_interval_s=1.0,
+                 clock=time.time, read_only=False):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_interval_s = flush_interval_s
+        self.clock = clock
+        self.read_only = read_only
+        self._lock = threading.RLock()
+        self._lock_fd = None
+        self._pending = {name: [] for name in COLUMNS}
+        self._pending_rows = 0
+        self._last_flush = time.monotonic()
+        self._maps = None
+        self._zones = None
+        self.blocks_scanned = 0
+        if not read_only:
+            os.makedirs(path, exist_ok=True)
+            self._lock_writer()
+
+        meta = self._read_meta(block_rows)
+        self.block_rows = meta["block_rows"]
+        self.rows = 0 if read_only else meta["rows"]
+        if read_only:
+            self._refresh()
+        else:
+            self._load_dictionary()
+            self._recover()
+
+    # --- files -----------------------------------------------------------
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _column_file(self, name):
+        return self._file(f"{name}.{_EXTENSIONS[name]}")
+
+    def _read_json(self, name, default):
+        try:
+            with open(self._file(name), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+
+    def _write_json(self, name, data):
+        tmp = self._file(name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._file(name))
+
+    def _read_array(self, name, dtype):
+        path = self._file(name)
+        return np.fromfile(path, dtype=dtype) if os.path.exists(path) else np.zeros(0, dtype=dtype)
+
+    def _read_meta(self, block_rows):
+        meta = self._read_json("meta.json", {"version": FORMAT_VERSION, "rows": 0, "block_rows": block_rows})
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported detection store version {meta['version']}")
+        return meta
+
+    def _load_dictionary(self):
+        dictionary = self._read_json("dictionary.json", {"labels": [""], "robots": [None], "details": [""]})
+        self.labels = dictionary["labels"]
+        self.robots = dictionary["robots"]
+        self.details = dictionary["details"]
+        self._codes = {
+            "labels": {v: i for i, v in enumerate(self.labels)},
+            "robots": {v: i for i, v in enumerate(self.robots)},
+            "details": {v: i for i, v in enumerate(self.details)},
+        }
+
+    def _lock_writer(self):
+        """Only one writer per store: a second one would truncate rows the first has not committed yet."""
+        self._lock_fd = os.open(self._file(".lock"), os.O_CREAT | os.O_RDWR)
+        if fcntl is None:
+            return
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+            raise RuntimeError(f"{self.path} is already open for writing; open it with read_only=True")
+
+    def _recover(self):
+        """Drops column bytes past the committed row count; rebuilds the index only if it is missing."""
+        for name, (dtype, shape) in COLUMNS.items():
+            path = self._column_file(name)
+            if not os.path.exists(path):
+                open(path, "wb").close()
+            if os.path.getsize(path) > self.rows * _row_bytes(dtype, shape):
+                with open(path, "r+b") as f:
+                    f.truncate(self.rows * _row_bytes(dtype, shape))
+        self._load_index()
+        self._write_index()
+
+    def _refresh(self):
+        """Read-only mode: picks up rows the writer committed since the last query."""
+        meta = self._read_meta(self.block_rows)
+        if self._zones is not None and meta["rows"] == self.rows:
+            return
+        self._load_dictionary()
+        rows = meta["rows"]
+        # Never map past the end of a column, whatever meta.json says
+        for name, (dtype, shape) in COLUMNS.items():
+            path = self._column_file(name)
+            rows = min(rows, os.path.getsize(path) // _row_bytes(dtype, shape) if os.path.exists(path) else 0)
+        self.rows = rows
+        self._load_index()
+
+    def _load_index(self):
+        n_blocks = -(-self.rows // self.block_rows)
+        zones = self._read_array("blocks.f64", np.float64)
+        zones = zones[:len(zones) // 2 * 2].reshape(-1, 2)
+        pairs = self._read_array("block_labels.u32", np.uint32)
+        pairs = pairs[:len(pairs) // 2 * 2].reshape(-1, 2)
+        # The index is written before the row count is committed, so it can only be
+        # ahead of the columns (wider time ranges, extra labels), which is harmless
+        self._zones = zones[:n_blocks].copy()
+        self._pairs = pairs[pairs[:, 0] < n_blocks].copy()
+        if len(self._zones) < n_blocks:
+            self._zones = np.zeros((0, 2))
+            self._pairs = np.zeros((0, 2), dtype=np.uint32)
+            maps = self._columns()
+            for block in range(n_blocks):
+                lo, hi = block * self.block_rows, min(self.rows, (block + 1) * self.block_rows)
+                self._index_rows(block, maps["t"][lo:hi], maps["label"][lo:hi])
+
+    def _columns(self):
+        """Read-only memory maps over the committed rows, reopened when rows were added."""
+        if self._maps is not None and self._maps[0] == self.rows:
+            return self._maps[1]
+        maps = {}
+        for name, (dtype, shape) in COLUMNS.items():
+            if self.rows == 0:
+                maps[name] = np.zeros((0,) + shape, dtype=dtype)
+            else:
+                maps[name] = np.memmap(self._column_file(name), dtype=dtype, mode="r", shape=(self.rows,) + shape)
+        self._maps = (self.rows, maps)
+        return maps
+
+    # --- writing ---------------------------------------------------------
+
+    def _code(self, kind, value):
+        codes = self._codes[kind]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            getattr(self, kind).append(value)
+        return code
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError(f"{self.path} was opened read_only")
+
+    def _add(self, t, robot_id, label, kind, coords, detail=""):
+        pending = self._pending
+        pending["t"].append(float(t))
+        pending["robot"].append(self._code("robots", robot_id))
+        pending["label"].append(self._code("labels", "" if label is None else str(label)))
+        pending["kind"].append(KINDS.index(kind))
+        pending["coords"].append(coords)
+        pending["detail"].append(self._code("details", detail or ""))
+        self._pending_rows += 1
+
+    def append(self, detections, t=None, robot_id=None):
+        """
+        Records one frame's `box_2d` / `point` detections (malformed entries
+        are skipped). `t` defaults to now and `robot_id` to the current
+        `scheduler.robot_scope`. Returns the number of rows added.
+        """
+        self._check_writable()
+        t = self.clock() if t is None else t
+        robot_id = current_robot_id() if robot_id is None else robot_id
+        arrays = detections_to_arrays(detections)
+        with self._lock:
+            for box, label in zip(arrays.boxes, arrays.box_labels):
+                self._add(t, robot_id, label, "box", box)
+            for point, label in zip(arrays.points, arrays.point_labels):
+                self._add(t, robot_id, label, "point", [point[0], point[1], np.nan, np.nan])
+            self._maybe_flush()
+        return len(arrays)
+
+    def append_violations(self, violations, video_start_t=0.0, robot_id=None):
+        """
+        Records safety violations (`time_s` seconds into the video, `rule`,
+        `reason`) at `video_start_t + time_s`. The rule is the label.
+        """
+        self._check_writable()
+        robot_id = current_robot_id() if robot_id is None else robot_id
+        with self._lock:
+            for v in violations or []:
+                self._add(video_start_t + float(v.get("time_s", 0.0)), robot_id, v.get("rule", ""), "violation",
+                          [np.nan] * 4, v.get("reason", ""))
+            self._maybe_flush()
+        return len(violations or [])
+
+    def _maybe_flush(self):
+        if self._pending_rows >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_interval_s:
+            self.flush()
+
+    def _index_rows(self, block, t, labels):
+        if block < len(self._zones):
+            self._zones[block] = [min(self._zones[block, 0], t.min()), max(self._zones[block, 1], t.max())]
+        else:
+            self._zones = np.vstack([self._zones, [[t.min(), t.max()]]])
+        known = self._pairs[self._pairs[:, 0] == block, 1]
+        new = np.setdiff1d(np.unique(labels), known)
+        if len(new):
+            self._pairs = np.vstack([self._pairs, np.column_stack([np.full(len(new), block), new]).astype(np.uint32)])
+
+    def _write_index(self):
+        for name, array in (("blocks.f64", self._zones.astype(np.float64)),
+                            ("block_labels.u32", self._pairs.astype(np.uint32))):
+            array.tofile(self._file(name + ".tmp"))
+            os.replace(self._file(name + ".tmp"), self._file(name))
+
+    def flush(self, fsync=False):
+        """Writes buffered rows, then the index, then commits the new row count."""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._pending_rows:
+                return
+            columns = {name: np.asarray(values, dtype=COLUMNS[name][0]) for name, values in self._pending.items()}
+            for name, values in columns.items():
+                with open(self._column_file(name), "ab") as f:
+                    values.tofile(f)
+                    if fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+
+            start, end = self.rows, self.rows + self._pending_rows
+            for block in range(start // self.block_rows, (end - 1) // self.block_rows + 1):
+                lo = max(start, block * self.block_rows) - start
+                hi = min(end, (block + 1) * self.block_rows) - start
+                self._index_rows(block, columns["t"][lo:hi], columns["label"][lo:hi])
+            self._write_index()
+            self._write_json("dictionary.json", {"labels": self.labels, "robots": self.robots, "details": self.details})
+
+            self.rows = end
+            self._write_json("meta.json", {"version": FORMAT_VERSION, "rows": self.rows, "block_rows": self.block_rows})
+            self._pending = {name: [] for name in COLUMNS}
+            self._pending_rows = 0
+
+    def close(self):
+        self.flush()
+        self._maps = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __len__(self):
+        return self.rows + self._pending_rows
+
+    # --- reading ---------------------------------------------------------
+
+    def _label_codes(self, labels):
+        wanted = {str(label).lower() for label in labels}
+        return np.array([code for label, code in self._codes["labels"].items() if label.lower() in wanted],
+                        dtype=np.uint32)
+
+    def _candidate_blocks(self, t_start, t_end, label_codes):
+        keep = np.ones(len(self._zones), dtype=bool)
+        if t_start is not None:
+            keep &= self._zones[:, 1] >= t_start
+        if t_end is not None:
+            keep &= self._zones[:, 0] <= t_end
+        if label_codes is not None:
+            with_label = np.zeros(len(self._zones), dtype=bool)
+            with_label[self._pairs[np.isin(self._pairs[:, 1], label_codes), 0]] = True
+            keep &= with_label
+        return np.flatnonzero(keep)
+
+    def query(self, t_start=None, t_end=None, labels=None, robot_id=None, kind=None):
+        """
+        Rows with `t_start <= t <= t_end`, any of `labels` (case-insensitive),
+        from `robot_id` and of `kind` ("box", "point", "violation" or a
+        tuple of them), in row order. Only matching rows are read into RAM.
+        """
+        with self._lock:
+            if self.read_only:
+                self._refresh()
+            else:
+                self.flush()
+            label_codes = self._label_codes(labels) if labels is not None else None
+            blocks = self._candidate_blocks(t_start, t_end, label_codes)
+            robot_code = self._codes["robots"].get(robot_id) if robot_id is not None else None
+            if robot_id is not None and robot_code is None:
+                blocks = blocks[:0]
+            self.blocks_scanned = len(blocks)
+            maps = self._columns()
+            kinds = [KINDS.index(k) for k in ((kind,) if isinstance(kind, str) else kind)] if kind is not None else None
+
+            matches = []
+            # Consecutive candidate blocks are scanned as one slice
+            for run in np.split(blocks, np.flatnonzero(np.diff(blocks) != 1) + 1) if len(blocks) else ():
+                lo, hi = run[0] * self.block_rows, min(self.rows, (run[-1] + 1) * self.block_rows)
+                t = maps["t"][lo:hi]
+                mask = np.ones(hi - lo, dtype=bool)
+                if t_start is not None:
+                    mask &= t >= t_start
+                if t_end is not None:
+                    mask &= t <= t_end
+                if label_codes is not None:
+                    mask &= np.isin(maps["label"][lo:hi], label_codes)
+                if robot_code is not None:
+                    mask &= maps["robot"][lo:hi] == robot_code
+                if kinds is not None:
+                    mask &= np.isin(maps["kind"][lo:hi], kinds)
+                matches.append(lo + np.flatnonzero(mask))
+            rows = np.concatenate(matches) if matches else np.zeros(0, dtype=np.int64)
+            return QueryResult(self, rows, {name: np.asarray(column[rows]) for name, column in maps.items()})
+
+    def near(self, t, window_s=2.0, labels=None, robot_id=None, kind=("box", "point")):
+        """Detections within `window_s` seconds of `t`, e.g. a violation's timestamp."""
+        return self.query(t - window_s, t + window_s, labels=labels, robot_id=robot_id, kind=kind)
+
+    def stats(self):
+        with self._lock:
+            if self.read_only:
+                self._refresh()
+            disk = sum(os.path.getsize(self._file(name)) for name in os.listdir(self.path)
+                       if os.path.isfile(self._file(name)))
+            return {
+                "rows": self.rows,
+                "pending_rows": self._pending_rows,
+                "blocks": len(self._zones),
+                "labels": len(self.labels) - 1,
+                "robots": len(self.robots) - 1,
+                "bytes_on_disk": disk,
+                "bytes_per_row": disk / self.rows if self.rows else 0.0,
+                "time_range": (float(self._zones[:, 0].min()), float(self._zones[:, 1].max()))
+                if len(self._zones) else None,
+            }
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+
+    # Synthetic fleet log: 10 robots x 10 detections per frame at 5 fps
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    rng = np.random.default_rng(0)
+    labels = np.array(["human", "forklift", "pallet", "robot", "cone"])
+    with tempfile.TemporaryDirectory() as path:
+        store = DetectionStore(path, flush_rows=100_000)
+        start = time.perf_counter()
+        frames = int(hours * 3600 * 5)
+        for frame in range(frames):
+            t = 1_700_000_000 + frame / 5
+            store.append([{"box_2d": list(rng.integers(0, 1000, 4)), "label": label}
+                          for label in rng.choice(labels, 10)], t=t, robot_id=f"amr-{frame % 10}")
+        store.flush()
+        print(f"📝 Logged {len(store):,} detections in {time.perf_counter() - start:.1f} s "
+              f"({store.stats()['bytes_per_row']:.1f} bytes/row)")
+
+        store.append_violations([{"time_s": hours * 1800, "rule": "2", "reason": "Human in red zone"}],
+                                video_start_t=1_700_000_000)
+        query_start = time.perf_counter()
+        violation = store.query(kind="violation", t_start=1_700_000_000 + hours * 1800 - 1)[0]
+        humans = store.near(violation["t"], window_s=2.0, labels=["human"])
+        print(f"🔎 {len(humans)} humans within 2 s of violation '{violation['reason']}' "
+              f"in {(time.perf_counter() - query_start) * 1000:.1f} ms ({store.blocks_scanned} blocks read)")
@@ -0,0 +1,144 @@
+import io
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image, ImageOps
+
+try:
+    from examples.overlay import to_pil
+except ImportError:
+    from overlay import to_pil
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: CHANGE-DETECTION FRAME GATE
+# -------------------------------------------------------------------------
+# An idle or slow robot produces long runs of nearly identical frames. The
+# gate compares a tiny grayscale thumbnail of each frame with the last frame
+# that was actually sent to the model, and reuses the previous detections
+# while the scene has not changed. A staleness bound forces a refresh so
+# slow drift is never ignored forever.
+#
+#   gate = FrameGate(threshold=0.02, max_staleness_s=5.0)
+#   detections = gate.process(frame, lambda f: query_model(f))
+# -------------------------------------------------------------------------
+
+THUMBNAIL_SIZE = 32
+
+
+def frame_signature(frame, size=THUMBNAIL_SIZE):
+    """Returns a (size, size) float32 grayscale thumbnail in [0, 1]."""
+    if isinstance(frame, np.ndarray) and frame.ndim == 2:
+        img = Image.fromarray(frame)
+    elif isinstance(frame, (np.ndarray, Image.Image)):
+        img = to_pil(frame)
+    else:
+        # Paths and encoded bytes: pick the draft scale before EXIF transpose
+        # loads the image, then rotate the small decode
+        img = Image.open(io.BytesIO(frame) if isinstance(frame, (bytes, bytearray, memoryview)) else frame)
+        if img.format == "JPEG":
+            # Decode at 1/8 scale: far cheaper than a full-resolution decode
+            img.draft("L", (size * 2, size * 2))
+        img = ImageOps.exif_transpose(img) or img
+    thumb = img.convert("L").resize((size, size), Image.Resampling.BOX)
+    return np.asarray(thumb, dtype=np.float32) / 255.0
+
+
+def difference_hash(signature):
+    """64-bit dHash of a signature: sign of horizontal gradients on an 8x9 grid."""
+    small = np.asarray(Image.fromarray((signature * 255).astype(np.uint8)).resize((9, 8), Image.Resampling.BOX),
+                       dtype=np.int16)
+    return np.packbits((small[:, 1:] > small[:, :-1]).ravel())
+
+
+def change_score(previous, current, method="mad"):
+    """
+    0.0 for identical frames, up to 1.0 for completely different ones.
+    "mad" is the mean absolute pixel difference of the thumbnails; "dhash"
+    is the fraction of differing perceptual-hash bits.
+    """
+    if method == "mad":
+        return float(np.abs(current - previous).mean())
+    if method == "dhash":
+        bits = np.unpackbits(difference_hash(previous) ^ difference_hash(current))
+        return float(bits.mean())
+    raise ValueError(f"Unknown change method '{method}'")
+
+
+@dataclass
+class GateDecision:
+    send: bool
+    score: float
+    reason: str
+
+
+class FrameGate:
+    """
+    Decides per frame whether a model call is needed. `threshold` is in
+    `change_score` units; `max_staleness_s` and `max_skipped` bound how long
+    cached detections may be reused. `clock` is injectable for tests.
+    """
+
+    def __init__(self, threshold=0.02, max_staleness_s=5.0, max_skipped=None, method="mad",
+                 clock=time.monotonic):
+        self.threshold = threshold
+        self.max_staleness_s = max_staleness_s
+        self.max_skipped = max_skipped
+        self.method = method
+        self.clock = clock
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.last_result = None
+        self._last_signature = None
+        self._last_sent_at = None
+        self._skipped_in_row = 0
+        self._pending_signature = None
+
+    def check(self, frame):
+        """Scores `frame` against the last sent frame and decides whether to send it."""
+        signature = frame_signature(frame)
+        self._pending_signature = signature
+        if self._last_signature is None:
+            return GateDecision(True, 1.0, "first frame")
+
+        score = change_score(self._last_signature, signature, self.method)
+        if score >= self.threshold:
+            return GateDecision(True, score, "scene changed")
+        if self.max_staleness_s is not None and self.clock() - self._last_sent_at >= self.max_staleness_s:
+            return GateDecision(True, score, "stale")
+        if self.max_skipped is not None and self._skipped_in_row >= self.max_skipped:
+            return GateDecision(True, score, "max skipped")
+        return GateDecision(False, score, "unchanged")
+
+    def record_sent(self, result):
+        """Marks the last checked frame as analyzed, with its model result."""
+        self._last_signature = self._pending_signature
+        self._last_sent_at = self.clock()
+        self._skipped_in_row = 0
+        self.frames_sent += 1
+        self.last_result = result
+
+    def record_skipped(self):
+        self._skipped_in_row += 1
+        self.frames_skipped += 1
+        return self.last_result
+
+    def process(self, frame, query_fn):
+        """Returns `query_fn(frame)` if the frame changed enough, else the cached result."""
+        if self.check(frame).send:
+            result = query_fn(frame)
+            self.record_sent(result)
+            return result
+        return self.record_skipped()
+
+    def reset(self):
+        self._last_signature = None
+        self.last_result = None
+
+    def stats(self):
+        total = self.frames_sent + self.frames_skipped
+        return {
+            "frames_sent": self.frames_sent,
+            "frames_skipped": self.frames_skipped,
+            "skip_rate": self.frames_skipped / total if total else 0.0,
+        }
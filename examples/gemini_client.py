@@ -0,0 +1,163 @@
+import asyncio
+import os
+import threading
+import weakref
+
+from dotenv import load_dotenv
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: SHARED CLIENT FACTORY
+# -------------------------------------------------------------------------
+# Every capability used to build its own `genai.Client` at import time,
+# which made `cli.py` slow to start and opened one connection pool per
+# module. This factory creates a single client on first use and hands the
+# same instance (and its keep-alive HTTP pools) to every caller.
+#
+#   from gemini_client import get_client
+#   client = get_client()   # None if GEMINI_API_KEY is not configured
+#   aio = get_async_client()  # inside a coroutine: client.aio for this loop
+#   run_with_async_client(main())  # asyncio.run + closes that loop's client
+#
+# Set GEMINI_BASE_URL to point every capability at another endpoint, e.g.
+# the local mock server in mock_gemini_server.py.
+# -------------------------------------------------------------------------
+
+MAX_CONNECTIONS = 32
+MAX_KEEPALIVE_CONNECTIONS = 16
+KEEPALIVE_EXPIRY_S = 60.0
+
+_client = None
+_injected = False
+_loop_clients = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+_env_loaded = False
+_warned = False
+
+
+def load_env():
+    """Loads .env once per process."""
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv()
+        _env_loaded = True
+
+
+def get_api_key():
+    load_env()
+    key = os.getenv("GEMINI_API_KEY")
+    if not key or "your_api_key" in key:
+        return None
+    return key
+
+
+def _pool_args():
+    import httpx
+
+    limits = httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY_S,
+    )
+    return {"limits": limits}
+
+
+def create_client(api_key=None, base_url=None):
+    """Builds a new client with pooled keep-alive connections. Prefer `get_client`."""
+    # Imported here so that importing this module (and the CLI) stays cheap
+    from google import genai
+    from google.genai import types
+
+    load_env()
+    return genai.Client(
+        api_key=api_key or get_api_key(),
+        http_options=types.HttpOptions(
+            base_url=base_url or os.getenv("GEMINI_BASE_URL") or None,
+            client_args=_pool_args(),
+            async_client_args=_pool_args(),
+        ),
+    )
+
+
+def get_client():
+    """
+    Returns the process-wide client, creating it on first use.
+    Returns None (after a one-time warning) if no API key is configured.
+    """
+    global _client, _warned
+    if _client is not None:
+        return _client
+    with _lock:
+        if _client is None:
+            if get_api_key() is None:
+                if not _warned:
+                    print("⚠️  Warning: GEMINI_API_KEY not set. Please set it in .env or environment.")
+                    _warned = True
+                return None
+            try:
+                _client = create_client()
+            except Exception as e:
+                print(f"Error initializing client: {e}")
+                return None
+    return _client
+
+
+def get_async_client():
+    """
+    Returns the async API (`client.aio`) to use on the running event loop.
+    httpx async pools are bound to the loop that opened them, so each loop
+    gets its own client while all coroutines on that loop share one pool.
+    A client installed with `set_client` is used as-is on every loop.
+    """
+    loop = asyncio.get_running_loop()
+    shared = get_client()
+    if shared is None:
+        return None
+    if _injected:
+        return shared.aio
+    with _lock:
+        # A loop that was closed without close_async_client() can no longer await
+        # its pool's shutdown; drop it and close the sync side of its client
+        stale = [(old, c) for old, c in _loop_clients.items() if old.is_closed()]
+        for old, _ in stale:
+            del _loop_clients[old]
+        client = _loop_clients.get(loop)
+        if client is None:
+            client = create_client()
+            _loop_clients[loop] = client
+    for _, old_client in stale:
+        old_client.close()
+    return client.aio
+
+
+async def close_async_client():
+    """Closes the client `get_async_client` opened for the running loop (its pool dies with the loop)."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _loop_clients.pop(loop, None)
+    if client is not None:
+        await client.aio.aclose()
+        client.close()
+
+
+def run_with_async_client(coro):
+    """`asyncio.run(coro)`, closing the loop's async client before the loop ends."""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await close_async_client()
+
+    return asyncio.run(main())
+
+
+def set_client(client):
+    """Installs `client` as the shared instance (tests, mock servers, custom auth)."""
+    global _client, _injected
+    with _lock:
+        _client = client
+        _injected = client is not None
+        _loop_clients.clear()
+
+
+def reset_client():
+    set_client(None)
@@ -0,0 +1,152 @@
+import io
+import time
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: IMAGE PAYLOAD OPTIMIZER
+# -------------------------------------------------------------------------
+# Camera frames are often 12MP and PNG screenshots are large and lossless.
+# The model does not need that many pixels to point at a mug, so we sniff
+# the real format, downsize to a max edge and re-encode in memory before
+# uploading.
+#
+# Coordinates stay valid: the model answers in 0-1000 normalized space and
+# resizing preserves the aspect ratio, so a normalized point on the sent
+# image is the same normalized point on the original. The one trap is EXIF
+# orientation, which we bake in here and in `visualize_results` alike.
+# -------------------------------------------------------------------------
+
+DEFAULT_UPLINK_MBPS = 20.0
+
+# Formats the Gemini API accepts as inline image parts
+SUPPORTED_MIME_TYPES = ("image/jpeg", "image/png", "image/webp", "image/heic")
+
+_PIL_FORMAT_TO_MIME = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+    "PNG": "image/png",
+}
+
+
+def sniff_mime(data):
+    """Returns the MIME type from the file's magic bytes, or None if unknown."""
+    head = bytes(data[:16])
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return "image/heic"
+    if head.startswith((b"II*\x00", b"MM\x00*")):
+        return "image/tiff"
+    if head.startswith(b"BM"):
+        return "image/bmp"
+    return None
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    original_size: tuple
+    sent_size: tuple
+    bytes_before: int
+    bytes_after: int
+    encode_s: float = 0.0
+
+    @property
+    def scale(self):
+        """Sent pixels per original pixel along the long edge."""
+        return max(self.sent_size) / max(self.original_size)
+
+    def upload_saved_s(self, uplink_mbps=DEFAULT_UPLINK_MBPS):
+        """Estimated upload time saved on a link of `uplink_mbps`."""
+        return (self.bytes_before - self.bytes_after) * 8 / (uplink_mbps * 1_000_000)
+
+    def to_original_pixels(self, y, x):
+        """Maps a normalized 0-1000 [y, x] pair onto original-image pixels."""
+        width, height = self.original_size
+        return int(y / 1000 * height), int(x / 1000 * width)
+
+    def report(self, uplink_mbps=DEFAULT_UPLINK_MBPS):
+        ow, oh = self.original_size
+        sw, sh = self.sent_size
+        return (f"📦 Payload: {self.bytes_before / 1024:.0f} KB -> {self.bytes_after / 1024:.0f} KB "
+                f"({ow}x{oh} -> {sw}x{sh} {self.mime_type}), "
+                f"encode {self.encode_s * 1000:.0f} ms, "
+                f"~{self.upload_saved_s(uplink_mbps) * 1000:.0f} ms upload saved @ {uplink_mbps:g} Mbps")
+
+
+def load_oriented(source):
+    """Opens a path, file object or bytes and applies EXIF orientation."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    img = Image.open(source)
+    return ImageOps.exif_transpose(img) or img
+
+
+def optimize_image(data, max_edge=1024, image_format="JPEG", quality=85):
+    """
+    Prepares raw image bytes for upload: downsizes so the long edge is at
+    most `max_edge` and re-encodes to `image_format` ("JPEG" or "WEBP").
+    Small JPEG/WebP inputs that need no resize or rotation are passed through
+    untouched, and the original bytes are kept if re-encoding would grow them.
+    """
+    start = time.perf_counter()
+    data = bytes(data)
+    image_format = image_format.upper()
+    sniffed = sniff_mime(data)
+
+    img = Image.open(io.BytesIO(data))
+    orientation = img.getexif().get(0x0112, 1)
+    rotated = orientation != 1
+    # Orientations 5-8 swap width and height once applied
+    original_size = img.size[::-1] if orientation in (5, 6, 7, 8) else img.size
+
+    if img.format == "JPEG" and max(img.size) > max_edge:
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale instead of full resolution
+        img.draft("RGB", (max_edge, max_edge))
+    if rotated:
+        img = ImageOps.exif_transpose(img)
+
+    needs_resize = max(original_size) > max_edge
+    target_mime = _PIL_FORMAT_TO_MIME[image_format]
+    if not needs_resize and not rotated and sniffed in ("image/jpeg", "image/webp"):
+        return PreparedImage(data, sniffed, original_size, original_size, len(data), len(data),
+                             time.perf_counter() - start)
+
+    if needs_resize:
+        scale = max_edge / max(original_size)
+        sent_size = (max(1, round(original_size[0] * scale)), max(1, round(original_size[1] * scale)))
+        img = img.resize(sent_size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    buf = io.BytesIO()
+    img.save(buf, format=image_format, quality=quality)
+    encoded = buf.getvalue()
+
+    if not needs_resize and not rotated and len(encoded) >= len(data) and sniffed in SUPPORTED_MIME_TYPES:
+        encoded, target_mime = data, sniffed
+
+    return PreparedImage(encoded, target_mime, original_size, img.size, len(data), len(encoded),
+                         time.perf_counter() - start)
+
+
+def prepare_image_file(image_path, **kwargs):
+    with open(image_path, "rb") as f:
+        return optimize_image(f.read(), **kwargs)
+
+
+if __name__ == "__main__":
+    import sys
+
+    for path in sys.argv[1:] or ["robot_view.jpg"]:
+        print(f"{path}: {prepare_image_file(path).report()}")
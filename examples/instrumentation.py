@@ -0,0 +1,387 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from examples.gemini_client import load_env
+    from examples.image_payload import DEFAULT_UPLINK_MBPS
+except ImportError:
+    from gemini_client import load_env
+    from image_payload import DEFAULT_UPLINK_MBPS
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: CALL INSTRUMENTATION
+# -------------------------------------------------------------------------
+# Wraps every model call in a trace with timing spans, token usage and
+# upload size, so we can see which stage dominates frame latency:
+#
+#   with get_telemetry().trace("perception", model=MODEL_ID) as call:
+#       with call.span("encode"):
+#           payload = optimize_image(image_bytes)
+#       call.add_bytes(len(payload.data))
+#       with call.span("model"):
+#           response = client.models.generate_content(...)
+#       call.record_usage(response)
+#
+# Finished calls are kept in memory for the dashboard, aggregated for the
+# Prometheus text endpoint, and appended to a JSONL file if one is set
+# (GEMINI_TELEMETRY_JSONL=calls.jsonl).
+#
+# The SDK does not expose when the request body finished uploading, so the
+# "upload" span is estimated from bytes uploaded at `uplink_mbps` and taken
+# out of the measured "model" round trip, unless the caller timed an
+# "upload" span itself (e.g. a Files API upload). The "queue" span is time
+# spent waiting for admission in scheduler.py.
+# -------------------------------------------------------------------------
+
+SPANS = ("queue", "encode", "upload", "model", "parse", "render", "tool")
+TOKEN_FIELDS = {
+    "prompt": "prompt_token_count",
+    "output": "candidates_token_count",
+    "thinking": "thoughts_token_count",
+    "cached": "cached_content_token_count",
+    "total": "total_token_count",
+}
+LATENCY_BUCKETS_S = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_CANCELLED = (GeneratorExit, KeyboardInterrupt, asyncio.CancelledError)
+
+
+@dataclass
+class CallRecord:
+    capability: str
+    model: str = None
+    started_at: float = 0.0
+    latency_s: float = 0.0
+    status: str = "ok"
+    error: str = None
+    bytes_uploaded: int = 0
+    spans: dict = field(default_factory=dict)
+    tokens: dict = field(default_factory=dict)
+    attrs: dict = field(default_factory=dict)
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class CallTrace:
+    """One instrumented call. Use as a context manager from `Telemetry.trace`."""
+
+    def __init__(self, telemetry, capability, model=None, **attrs):
+        self.telemetry = telemetry
+        self.record = CallRecord(capability=capability, model=model, attrs=dict(attrs))
+        self._start = None
+        self._finished = False
+
+    def __enter__(self):
+        self.record.started_at = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            if issubclass(exc_type, _CANCELLED):
+                self.record.status = "cancelled"
+            else:
+                self.fail(exc)
+        self.finish()
+        return False
+
+    @contextmanager
+    def span(self, name):
+        """Times a stage. Repeated spans with the same name add up."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - start)
+
+    def add_span(self, name, seconds):
+        self.record.spans[name] = self.record.spans.get(name, 0.0) + seconds
+
+    def add_bytes(self, n):
+        self.record.bytes_uploaded += int(n)
+
+    def record_usage(self, response_or_usage):
+        """Adds token counts from a response (or its `usage_metadata`)."""
+        usage = getattr(response_or_usage, "usage_metadata", response_or_usage)
+        if usage is None:
+            return
+        for key, attr in TOKEN_FIELDS.items():
+            value = getattr(usage, attr, None)
+            if value is None and isinstance(usage, dict):
+                value = usage.get(attr)
+            if value:
+                self.record.tokens[key] = self.record.tokens.get(key, 0) + int(value)
+
+    def set(self, **attrs):
+        self.record.attrs.update(attrs)
+
+    def fail(self, error):
+        """Marks the call failed without raising (for paths that handle errors themselves)."""
+        self.record.status = "error"
+        self.record.error = str(error) or type(error).__name__
+
+    def finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        record = self.record
+        record.latency_s = time.perf_counter() - self._start
+        model_s = record.spans.get("model")
+        # Estimate the upload share of the model span unless it was measured directly
+        if model_s and record.bytes_uploaded and self.telemetry.uplink_mbps and "upload" not in record.spans:
+            upload_s = min(model_s, record.bytes_uploaded * 8 / (self.telemetry.uplink_mbps * 1_000_000))
+            record.spans["upload"] = record.spans.get("upload", 0.0) + upload_s
+            record.spans["model"] = model_s - upload_s
+        self.telemetry._finish(record)
+
+
+class Telemetry:
+    """
+    Collects CallRecords. Thread-safe, so the same instance can be shared by
+    thread pools and event loops.
+    """
+
+    def __init__(self, jsonl_path=None, uplink_mbps=DEFAULT_UPLINK_MBPS, max_recent=1000):
+        self.jsonl_path = jsonl_path
+        self.uplink_mbps = uplink_mbps
+        self._recent = deque(maxlen=max_recent)
+        self._lock = threading.Lock()
+        self._reset_aggregates()
+
+    def _reset_aggregates(self):
+        self._calls = defaultdict(int)                                   # (capability, status)
+        self._latency_buckets = defaultdict(lambda: [0] * len(LATENCY_BUCKETS_S))
+        self._latency_sum = defaultdict(float)
+        self._latency_count = defaultdict(int)
+        self._span_seconds = defaultdict(float)                          # (capability, span)
+        self._tokens = defaultdict(int)                                  # (capability, kind)
+        self._bytes = defaultdict(int)
+
+    def trace(self, capability, model=None, **attrs):
+        return CallTrace(self, capability, model, **attrs)
+
+    def _finish(self, record):
+        line = json.dumps(record.to_dict()) if self.jsonl_path else None
+        with self._lock:
+            self._recent.append(record)
+            cap = record.capability
+            self._calls[(cap, record.status)] += 1
+            for i, bound in enumerate(LATENCY_BUCKETS_S):
+                if record.latency_s <= bound:
+                    self._latency_buckets[cap][i] += 1
+            self._latency_sum[cap] += record.latency_s
+            self._latency_count[cap] += 1
+            for name, seconds in record.spans.items():
+                self._span_seconds[(cap, name)] += seconds
+            for kind, count in record.tokens.items():
+                self._tokens[(cap, kind)] += count
+            self._bytes[cap] += record.bytes_uploaded
+            if line is not None:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+
+    def records(self, capability=None):
+        with self._lock:
+            return [r for r in self._recent if capability is None or r.capability == capability]
+
+    def reset(self):
+        with self._lock:
+            self._recent.clear()
+            self._reset_aggregates()
+
+    def summary(self):
+        """Per-capability view of the recent calls: counts, percentiles, mean spans, tokens."""
+        by_capability = defaultdict(list)
+        for record in self.records():
+            by_capability[record.capability].append(record)
+
+        summary = {}
+        for cap, records in sorted(by_capability.items()):
+            latencies = sorted(r.latency_s for r in records)
+            spans = defaultdict(float)
+            tokens = defaultdict(int)
+            for r in records:
+                for name, seconds in r.spans.items():
+                    spans[name] += seconds
+                for kind, count in r.tokens.items():
+                    tokens[kind] += count
+            mean_spans = {name: seconds / len(records) for name, seconds in spans.items()}
+            summary[cap] = {
+                "calls": len(records),
+                "errors": sum(1 for r in records if r.status == "error"),
+                "cached": sum(1 for r in records if r.attrs.get("cache")),
+                "p50_s": latencies[(len(latencies) - 1) // 2],
+                "p95_s": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                "mean_spans_s": mean_spans,
+                "dominant_span": max(mean_spans, key=mean_spans.get) if mean_spans else None,
+                "tokens": dict(tokens),
+                "bytes_uploaded": sum(r.bytes_uploaded for r in records),
+            }
+        return summary
+
+    def prometheus_text(self):
+        """Renders the aggregates in the Prometheus text exposition format."""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            family("gemini_calls_total", "counter", "Model calls by capability and status.")
+            for (cap, status), n in sorted(self._calls.items()):
+                lines.append(f"gemini_calls_total{_labels(capability=cap, status=status)} {n}")
+
+            family("gemini_call_latency_seconds", "histogram", "End-to-end call latency.")
+            for cap in sorted(self._latency_count):
+                for bound, n in zip(LATENCY_BUCKETS_S, self._latency_buckets[cap]):
+                    lines.append(f"gemini_call_latency_seconds_bucket{_labels(capability=cap, le=bound)} {n}")
+                count = self._latency_count[cap]
+                lines.append(f"gemini_call_latency_seconds_bucket{_labels(capability=cap, le='+Inf')} {count}")
+                lines.append(f"gemini_call_latency_seconds_sum{_labels(capability=cap)} {self._latency_sum[cap]:.6f}")
+                lines.append(f"gemini_call_latency_seconds_count{_labels(capability=cap)} {count}")
+
+            family("gemini_span_seconds_total", "counter", "Time spent per call stage.")
+            for (cap, span), seconds in sorted(self._span_seconds.items()):
+                lines.append(f"gemini_span_seconds_total{_labels(capability=cap, span=span)} {seconds:.6f}")
+
+            family("gemini_tokens_total", "counter", "Tokens reported in usage_metadata.")
+            for (cap, kind), n in sorted(self._tokens.items()):
+                lines.append(f"gemini_tokens_total{_labels(capability=cap, kind=kind)} {n}")
+
+            family("gemini_upload_bytes_total", "counter", "Request payload bytes sent.")
+            for cap, n in sorted(self._bytes.items()):
+                lines.append(f"gemini_upload_bytes_total{_labels(capability=cap)} {n}")
+        return "\n".join(lines) + "\n"
+
+    def serve_metrics(self, port=9464, host="127.0.0.1", extra_sources=()):
+        """
+        Starts a background HTTP server exposing GET /metrics. Returns the
+        server. `extra_sources` are callables returning more exposition text,
+        e.g. `get_scheduler().prometheus_text`.
+        """
+        return MetricsServer(self, host, port, extra_sources).start()
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class MetricsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, telemetry, host="127.0.0.1", port=9464, extra_sources=()):
+        super().__init__((host, port), _MetricsHandler)
+        self.telemetry = telemetry
+        self.extra_sources = list(extra_sources)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        text = self.server.telemetry.prometheus_text() + "".join(source() for source in self.server.extra_sources)
+        payload = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+_telemetry = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry():
+    """Returns the process-wide Telemetry, honouring GEMINI_TELEMETRY_JSONL."""
+    global _telemetry
+    if _telemetry is None:
+        with _telemetry_lock:
+            if _telemetry is None:
+                load_env()
+                _telemetry = Telemetry(jsonl_path=os.getenv("GEMINI_TELEMETRY_JSONL") or None)
+    return _telemetry
+
+
+def set_telemetry(telemetry):
+    global _telemetry
+    with _telemetry_lock:
+        _telemetry = telemetry
+
+
+def render_dashboard(telemetry=None):
+    """Builds a `rich` table of per-capability latency, stage breakdown and tokens."""
+    from rich.table import Table
+
+    telemetry = telemetry or get_telemetry()
+    table = Table(title="📊 Gemini Call Telemetry", expand=False)
+    table.add_column("Capability", style="bold cyan")
+    for name in ("Calls", "Errors", "Cached", "p50 ms", "p95 ms"):
+        table.add_column(name, justify="right")
+    for name in SPANS:
+        table.add_column(f"{name} ms", justify="right", style="dim")
+    for name in ("Tokens in/out/think", "KB up", "Slowest stage"):
+        table.add_column(name, justify="right")
+
+    for cap, s in telemetry.summary().items():
+        spans = s["mean_spans_s"]
+        tokens = s["tokens"]
+        table.add_row(
+            cap,
+            str(s["calls"]),
+            f"[red]{s['errors']}[/red]" if s["errors"] else "0",
+            str(s["cached"]),
+            f"{s['p50_s'] * 1000:.0f}",
+            f"{s['p95_s'] * 1000:.0f}",
+            *[f"{spans[name] * 1000:.1f}" if name in spans else "-" for name in SPANS],
+            f"{tokens.get('prompt', 0)}/{tokens.get('output', 0)}/{tokens.get('thinking', 0)}",
+            f"{s['bytes_uploaded'] / 1024:.1f}",
+            f"[yellow]{s['dominant_span']}[/yellow]" if s["dominant_span"] else "-",
+        )
+    if not table.rows:
+        table.caption = "No calls recorded yet. Run a capability first."
+    return table
+
+
+def live_dashboard(telemetry=None, refresh_s=1.0, duration_s=None, console=None):
+    """Redraws the dashboard every `refresh_s` until Ctrl+C (or `duration_s`)."""
+    from rich.live import Live
+
+    deadline = time.monotonic() + duration_s if duration_s else None
+    with Live(render_dashboard(telemetry), console=console, refresh_per_second=max(1, int(1 / refresh_s))) as live:
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                time.sleep(refresh_s)
+                live.update(render_dashboard(telemetry))
+        except KeyboardInterrupt:
+            pass
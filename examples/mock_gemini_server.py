@@ -0,0 +1,465 @@
+import json
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: LOCAL MOCK SERVER
+# -------------------------------------------------------------------------
+# A tiny stand-in for the Gemini REST endpoint so the pipelines in this repo
+# can be exercised offline. Point a client at it with:
+#
+#   client = genai.Client(
+#       api_key="mock",
+#       http_options=types.HttpOptions(base_url=server.base_url),
+#   )
+#
+# or set GEMINI_API_KEY=mock and GEMINI_BASE_URL=<server.base_url> so the
+# shared client from gemini_client.py uses it.
+#
+# Latency, jitter and error rate are configurable, and `responses` maps
+# prompt substrings to canned answers so one server can play perception,
+# planning, tool-use and video at once. An answer is either text or a list
+# of raw response parts, e.g. [{"functionCall": {"name": ..., "args": ...}}].
+#
+# The Files API (resumable upload) and cachedContents are emulated in memory
+# so context caching can be tested: requests that reference a cache report
+# its tokens as cachedContentTokenCount, and caches expire after their TTL.
+# -------------------------------------------------------------------------
+
+DEFAULT_RESPONSE_TEXT = '```json\n[{"box_2d": [100, 100, 500, 500], "label": "robot"}]\n```'
+
+# Rough token accounting for usageMetadata: ~4 characters per text token and
+# a flat cost per image, which is close to what the API reports.
+CHARS_PER_TOKEN = 4
+TOKENS_PER_IMAGE = 258
+# Uploaded files (videos) are billed by size: one token per this many bytes
+FILE_BYTES_PER_TOKEN = 100
+
+_ERROR_STATUS = {400: "INVALID_ARGUMENT", 429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}
+
+
+class MockGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, response_text=DEFAULT_RESPONSE_TEXT, latency_s=0.0,
+                 stream_chunk_chars=16, stream_chunk_delay_s=0.0, jitter_s=0.0, error_rate=0.0,
+                 error_status=503, responses=None, seed=None):
+        super().__init__((host, port), _MockGeminiHandler)
+        self.response_text = response_text
+        self.latency_s = latency_s
+        # Extra latency drawn uniformly from [0, jitter_s] per request
+        self.jitter_s = jitter_s
+        # Fraction of requests answered with `error_status` instead of content
+        self.error_rate = error_rate
+        self.error_status = error_status
+        # [(substring, text or parts)]: first substring found in the request wins
+        self.responses = list(responses or [])
+        # streamGenerateContent splits the response into chunks of this many characters
+        self.stream_chunk_chars = stream_chunk_chars
+        self.stream_chunk_delay_s = stream_chunk_delay_s
+        self.request_count = 0
+        self.error_count = 0
+        self.bytes_received = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # Files API and cachedContents state
+        self.files = {}
+        self.cached_contents = {}
+        self.upload_count = 0
+        self.cache_create_count = 0
+        self._uploads = {}
+        self._next_id = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def handle_error(self, request, client_address):
+        # Clients that hang up mid-response (deadlines, cancelled streams) are expected
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.request_count,
+                "errors": self.error_count,
+                "bytes_received": self.bytes_received,
+                "max_in_flight": self.max_in_flight,
+                "uploads": self.upload_count,
+                "files": len(self.files),
+                "caches_created": self.cache_create_count,
+                "cached_contents": len(self.cached_contents),
+            }
+
+    def pick_response(self, body):
+        for needle, text in self.responses:
+            if needle.encode("utf-8") in body:
+                return text
+        return self.response_text
+
+    def _enter_request(self, size):
+        with self._lock:
+            self.request_count += 1
+            self.bytes_received += size
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            delay = self.latency_s + (self._random.uniform(0, self.jitter_s) if self.jitter_s else 0.0)
+            fail = self.error_rate > 0 and self._random.random() < self.error_rate
+            if fail:
+                self.error_count += 1
+        return delay, fail
+
+    def _exit_request(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    # -- Files API -------------------------------------------------------
+
+    def _new_id(self, prefix):
+        self._next_id += 1
+        return f"{prefix}{self._next_id}"
+
+    def start_upload(self, request):
+        with self._lock:
+            upload_id = self._new_id("upload-")
+            self._uploads[upload_id] = (request.get("file") or {}, bytearray())
+        return f"{self.base_url}upload/v1beta/files?upload_id={upload_id}"
+
+    def append_upload(self, upload_id, chunk, finalize):
+        """Adds a chunk to a resumable upload; returns the File resource once finalized."""
+        with self._lock:
+            self.bytes_received += len(chunk)
+            meta, data = self._uploads[upload_id]
+            data.extend(chunk)
+            if not finalize:
+                return None
+            del self._uploads[upload_id]
+            file_id = self._new_id("mock-file-")
+            now = time.time()
+            resource = {
+                "name": f"files/{file_id}",
+                "displayName": _field(meta, "displayName", file_id),
+                "mimeType": _field(meta, "mimeType", "application/octet-stream"),
+                "sizeBytes": str(len(data)),
+                "createTime": _timestamp(now),
+                "expirationTime": _timestamp(now + 48 * 3600),
+                "uri": f"{self.base_url}v1beta/files/{file_id}",
+                "state": "ACTIVE",
+            }
+            self.files[resource["name"]] = resource
+            self.upload_count += 1
+            return resource
+
+    def file_tokens(self, uri):
+        """Token cost of an uploaded file, or None if `uri` is unknown."""
+        with self._lock:
+            for resource in self.files.values():
+                if resource["uri"] == uri:
+                    return max(TOKENS_PER_IMAGE, int(resource["sizeBytes"]) // FILE_BYTES_PER_TOKEN)
+        return None
+
+    # -- cachedContents --------------------------------------------------
+
+    def create_cached_content(self, request, body):
+        for content in request.get("contents", []):
+            for part in content.get("parts", []):
+                uri = _field(part.get("fileData", {}), "fileUri")
+                if uri and self.file_tokens(uri) is None:
+                    raise KeyError(f"File {uri} not found")
+        tokens = _prompt_tokens(request, self.file_tokens)
+        now = time.time()
+        with self._lock:
+            name = f"cachedContents/{self._new_id('mock-cache-')}"
+            resource = {
+                "name": name,
+                "displayName": request.get("displayName", ""),
+                "model": request.get("model", ""),
+                "createTime": _timestamp(now),
+                "updateTime": _timestamp(now),
+                "expireTime": _timestamp(_expire_at(request, now)),
+                "usageMetadata": {"totalTokenCount": tokens},
+            }
+            # The cached body takes part in `responses` substring matching
+            self.cached_contents[name] = (resource, body)
+            self.cache_create_count += 1
+            return resource
+
+    def get_cached_content(self, name):
+        """Returns (resource, cached request body), or None once expired or deleted."""
+        with self._lock:
+            entry = self.cached_contents.get(name)
+            if entry is not None and _parse_timestamp(entry[0]["expireTime"]) <= time.time():
+                del self.cached_contents[name]
+                entry = None
+            return entry
+
+    def update_cached_content(self, name, request):
+        entry = self.get_cached_content(name)
+        if entry is None:
+            return None
+        now = time.time()
+        with self._lock:
+            entry[0]["expireTime"] = _timestamp(_expire_at(request, now))
+            entry[0]["updateTime"] = _timestamp(now)
+            return entry[0]
+
+
+class _MockGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Keep test and benchmark output clean
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length)
+
+    def do_POST(self):
+        body = self._read_body()
+        path = self.path.split("?")[0]
+        if path.endswith(":generateContent") or path.endswith(":streamGenerateContent"):
+            self._generate(body, streaming=path.endswith(":streamGenerateContent"))
+        elif path == "/upload/v1beta/files":
+            self._upload(body)
+        elif path == "/v1beta/cachedContents":
+            try:
+                self._send_json(200, self.server.create_cached_content(json.loads(body or b"{}"), body))
+            except KeyError as e:
+                self._send_error(400, str(e.args[0]))
+        else:
+            self._send_error(404, f"Unknown path {self.path}")
+
+    def do_GET(self):
+        self._resource("GET")
+
+    def do_PATCH(self):
+        self._resource("PATCH", self._read_body())
+
+    def do_DELETE(self):
+        self._resource("DELETE")
+
+    def _resource(self, method, body=b""):
+        name = self.path.split("?")[0].removeprefix("/v1beta/")
+        if name.startswith("files/"):
+            resource = self.server.files.get(name)
+            if resource is not None and method == "DELETE":
+                with self.server._lock:
+                    self.server.files.pop(name, None)
+                resource = {}
+        elif name.startswith("cachedContents/"):
+            if method == "PATCH":
+                resource = self.server.update_cached_content(name, json.loads(body or b"{}"))
+            else:
+                entry = self.server.get_cached_content(name)
+                resource = entry[0] if entry is not None else None
+                if entry is not None and method == "DELETE":
+                    with self.server._lock:
+                        self.server.cached_contents.pop(name, None)
+                    resource = {}
+        else:
+            resource = None
+        if resource is None:
+            self._send_error(404, f"{name} not found")
+        else:
+            self._send_json(200, resource)
+
+    def _upload(self, body):
+        """Resumable upload: a start request returns the upload URL, chunks are POSTed to it."""
+        command = self.headers.get("X-Goog-Upload-Command", "")
+        query = self.path.partition("?")[2]
+        if "start" in command:
+            url = self.server.start_upload(json.loads(body or b"{}"))
+            self._send_json(200, {}, {"X-Goog-Upload-URL": url, "X-Goog-Upload-Status": "active"})
+            return
+        upload_id = query.partition("upload_id=")[2]
+        try:
+            resource = self.server.append_upload(upload_id, body, finalize="finalize" in command)
+        except KeyError:
+            self._send_error(404, f"Unknown upload {upload_id}")
+            return
+        if resource is None:
+            self._send_json(200, {}, {"X-Goog-Upload-Status": "active"})
+        else:
+            self._send_json(200, {"file": resource}, {"X-Goog-Upload-Status": "final"})
+
+    def _generate(self, body, streaming):
+        delay, fail = self.server._enter_request(len(body))
+        try:
+            if delay:
+                time.sleep(delay)
+            if fail:
+                self._send_error(self.server.error_status, "Injected failure from mock server")
+                return
+            cached = None
+            if b'"cachedContent"' in body:
+                name = json.loads(body).get("cachedContent")
+                cached = self.server.get_cached_content(name)
+                if cached is None:
+                    self._send_error(404, f"CachedContent {name} not found")
+                    return
+            text = self.server.pick_response(body + cached[1] if cached else body)
+            usage = estimate_usage(body, text, self.server.file_tokens)
+            if cached:
+                tokens = cached[0]["usageMetadata"]["totalTokenCount"]
+                usage["cachedContentTokenCount"] = tokens
+                usage["promptTokenCount"] += tokens
+                usage["totalTokenCount"] += tokens
+            if streaming and isinstance(text, str):
+                self._send_stream(text, usage)
+            else:
+                self._send_json(200, make_response_body(text, usage))
+        finally:
+            self.server._exit_request()
+
+    def _send_stream(self, text, usage=None):
+        """Sends the response as server-sent events, like `?alt=sse`."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        size = max(1, self.server.stream_chunk_chars)
+        starts = range(0, len(text), size)
+        for i in starts:
+            if i and self.server.stream_chunk_delay_s:
+                time.sleep(self.server.stream_chunk_delay_s)
+            last = i == starts[-1]
+            body = make_response_body(text[i:i + size], usage if last else None)
+            event = b"data: " + json.dumps(body).encode("utf-8") + b"\r\n\r\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _send_error(self, status, message):
+        self._send_json(status, {"error": {"code": status, "message": message,
+                                           "status": _ERROR_STATUS.get(status, "NOT_FOUND")}})
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def _field(obj, name, default=None):
+    """Reads a REST field by its camelCase or snake_case name; the API accepts both."""
+    snake = "".join("_" + c.lower() if c.isupper() else c for c in name)
+    return obj.get(name, obj.get(snake, default))
+
+
+def _timestamp(epoch_s):
+    return datetime.fromtimestamp(epoch_s, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _parse_timestamp(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def _expire_at(request, now):
+    if request.get("expireTime"):
+        return _parse_timestamp(request["expireTime"])
+    return now + float(str(request.get("ttl", "3600s")).rstrip("s"))
+
+
+def _prompt_tokens(request, file_tokens=None):
+    contents = list(request.get("contents", []))
+    if request.get("systemInstruction"):
+        contents.append(request["systemInstruction"])
+    tokens = 0
+    for content in contents:
+        for part in content.get("parts", []):
+            if "text" in part:
+                tokens += max(1, len(part["text"]) // CHARS_PER_TOKEN)
+            elif "fileData" in part and file_tokens is not None:
+                tokens += file_tokens(_field(part["fileData"], "fileUri")) or TOKENS_PER_IMAGE
+            elif "inlineData" in part or "fileData" in part:
+                tokens += TOKENS_PER_IMAGE
+            else:
+                tokens += max(1, len(json.dumps(part)) // CHARS_PER_TOKEN)
+    return tokens
+
+
+def estimate_usage(body, response_text, file_tokens=None):
+    """
+    Builds a usageMetadata dict from the request body and the answer.
+    `file_tokens(uri)` prices fileData parts that reference uploaded files.
+    """
+    try:
+        request = json.loads(body or b"{}")
+    except ValueError:
+        request = {}
+    prompt_tokens = _prompt_tokens(request, file_tokens)
+    if not isinstance(response_text, str):
+        response_text = json.dumps(response_text)
+    output_tokens = max(1, len(response_text) // CHARS_PER_TOKEN)
+    return {
+        "promptTokenCount": prompt_tokens,
+        "candidatesTokenCount": output_tokens,
+        "totalTokenCount": prompt_tokens + output_tokens,
+    }
+
+
+def make_response_body(text, usage=None):
+    """Builds a GenerateContentResponse body in the REST wire format. `text` may be a list of parts."""
+    parts = text if isinstance(text, list) else [{"text": text}]
+    body = {
+        "candidates": [
+            {
+                "content": {"role": "model", "parts": parts},
+                "finishReason": "STOP",
+                "index": 0,
+            }
+        ],
+        "modelVersion": "gemini-robotics-er-1.5-preview",
+    }
+    if usage:
+        body["usageMetadata"] = usage
+    return body
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the Gemini REST endpoint.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="base latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = MockGeminiServer(port=args.port, latency_s=args.latency, jitter_s=args.jitter,
+                              error_rate=args.error_rate)
+    print(f"🧪 Mock Gemini server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,157 @@
+import io
+import os
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+try:
+    from examples.image_payload import load_oriented
+except ImportError:
+    from image_payload import load_oriented
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: DETECTION OVERLAY RENDERING
+# -------------------------------------------------------------------------
+# Draws `point` / `box_2d` detections (normalized 0-1000, [y, x] order) onto
+# frames that are already decoded. All coordinates of a frame are converted
+# to pixels in one NumPy operation, and nothing touches the disk unless an
+# output directory or video is requested.
+#
+#   frame = render_detections(image, detections)           # PIL image
+#   jpeg  = render_detections(image, detections, "JPEG")   # bytes
+# -------------------------------------------------------------------------
+
+POINT_RADIUS = 10
+
+
+class DetectionArrays:
+    """Struct-of-arrays view of a detection list, split by geometry."""
+
+    def __init__(self, points, point_labels, boxes, box_labels):
+        self.points = points          # (N, 2) float [y, x]
+        self.point_labels = point_labels
+        self.boxes = boxes            # (M, 4) float [ymin, xmin, ymax, xmax]
+        self.box_labels = box_labels
+
+    def __len__(self):
+        return len(self.points) + len(self.boxes)
+
+
+def detections_to_arrays(detections):
+    """Packs detection dicts into arrays, skipping malformed entries."""
+    points, point_labels, boxes, box_labels = [], [], [], []
+    for item in detections or []:
+        if not isinstance(item, dict):
+            continue
+        if len(item.get("point") or ()) == 2:
+            points.append(item["point"])
+            point_labels.append(item.get("label"))
+        elif len(item.get("box_2d") or ()) == 4:
+            boxes.append(item["box_2d"])
+            box_labels.append(item.get("label"))
+    return DetectionArrays(
+        np.asarray(points, dtype=np.float32).reshape(-1, 2),
+        point_labels,
+        np.asarray(boxes, dtype=np.float32).reshape(-1, 4),
+        box_labels,
+    )
+
+
+def normalized_to_pixels(coords, width, height):
+    """
+    Converts an (N, 2k) array of normalized [y, x, y, x, ...] coordinates to
+    integer [x, y, x, y, ...] pixel coordinates clipped to the image.
+    """
+    coords = np.asarray(coords, dtype=np.float32)
+    pairs = coords.shape[-1] // 2
+    yx = coords.reshape(-1, pairs, 2) / 1000.0 * np.array([height, width], dtype=np.float32)
+    xy = yx[..., ::-1]
+    xy = np.clip(xy, 0, np.array([width - 1, height - 1], dtype=np.float32))
+    return xy.astype(np.int32).reshape(coords.shape[0], pairs * 2)
+
+
+def boxes_to_pixels(boxes, width, height):
+    """Returns (M, 4) [x0, y0, x1, y1] pixel boxes with x0 <= x1 and y0 <= y1."""
+    xy = normalized_to_pixels(boxes, width, height)
+    return np.concatenate([np.minimum(xy[:, :2], xy[:, 2:]), np.maximum(xy[:, :2], xy[:, 2:])], axis=1)
+
+
+def to_pil(image):
+    """Accepts a PIL image, an HxW(x3/4) uint8 RGB array, a path or encoded bytes."""
+    if isinstance(image, Image.Image):
+        return image
+    if isinstance(image, np.ndarray):
+        return Image.fromarray(image)
+    return load_oriented(image)
+
+
+def draw_detections(img, detections):
+    """Draws detections in place on a PIL image and returns it."""
+    arrays = detections if isinstance(detections, DetectionArrays) else detections_to_arrays(detections)
+    width, height = img.size
+    draw = ImageDraw.Draw(img)
+    r = POINT_RADIUS
+
+    for (px, py), label in zip(normalized_to_pixels(arrays.points, width, height).tolist(), arrays.point_labels):
+        draw.ellipse((px - r, py - r, px + r, py + r), fill='red', outline='white', width=2)
+        if label:
+            draw.text((px + 15, py - 10), str(label), fill="white")
+
+    for (x0, y0, x1, y1), label in zip(boxes_to_pixels(arrays.boxes, width, height).tolist(), arrays.box_labels):
+        draw.rectangle([x0, y0, x1, y1], outline='red', width=3)
+        if label:
+            draw.text((x0, y0 - 15), str(label), fill="red")
+    return img
+
+
+def render_detections(image, detections, output_format=None, quality=90):
+    """
+    Returns a copy of `image` with detections drawn on it.
+    If `output_format` ("JPEG", "PNG", "WEBP") is given, returns encoded bytes
+    instead of a PIL image. The source image is never modified.
+    """
+    # convert() always returns a new image, so the caller's frame is untouched
+    img = to_pil(image).convert("RGB")
+    draw_detections(img, detections)
+    if output_format is None:
+        return img
+    buf = io.BytesIO()
+    img.save(buf, format=output_format, quality=quality)
+    return buf.getvalue()
+
+
+def annotate_frames(frames, detections_seq):
+    """Lazily yields annotated PIL frames for paired frames/detection lists."""
+    for frame, detections in zip(frames, detections_seq):
+        yield render_detections(frame, detections)
+
+
+def render_sequence(frames, detections_seq, output_dir=None, output_video=None, fps=10.0,
+                    frame_format="JPEG"):
+    """
+    Annotates a whole frame sequence, streaming each frame to `output_dir`
+    (numbered files) and/or `output_video` (MP4 via OpenCV).
+    Frames are decoded at most once and never held in memory together.
+    Returns the number of frames written.
+    """
+    writer = None
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    ext = {"JPEG": "jpg"}.get(frame_format.upper(), frame_format.lower())
+
+    count = 0
+    try:
+        for count, img in enumerate(annotate_frames(frames, detections_seq), start=1):
+            if output_dir:
+                img.save(os.path.join(output_dir, f"frame_{count - 1:06d}.{ext}"), format=frame_format)
+            if output_video:
+                import cv2
+
+                if writer is None:
+                    writer = cv2.VideoWriter(output_video, cv2.VideoWriter_fourcc(*"mp4v"), fps, img.size)
+                rgb = np.asarray(img.convert("RGB"))
+                writer.write(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+    finally:
+        if writer is not None:
+            writer.release()
+    return count
@@ -0,0 +1,262 @@
+from google.genai import types
+import asyncio
+import mimetypes
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+
+try:
+    from examples import basic_spatial_query
+    from examples.gemini_client import get_async_client, get_client, run_with_async_client
+    from examples.response_cache import make_key
+    from examples.image_payload import optimize_image, sniff_mime
+    from examples.instrumentation import get_telemetry
+    from examples.scheduler import get_scheduler
+    from examples.thinking_budget import classify_prompt, thinking_tokens
+except ImportError:
+    import basic_spatial_query
+    from gemini_client import get_async_client, get_client, run_with_async_client
+    from response_cache import make_key
+    from image_payload import optimize_image, sniff_mime
+    from instrumentation import get_telemetry
+    from scheduler import get_scheduler
+    from thinking_budget import classify_prompt, thinking_tokens
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: CONCURRENT PERCEPTION ENGINE
+# -------------------------------------------------------------------------
+# `robot_perception_query` blocks on one frame per round-trip. This engine
+# uses the async client to keep a bounded number of frames in flight, so a
+# camera pipeline is limited by concurrency rather than by model latency.
+# -------------------------------------------------------------------------
+
+
+@dataclass
+class FrameResult:
+    index: int
+    source: str
+    text: str = None
+    detections: list = None
+    latency_s: float = 0.0
+    error: str = None
+    cached: bool = False
+    bytes_before: int = 0
+    bytes_after: int = 0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _describe_frame(frame):
+    if isinstance(frame, (bytes, bytearray, memoryview)):
+        return f"<{len(frame)} bytes>"
+    return os.fspath(frame)
+
+
+def _read_frame(frame):
+    """Returns (image_bytes, mime_type) for a path or in-memory frame."""
+    if isinstance(frame, (bytes, bytearray, memoryview)):
+        data = bytes(frame)
+        return data, sniff_mime(data) or "image/jpeg"
+    path = os.fspath(frame)
+    with open(path, "rb") as f:
+        data = f.read()
+    return data, sniff_mime(data) or mimetypes.guess_type(path)[0] or "image/jpeg"
+
+
+async def _aiter_frames(frames):
+    if hasattr(frames, "__aiter__"):
+        async for frame in frames:
+            yield frame
+    else:
+        for frame in frames:
+            yield frame
+
+
+class PerceptionEngine:
+    """
+    Runs spatial queries over a stream of frames with at most
+    `max_in_flight` requests outstanding. Frames are pulled from the source
+    only when a slot frees up, so memory stays bounded for endless streams.
+    An optional `response_cache.ResponseCache` short-circuits repeat frames,
+    and `payload_options` (kwargs for `image_payload.optimize_image`)
+    enables in-memory resize/re-encode before upload. A
+    `thinking_budget.ThinkingBudgetController` as `budget_controller`
+    replaces the fixed `thinking_budget`, with `deadline_s` per frame.
+    """
+
+    def __init__(self, client=None, model=basic_spatial_query.MODEL_ID, max_in_flight=4,
+                 temperature=0.5, thinking_budget=1024, cache=None, payload_options=None,
+                 budget_controller=None, deadline_s=None):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be >= 1")
+        if client is None and get_client() is None:
+            raise ValueError("No Gemini client available. Set GEMINI_API_KEY or pass client=.")
+        # None means the shared client, resolved per event loop in `stream`
+        self.client = client
+        self.model = model
+        self.max_in_flight = max_in_flight
+        self.temperature = temperature
+        self.thinking_budget = thinking_budget
+        self.cache = cache
+        self.payload_options = payload_options
+        self.budget_controller = budget_controller
+        self.deadline_s = deadline_s
+
+    def _config(self, thinking_budget=None):
+        return types.GenerateContentConfig(
+            temperature=self.temperature,
+            thinking_config=types.ThinkingConfig(
+                thinking_budget=self.thinking_budget if thinking_budget is None else thinking_budget),
+        )
+
+    async def _query(self, aio, index, frame, prompt_text):
+        source = _describe_frame(frame)
+        start = time.perf_counter()
+        try:
+            image_bytes, mime_type = await asyncio.to_thread(_read_frame, frame)
+            start = time.perf_counter()
+            budget = None
+            if self.budget_controller is not None:
+                budget = self.budget_controller.choose(classify_prompt(prompt_text), self.deadline_s)
+            config = self._config(budget.budget if budget else None)
+
+            with get_telemetry().trace("perception", model=self.model, frame=index) as call:
+                cache_key = None
+                text = None
+                if self.cache is not None:
+                    cache_key = make_key(self.model, prompt_text, image_bytes, config,
+                                         extra=self.payload_options)
+                    text = self.cache.get(cache_key)
+                cached = text is not None
+                bytes_before = bytes_after = len(image_bytes)
+
+                if cached:
+                    call.set(cache="response")
+                else:
+                    if self.payload_options is not None:
+                        with call.span("encode"):
+                            payload = await asyncio.to_thread(optimize_image, image_bytes, **self.payload_options)
+                        image_bytes, mime_type = payload.data, payload.mime_type
+                        bytes_after = payload.bytes_after
+                    call.add_bytes(len(image_bytes) + len(prompt_text.encode("utf-8")))
+                    response = await get_scheduler().acall(
+                        lambda: aio.models.generate_content(
+                            model=self.model,
+                            contents=[
+                                types.Part.from_bytes(data=image_bytes, mime_type=mime_type),
+                                prompt_text,
+                            ],
+                            config=config,
+                        ),
+                        "perception",
+                        trace=call,
+                    )
+                    model_latency_s = call.record.spans["model"]
+                    call.record_usage(response)
+                    text = response.text
+                    if self.cache is not None and text:
+                        self.cache.put(cache_key, text)
+
+                with call.span("parse"):
+                    detections = basic_spatial_query.parse_json_response(text or "")
+                if budget is not None and not cached:
+                    call.set(thinking_budget=budget.budget)
+                    self.budget_controller.record(budget, model_latency_s, valid=isinstance(detections, list),
+                                                  thinking_tokens=thinking_tokens(response))
+
+            return FrameResult(
+                index=index,
+                source=source,
+                text=text,
+                detections=detections,
+                latency_s=time.perf_counter() - start,
+                cached=cached,
+                bytes_before=bytes_before,
+                bytes_after=bytes_after,
+            )
+        except Exception as e:
+            return FrameResult(index=index, source=source,
+                               latency_s=time.perf_counter() - start, error=str(e))
+
+    async def stream(self, frames, prompt_text, ordered=True):
+        """
+        Async generator yielding a FrameResult per frame.
+        `frames` may be a sync or async iterable of paths or image bytes.
+        With ordered=False results are yielded as soon as they complete.
+        """
+        aio = self.client.aio if self.client is not None else get_async_client()
+        source = _aiter_frames(frames)
+        pending = deque()
+        exhausted = False
+        index = 0
+        try:
+            while True:
+                while not exhausted and len(pending) < self.max_in_flight:
+                    try:
+                        frame = await source.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    pending.append(asyncio.create_task(self._query(aio, index, frame, prompt_text)))
+                    index += 1
+
+                if not pending:
+                    break
+
+                if ordered:
+                    yield await pending.popleft()
+                else:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in sorted(done, key=lambda t: t.result().index):
+                        pending.remove(task)
+                        yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def run_async(self, frames, prompt_text, ordered=True):
+        return [result async for result in self.stream(frames, prompt_text, ordered=ordered)]
+
+    def run(self, frames, prompt_text, ordered=True):
+        """Blocking helper for scripts: returns the list of FrameResults."""
+        return run_with_async_client(self.run_async(frames, prompt_text, ordered=ordered))
+
+
+def summarize(results, wall_time_s=None):
+    """Prints per-frame latency and aggregate throughput for a batch."""
+    print("\n📊 Perception Engine Results:")
+    print("--------------------------------------------------")
+    for r in results:
+        status = f"{len(r.detections)} items" if isinstance(r.detections, list) else (r.error or "unparsed")
+        print(f"  [{r.index:>4}] {r.source:<30} {r.latency_s * 1000:8.1f} ms  {status}")
+    print("--------------------------------------------------")
+    latencies = sorted(r.latency_s for r in results if r.ok)
+    if latencies:
+        print(f"  Frames OK: {len(latencies)}/{len(results)}  "
+              f"mean latency: {sum(latencies) / len(latencies) * 1000:.1f} ms  "
+              f"max: {latencies[-1] * 1000:.1f} ms")
+    if wall_time_s:
+        print(f"  Throughput: {len(results) / wall_time_s:.2f} frames/s over {wall_time_s:.2f} s")
+
+
+if __name__ == "__main__":
+    from PIL import Image
+
+    if not os.path.exists("robot_view.jpg"):
+        print("Creating dummy robot_view.jpg for demonstration...")
+        Image.new('RGB', (640, 480), color='gray').save('robot_view.jpg')
+
+    engine = PerceptionEngine(max_in_flight=4)
+    start = time.perf_counter()
+    results = engine.run(
+        ["robot_view.jpg"] * 8,
+        """
+        Point to the center of the image.
+        Return bounding boxes as a JSON array with labels.
+        Format: [{"box_2d": [ymin, xmin, ymax, xmax], "label": "label"}] normalized to 0-1000.
+        """,
+    )
+    summarize(results, time.perf_counter() - start)
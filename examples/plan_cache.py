@@ -0,0 +1,293 @@
+import hashlib
+import json
+import re
+from collections import OrderedDict
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: PLAN TEMPLATE CACHE
+# -------------------------------------------------------------------------
+# Operators issue the same shapes of command over and over:
+#   "find the apple on the table and throw it away"
+#   "find the cup on the counter and throw it away"
+# After one validated plan from the model, we turn the command into a
+# template with object/location slots and serve later commands of the same
+# shape by substitution, without a model call.
+# -------------------------------------------------------------------------
+
+MIN_LITERAL_WORDS = 2
+MAX_SLOT_WORDS = 4
+# A slot is one noun phrase; these words start another clause ("... and open gripper")
+# or another object ("the apple and the knife"). Commas are gone after canonicalization.
+CLAUSE_WORDS = frozenset({"and", "then", "but", "or", "after", "before", "while", "also"})
+# Trailing modifiers ("go to the kitchen slowly") change how the plan should run,
+# so they end a slot too; so does any -ly adverb after the slot's first word.
+MODIFIER_WORDS = frozenset({"now", "again", "first", "later", "please", "too", "fast", "here", "there",
+                            "immediately", "asap"})
+
+
+def _is_modifier(word):
+    return word in MODIFIER_WORDS or (len(word) > 4 and word.endswith("ly"))
+
+_PRIMITIVE_RE = re.compile(r"^\s*\d+\.\s*(\w+)\(([^)]*)\)", re.MULTILINE)
+_STEP_STRING_RE = re.compile(r"^\s*(\w+)\s*\((.*)\)\s*$")
+_ACTION_KEYS = ("action", "primitive", "name", "function", "step")
+_ARG_KEYS = ("target", "object", "location", "object_name", "location_name", "arg", "argument")
+_LEADING_FILLER = ("please ", "robot ", "hey robot ", "can you ", "could you ")
+
+
+class PlanValidationError(ValueError):
+    pass
+
+
+def parse_primitives(system_prompt):
+    """Returns {primitive_name: arity} from the numbered list in a system prompt."""
+    primitives = {}
+    for name, params in _PRIMITIVE_RE.findall(system_prompt):
+        primitives[name] = len([p for p in params.split(",") if p.strip()])
+    return primitives
+
+
+def primitives_fingerprint(primitives):
+    return hashlib.sha256(json.dumps(sorted(primitives.items())).encode("utf-8")).hexdigest()[:16]
+
+
+def canonicalize_command(command):
+    """Lowercases, strips punctuation and filler so equivalent phrasings compare equal."""
+    text = command.lower().replace("_", " ")
+    text = re.sub(r"[^\w\s'-]", " ", text)
+    text = " ".join(text.split())
+    changed = True
+    while changed:
+        changed = False
+        for filler in _LEADING_FILLER:
+            if text.startswith(filler):
+                text = text[len(filler):]
+                changed = True
+    return text
+
+
+def normalize_step(step):
+    """
+    Accepts the step shapes models commonly return and yields (action, args):
+      "move_to(table)", {"action": "move_to", "target": "table"},
+      {"primitive": "move_to", "args": ["table"]}
+    """
+    if isinstance(step, str):
+        match = _STEP_STRING_RE.match(step)
+        if not match:
+            raise PlanValidationError(f"Unparseable step: {step!r}")
+        action, raw_args = match.groups()
+        args = [a.strip().strip("'\"") for a in raw_args.split(",") if a.strip()]
+        return action, args
+
+    if not isinstance(step, dict):
+        raise PlanValidationError(f"Unsupported step type: {type(step).__name__}")
+
+    action = next((step[k] for k in _ACTION_KEYS if isinstance(step.get(k), str)), None)
+    if action is None:
+        raise PlanValidationError(f"Step has no action: {step!r}")
+
+    if "args" in step or "arguments" in step or "parameters" in step:
+        raw = step.get("args", step.get("arguments", step.get("parameters")))
+        args = list(raw.values()) if isinstance(raw, dict) else list(raw if isinstance(raw, list) else [raw])
+    else:
+        args = [step[k] for k in _ARG_KEYS if k in step]
+    return action, [str(a) for a in args]
+
+
+def format_step(action, args):
+    if not args:
+        return {"action": action}
+    if len(args) == 1:
+        return {"action": action, "target": args[0]}
+    return {"action": action, "args": list(args)}
+
+
+def validate_plan(plan, primitives):
+    """
+    Checks that `plan` is a non-empty list of steps using only `primitives`
+    with the right number of arguments. Returns [(action, args), ...].
+    """
+    if not isinstance(plan, list) or not plan:
+        raise PlanValidationError("Plan must be a non-empty JSON list")
+    steps = []
+    for step in plan:
+        action, args = normalize_step(step)
+        if action not in primitives:
+            raise PlanValidationError(f"Unknown primitive '{action}'")
+        if len(args) != primitives[action]:
+            raise PlanValidationError(f"'{action}' expects {primitives[action]} argument(s), got {len(args)}")
+        steps.append((action, args))
+    return steps
+
+
+def _phrase(arg):
+    return " ".join(arg.lower().replace("_", " ").split())
+
+
+class PlanTemplate:
+    """A canonical command with slots plus the plan steps that reference them."""
+
+    def __init__(self, command_template, slot_styles, steps):
+        self.command_template = command_template  # e.g. "find the {0} on the {1} and throw it away"
+        self.slot_styles = slot_styles            # "underscore" or "space" per slot
+        self.steps = steps                        # [(action, [arg or {"$slot": i}])]
+        pattern, seen = "", set()
+        for i, part in enumerate(re.split(r"\{(\d+)\}", command_template)):
+            if i % 2 == 0:
+                pattern += re.escape(part)
+            elif part in seen:
+                # A slot mentioned twice must be filled with the same words twice
+                pattern += f"(?P=s{part})"
+            else:
+                seen.add(part)
+                pattern += f"(?P<s{part}>.+?)"
+        self._regex = re.compile(pattern + r"$")
+        self.hits = 0
+
+    @classmethod
+    def from_plan(cls, canonical_command, steps):
+        # Every distinct argument that is spelled out in the command becomes a slot,
+        # longest first so "kitchen table" wins over "table".
+        args = sorted({a for _, step_args in steps for a in step_args}, key=len, reverse=True)
+        template = canonical_command
+        slots = {}
+        for arg in args:
+            phrase = _phrase(arg)
+            pattern = r"(?<![\w{])" + re.escape(phrase) + r"(?![\w}])"
+            if not phrase or not re.search(pattern, template):
+                continue
+            slots[arg] = len(slots)
+            template = re.sub(pattern, "{%d}" % slots[arg], template)
+
+        # Without at least two literal words a template would match almost
+        # anything, so fall back to an exact-match entry
+        if slots and len(re.sub(r"\{\d+\}", " ", template).split()) < MIN_LITERAL_WORDS:
+            template, slots = canonical_command, {}
+
+        styles = [None] * len(slots)
+        for arg, i in slots.items():
+            styles[i] = "underscore" if "_" in arg else "space"
+        templated_steps = [
+            (action, [{"$slot": slots[a]} if a in slots else a for a in step_args])
+            for action, step_args in steps
+        ]
+        return cls(template, styles, templated_steps)
+
+    def match(self, canonical_command):
+        """Returns the slot values if the command has this template's shape."""
+        m = self._regex.match(canonical_command)
+        if not m:
+            return None
+        values = [m.group(f"s{i}").strip() for i in range(len(self.slot_styles))]
+        # Slot values may not swallow another clause or a modifier of the command
+        for value in values:
+            words = value.split()
+            if not words or len(words) > MAX_SLOT_WORDS or CLAUSE_WORDS.intersection(words):
+                return None
+            if any(_is_modifier(word) for word in words[1:]):
+                return None
+        return values
+
+    def render(self, values):
+        filled = [v.replace(" ", "_") if style == "underscore" else v for v, style in zip(values, self.slot_styles)]
+        return [
+            format_step(action, [filled[a["$slot"]] if isinstance(a, dict) else a for a in args])
+            for action, args in self.steps
+        ]
+
+    def to_dict(self):
+        return {"command_template": self.command_template, "slot_styles": self.slot_styles, "steps": self.steps}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["command_template"], data["slot_styles"], [tuple(s) for s in data["steps"]])
+
+
+class PlanCache:
+    """
+    Stores validated plans as slot templates keyed by command shape.
+    The cache is tied to a primitive set: if the system prompt's primitives
+    change, every template is dropped.
+    """
+
+    def __init__(self, system_prompt, max_templates=512):
+        self.max_templates = max_templates
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.rejected = 0
+        self._templates = OrderedDict()
+        self.primitives = parse_primitives(system_prompt)
+        self.fingerprint = primitives_fingerprint(self.primitives)
+
+    def sync_primitives(self, system_prompt):
+        """Drops all templates if the primitive set in `system_prompt` changed."""
+        primitives = parse_primitives(system_prompt)
+        fingerprint = primitives_fingerprint(primitives)
+        if fingerprint != self.fingerprint:
+            self._templates.clear()
+            self.primitives = primitives
+            self.fingerprint = fingerprint
+            self.invalidations += 1
+
+    def lookup(self, command):
+        """Returns a plan for `command` from a matching template, or None."""
+        canonical = canonicalize_command(command)
+        for key, template in reversed(self._templates.items()):
+            values = template.match(canonical)
+            if values is not None:
+                template.hits += 1
+                self.hits += 1
+                self._templates.move_to_end(key)
+                return template.render(values)
+        self.misses += 1
+        return None
+
+    def store(self, command, plan):
+        """
+        Validates `plan` against the primitive set and stores its template.
+        Returns False (and stores nothing) if the plan is invalid.
+        """
+        try:
+            steps = validate_plan(plan, self.primitives)
+        except PlanValidationError:
+            self.rejected += 1
+            return False
+        template = PlanTemplate.from_plan(canonicalize_command(command), steps)
+        self._templates[template.command_template] = template
+        self._templates.move_to_end(template.command_template)
+        while len(self._templates) > self.max_templates:
+            self._templates.popitem(last=False)
+        return True
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "templates": len(self._templates),
+            "invalidations": self.invalidations,
+            "rejected": self.rejected,
+        }
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint,
+                       "templates": [t.to_dict() for t in self._templates.values()]}, f, indent=2)
+
+    def load(self, path):
+        """Loads templates saved by `save`, ignoring them if the primitives changed since."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("fingerprint") != self.fingerprint:
+            self.invalidations += 1
+            return 0
+        for item in data["templates"]:
+            template = PlanTemplate.from_dict(item)
+            self._templates[template.command_template] = template
+        return len(data["templates"])
+
+    def __len__(self):
+        return len(self._templates)
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: CONTENT-ADDRESSED RESPONSE CACHE
+# -------------------------------------------------------------------------
+# Static fixtures, replays and regression runs send the exact same image +
+# prompt + config over and over. Keying responses by a hash of everything
+# that influences the answer lets repeat calls skip the model round-trip.
+#
+#   cache = ResponseCache(disk_dir=".gemini_cache", ttl_s=24 * 3600)
+#   robot_perception_query("robot_view.jpg", prompt, cache=cache)
+# -------------------------------------------------------------------------
+
+_MISSING = object()
+
+
+def _config_fingerprint(config):
+    if config is None:
+        return None
+    if hasattr(config, "model_dump"):
+        config = config.model_dump(mode="json", exclude_none=True)
+    return json.dumps(config, sort_keys=True, default=str)
+
+
+def make_key(model, prompt, payload=b"", config=None, extra=None):
+    """
+    Returns a hex digest identifying a request by (model, payload bytes,
+    prompt, config). `config` may be a GenerateContentConfig or a plain dict.
+    `extra` folds in anything else that changes the request, such as the
+    preprocessing settings applied to `payload` before upload.
+    """
+    h = hashlib.sha256()
+    for part in (model, prompt, _config_fingerprint(config), _config_fingerprint(extra)):
+        encoded = ("" if part is None else str(part)).encode("utf-8")
+        h.update(len(encoded).to_bytes(8, "little"))
+        h.update(encoded)
+    h.update(len(payload).to_bytes(8, "little"))
+    h.update(payload)
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache: an in-memory LRU of `max_items` entries in front of an
+    optional on-disk store bounded to `max_disk_bytes`. Entries older than
+    `ttl_s` (if set) are treated as misses and dropped.
+    Memory values may be any object; disk values must be JSON-serializable.
+    """
+
+    def __init__(self, max_items=256, disk_dir=None, max_disk_bytes=256 * 1024 * 1024, ttl_s=None):
+        self.max_items = max_items
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_s = ttl_s
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    def _expired(self, stored_at, now):
+        return self.ttl_s is not None and now - stored_at > self.ttl_s
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + ".json")
+
+    def _disk_entries(self):
+        """Yields (path, size, mtime) for every entry on disk."""
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def _remove_disk_file(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self._disk_bytes -= size
+        except FileNotFoundError:
+            pass
+
+    def _remember(self, key, stored_at, value):
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key, _MISSING)
+            if entry is not _MISSING:
+                stored_at, value = entry
+                if not self._expired(stored_at, now):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+            if self.disk_dir:
+                value = self._disk_get(key, now)
+                if value is not _MISSING:
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return default
+
+    def _disk_get(self, key, now):
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return _MISSING
+        if self._expired(record["stored_at"], now):
+            self._remove_disk_file(path)
+            return _MISSING
+        # Touch so eviction is least-recently-used rather than oldest-written
+        os.utime(path)
+        self._remember(key, record["stored_at"], record["value"])
+        return record["value"]
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self.disk_dir:
+                self._disk_put(key, now, value)
+
+    def _disk_put(self, key, stored_at, value):
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = json.dumps({"stored_at": stored_at, "value": value}).encode("utf-8")
+        self._remove_disk_file(path)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        self._disk_bytes += len(payload)
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        for path, _, _ in sorted(self._disk_entries(), key=lambda e: e[2]):
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            self._remove_disk_file(path)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.disk_dir:
+                for path, _, _ in list(self._disk_entries()):
+                    self._remove_disk_file(path)
+
+    @property
+    def hits(self):
+        return self.memory_hits + self.disk_hits
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_items": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+        }
+
+    def __len__(self):
+        return len(self._memory)
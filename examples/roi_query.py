@@ -0,0 +1,308 @@
+from google.genai import types
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+from PIL import Image
+
+try:
+    from examples.basic_spatial_query import MODEL_ID, parse_json_response
+    from examples.gemini_client import get_client
+    from examples.instrumentation import get_telemetry
+    from examples.scheduler import get_scheduler
+    from examples.overlay import to_pil
+    from examples.tracker import box_iou
+except ImportError:
+    from basic_spatial_query import MODEL_ID, parse_json_response
+    from gemini_client import get_client
+    from instrumentation import get_telemetry
+    from scheduler import get_scheduler
+    from overlay import to_pil
+    from tracker import box_iou
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: COARSE-TO-FINE ROI QUERYING
+# -------------------------------------------------------------------------
+# Small parts (screws, connectors, serial plates) vanish when a 12MP frame
+# is downscaled to 1024px, but uploading the full frame is slow. Two-stage
+# querying gets both:
+#   1. A downscaled pass over the whole frame finds regions of interest.
+#   2. Each region is cropped from the full-resolution frame and queried in
+#      parallel with the real prompt.
+# Crop answers are in crop-local 0-1000 coordinates; they are remapped to
+# full-frame 0-1000 coordinates and duplicates from overlapping crops are
+# merged with label-aware NMS.
+#
+#   result = coarse_to_fine_query(frame, "Identify every screw. Return box_2d JSON.")
+#   visualize_results(frame, None, output_path=None, detections=result.detections)
+# -------------------------------------------------------------------------
+
+ROI_PROMPT = """
+This is a downscaled view of a robot work cell. Find the regions of this image
+that need a closer, high-resolution look for this task:
+
+{task}
+
+Mark every region where the items could be, even if they are too small to
+identify here. Return ONLY a JSON array of regions:
+[{{"box_2d": [ymin, xmin, ymax, xmax], "label": "region"}}] normalized to 0-1000.
+Return [] if there is nothing relevant.
+"""
+
+
+@dataclass
+class RoiQueryResult:
+    detections: list
+    rois: list = field(default_factory=list)
+    calls: int = 0
+    bytes_uploaded: int = 0
+    coarse_s: float = 0.0
+    fine_s: float = 0.0
+    total_s: float = 0.0
+    failed_crops: int = 0
+    full_frame: bool = False  # the coarse pass found nothing, so the whole frame was queried
+
+    def summary(self):
+        return (f"🔎 {len(self.rois)} ROI(s), {len(self.detections)} detection(s) in {self.calls} calls: "
+                f"coarse {self.coarse_s * 1000:.0f} ms + crops {self.fine_s * 1000:.0f} ms = "
+                f"{self.total_s * 1000:.0f} ms, {self.bytes_uploaded / 1024:.0f} KB uploaded")
+
+
+def encode_region(img, box=None, max_edge=None, quality=85):
+    """
+    JPEG-encodes `img`, optionally cropped to a pixel box (x0, y0, x1, y1)
+    and downsized to `max_edge`.
+    """
+    if box is not None:
+        img = img.crop(box)
+    if max_edge and max(img.size) > max_edge:
+        scale = max_edge / max(img.size)
+        img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))),
+                         Image.Resampling.BILINEAR, reducing_gap=2.0)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def expand_rois(boxes, padding=0.15, min_size=80.0, max_rois=6, merge_iou=0.5):
+    """
+    Turns coarse detections into crop regions (normalized [ymin, xmin, ymax,
+    xmax]): each box is padded by `padding` of its size on every side, grown
+    to at least `min_size`, clipped to the frame, and regions overlapping a
+    larger one by `merge_iou` or more are dropped. At most `max_rois` are
+    returned, largest first.
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    if not len(boxes):
+        return boxes
+    lo = np.minimum(boxes[:, :2], boxes[:, 2:])
+    hi = np.maximum(boxes[:, :2], boxes[:, 2:])
+    center = (lo + hi) / 2
+    half = np.maximum((hi - lo) * (0.5 + padding), min_size / 2)
+    lo = np.clip(center - half, 0, 1000)
+    hi = np.clip(center + half, 0, 1000)
+    rois = np.concatenate([lo, hi], axis=1)
+
+    order = np.argsort(-np.prod(hi - lo, axis=1), kind="stable")
+    iou = box_iou(rois, rois)
+    kept = []
+    for i in order:
+        if all(iou[i, k] < merge_iou for k in kept):
+            kept.append(i)
+    return rois[kept[:max_rois]]
+
+
+def remap_detections(detections, roi):
+    """Maps crop-local 0-1000 detections into full-frame 0-1000 coordinates of `roi`."""
+    y0, x0, y1, x1 = (float(v) for v in roi)
+    scale = np.array([(y1 - y0) / 1000.0, (x1 - x0) / 1000.0])
+    offset = np.array([y0, x0])
+    remapped = []
+    for item in detections or []:
+        if not isinstance(item, dict):
+            continue
+        item = dict(item)
+        if len(item.get("point") or ()) == 2:
+            item["point"] = np.round(np.asarray(item["point"], dtype=float) * scale + offset, 1).tolist()
+        elif len(item.get("box_2d") or ()) == 4:
+            coords = np.asarray(item["box_2d"], dtype=float).reshape(2, 2)
+            item["box_2d"] = np.round(coords * scale + offset, 1).ravel().tolist()
+        else:
+            continue
+        remapped.append(item)
+    return remapped
+
+
+def merge_detections(detections, iou_threshold=0.5, containment=0.85, point_distance=15.0):
+    """
+    Label-aware NMS across crops. Boxes are kept largest first, since a copy
+    clipped by a crop border is smaller than the whole object; a box is
+    dropped when it overlaps a kept one of the same label by `iou_threshold`
+    or lies `containment` inside it. Points closer than `point_distance` to a
+    kept point of the same label are dropped.
+    """
+    boxes = [d for d in detections if "box_2d" in d]
+    points = [d for d in detections if "point" in d]
+    kept = []
+
+    if boxes:
+        coords = np.asarray([d["box_2d"] for d in boxes], dtype=np.float32)
+        lo = np.minimum(coords[:, :2], coords[:, 2:])
+        hi = np.maximum(coords[:, :2], coords[:, 2:])
+        area = np.prod(hi - lo, axis=1)
+        iou = box_iou(coords, coords)
+        # Intersection over the smaller box, from IoU and the two areas
+        inter = iou * (area[:, None] + area[None, :]) / (1 + iou)
+        smaller = np.minimum(area[:, None], area[None, :])
+        inside = np.where(smaller > 0, inter / np.maximum(smaller, 1e-9), 0.0)
+        kept_boxes = []
+        for i in np.argsort(-area, kind="stable"):
+            label = str(boxes[i].get("label", "")).lower()
+            if all(str(boxes[k].get("label", "")).lower() != label
+                   or (iou[i, k] < iou_threshold and inside[i, k] < containment) for k in kept_boxes):
+                kept_boxes.append(i)
+        kept.extend(boxes[i] for i in sorted(kept_boxes))
+
+    kept_points = []
+    for d in points:
+        label = str(d.get("label", "")).lower()
+        if all(str(k.get("label", "")).lower() != label
+               or np.hypot(*np.subtract(d["point"], k["point"])) >= point_distance for k in kept_points):
+            kept_points.append(d)
+    return kept + kept_points
+
+
+def _query(client, model, data, prompt_text, config, stage, **attrs):
+    with get_telemetry().trace("perception", model=model, stage=stage, **attrs) as call:
+        call.add_bytes(len(data) + len(prompt_text.encode("utf-8")))
+        response = get_scheduler().call(
+            lambda: client.models.generate_content(
+                model=model,
+                contents=[types.Part.from_bytes(data=data, mime_type="image/jpeg"), prompt_text],
+                config=config,
+            ),
+            "perception",
+            trace=call,
+        )
+        call.record_usage(response)
+        with call.span("parse"):
+            return parse_json_response(response.text or "")
+
+
+def _config(thinking_budget):
+    return types.GenerateContentConfig(
+        temperature=0.5,
+        thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget),
+    )
+
+
+def coarse_to_fine_query(image, prompt_text, coarse_edge=768, crop_edge=1024, padding=0.15, min_roi_size=80.0,
+                         max_rois=6, max_workers=4, thinking_budget=0, client=None, model=MODEL_ID):
+    """
+    Two-stage spatial query on `image` (path, bytes, PIL image or array).
+    Returns a RoiQueryResult whose detections are in full-frame 0-1000
+    coordinates. Crops that fail are counted in `failed_crops`. If the
+    coarse pass finds no regions, the whole frame is queried once at
+    `crop_edge` instead (`full_frame` is set).
+    """
+    client = client or get_client()
+    if client is None:
+        raise RuntimeError("No Gemini client available. Check GEMINI_API_KEY.")
+    start = time.perf_counter()
+    img = to_pil(image)
+    width, height = img.size
+    config = _config(thinking_budget)
+    result = RoiQueryResult(detections=[])
+
+    roi_prompt = ROI_PROMPT.format(task=prompt_text)
+    coarse = encode_region(img, max_edge=coarse_edge)
+    regions = _query(client, model, coarse, roi_prompt, config, "coarse")
+    result.calls += 1
+    result.bytes_uploaded += len(coarse) + len(roi_prompt.encode("utf-8"))
+    boxes = [r["box_2d"] for r in regions or [] if isinstance(r, dict) and len(r.get("box_2d") or ()) == 4]
+    rois = expand_rois(boxes, padding, min_roi_size, max_rois)
+    if not len(rois):
+        # Parts too small to see at coarse resolution would otherwise return nothing
+        rois = np.array([[0, 0, 1000, 1000]], dtype=np.float32)
+        result.full_frame = True
+    result.rois = rois.round(1).tolist()
+    result.coarse_s = time.perf_counter() - start
+
+    def crop_query(index_roi):
+        index, roi = index_roi
+        y0, x0, y1, x1 = roi
+        pixel_box = (int(x0 / 1000 * width), int(y0 / 1000 * height),
+                     max(int(x0 / 1000 * width) + 1, round(x1 / 1000 * width)),
+                     max(int(y0 / 1000 * height) + 1, round(y1 / 1000 * height)))
+        data = encode_region(img, pixel_box, max_edge=crop_edge)
+        # Remap against the pixel box actually sent, not the rounded-off ROI
+        sent_roi = (pixel_box[1] / height * 1000, pixel_box[0] / width * 1000,
+                    pixel_box[3] / height * 1000, pixel_box[2] / width * 1000)
+        try:
+            found = _query(client, model, data, prompt_text, config, "crop", roi=index)
+        except Exception as e:
+            print(f"❌ Crop {index} failed: {e}")
+            return len(data), None
+        return len(data), remap_detections(found if isinstance(found, list) else [], sent_roi)
+
+    fine_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(rois)))) as pool:
+        crops = list(pool.map(crop_query, enumerate(rois.tolist())))
+    found = []
+    for size, detections in crops:
+        result.calls += 1
+        result.bytes_uploaded += size + len(prompt_text.encode("utf-8"))
+        if detections is None:
+            result.failed_crops += 1
+        else:
+            found.extend(detections)
+    result.detections = merge_detections(found)
+    result.fine_s = time.perf_counter() - fine_start
+    result.total_s = time.perf_counter() - start
+    return result
+
+
+def full_resolution_query(image, prompt_text, thinking_budget=0, client=None, model=MODEL_ID):
+    """The single-call baseline: the whole frame at native resolution. Returns (detections, latency_s, bytes)."""
+    client = client or get_client()
+    if client is None:
+        raise RuntimeError("No Gemini client available. Check GEMINI_API_KEY.")
+    start = time.perf_counter()
+    data = encode_region(to_pil(image))
+    detections = _query(client, model, data, prompt_text, _config(thinking_budget), "full")
+    return detections, time.perf_counter() - start, len(data) + len(prompt_text.encode("utf-8"))
+
+
+def compare_with_full_resolution(image, prompt_text, **kwargs):
+    """Runs both modes on `image` and prints latency and upload size side by side."""
+    img = to_pil(image)
+    two_stage = coarse_to_fine_query(img, prompt_text, **kwargs)
+    full_detections, full_s, full_bytes = full_resolution_query(
+        img, prompt_text, thinking_budget=kwargs.get("thinking_budget", 0), client=kwargs.get("client"),
+        model=kwargs.get("model", MODEL_ID))
+    report = {
+        "two_stage": {"latency_s": round(two_stage.total_s, 3), "bytes_uploaded": two_stage.bytes_uploaded,
+                      "calls": two_stage.calls, "detections": len(two_stage.detections)},
+        "full_resolution": {"latency_s": round(full_s, 3), "bytes_uploaded": full_bytes, "calls": 1,
+                            "detections": len(full_detections) if isinstance(full_detections, list) else 0},
+    }
+    report["latency_ratio"] = round(two_stage.total_s / full_s, 3) if full_s else None
+    report["bytes_ratio"] = round(two_stage.bytes_uploaded / full_bytes, 3) if full_bytes else None
+
+    print(two_stage.summary())
+    print(f"🖼️  Full resolution ({img.width}x{img.height}): {full_s * 1000:.0f} ms, {full_bytes / 1024:.0f} KB")
+    print(f"⚖️  Two-stage vs full: latency x{report['latency_ratio']}, bytes x{report['bytes_ratio']}")
+    return report
+
+
+if __name__ == "__main__":
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "assets/part_identification.png"
+    compare_with_full_resolution(path, """Identify every small part (screws, nuts, connectors) and its type.
+Return bounding boxes as a JSON array with labels.
+Format: [{"box_2d": [ymin, xmin, ymax, xmax], "label": "label"}] normalized to 0-1000.""")
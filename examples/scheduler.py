@@ -0,0 +1,573 @@
+import asyncio
+import contextvars
+import itertools
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait as wait_futures
+from contextlib import contextmanager
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    from examples.gemini_client import load_env
+    from examples.instrumentation import _labels
+except ImportError:
+    from gemini_client import load_env
+    from instrumentation import _labels
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: REQUEST SCHEDULER
+# -------------------------------------------------------------------------
+# When several robots share one API key, a perception flood can starve the
+# safety and planning calls and run the key into quota errors. Every model
+# call site goes through this process-wide scheduler:
+#
+#   response = get_scheduler().call(
+#       lambda: client.models.generate_content(...), "planning", trace=call)
+#
+# - Requests-per-minute and tokens-per-minute budgets are token buckets.
+#   The token estimate is corrected from `usage_metadata` after each call.
+# - The waiting request with the best priority goes first: safety (video
+#   anomaly analysis) > planning (incl. tool use) > perception. Within one
+#   priority, robots take turns (fewest grants first), so one chatty robot
+#   cannot starve the rest. Tag calls with `with robot_scope("amr-7"): ...`.
+# - Transient errors (429/5xx, timeouts) are retried with jittered
+#   exponential backoff, but never past the caller's deadline.
+# - With `hedge_after_s`, a call still running after that long gets a
+#   second identical request if budget is free; the first answer wins.
+#   Hedges cost tokens, so keep this off when tokens are the constraint.
+#
+# Limits come from GEMINI_RPM, GEMINI_TPM, GEMINI_MAX_IN_FLIGHT,
+# GEMINI_MAX_ATTEMPTS and GEMINI_HEDGE_AFTER_S. Without them the scheduler
+# only measures: no limits, no retries, no hedges.
+# -------------------------------------------------------------------------
+
+PRIORITIES = {"safety": 0, "video": 0, "planning": 1, "tool_use": 1, "perception": 2}
+PRIORITY_NAMES = ("safety", "planning", "perception")
+TRANSIENT_STATUS = (408, 429, 500, 502, 503, 504)
+DEFAULT_REQUEST_TOKENS = 1500
+WAIT_WINDOW = 1000
+ASYNC_POLL_S = 0.02
+
+_robot_id = contextvars.ContextVar("gemini_robot_id", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+@contextmanager
+def robot_scope(robot_id):
+    """Attributes the model calls made inside the block to `robot_id` for fair sharing."""
+    token = _robot_id.set(robot_id)
+    try:
+        yield
+    finally:
+        _robot_id.reset(token)
+
+
+def current_robot_id():
+    """The robot ID set by the innermost `robot_scope`, or None."""
+    return _robot_id.get()
+
+
+def is_transient(error):
+    """True for errors worth retrying: 408/429/5xx, timeouts and connection failures."""
+    if isinstance(error, DeadlineExceeded):
+        return False
+    code = getattr(error, "code", None)
+    if not isinstance(code, int):
+        # e.g. httpx.HTTPStatusError
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(code, int):
+        return code in TRANSIENT_STATUS
+    if httpx is not None and isinstance(error, (httpx.TimeoutException, httpx.TransportError)):
+        return True
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+
+class TokenBucket:
+    """
+    Refills continuously at `per_minute`, holding at most `burst_s` seconds'
+    worth. Not thread-safe on its own; the scheduler holds its lock.
+    """
+
+    def __init__(self, per_minute, burst_s=60.0, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_s)
+        self.clock = clock
+        self.level = self.capacity
+        self.updated_at = clock()
+
+    def _refill(self, now):
+        if now > self.updated_at:
+            self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+    def wait_time(self, n, now=None):
+        """Seconds until `n` can be taken. More than the capacity waits for a full bucket."""
+        self._refill(self.clock() if now is None else now)
+        missing = min(n, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, n, now=None):
+        # The level may go negative (usage above the estimate); later callers wait it off
+        self._refill(self.clock() if now is None else now)
+        self.level -= n
+
+    def give(self, n):
+        self.level = min(self.capacity, self.level + n)
+
+    def drain(self, now=None):
+        self._refill(self.clock() if now is None else now)
+        self.level = min(self.level, 0.0)
+
+
+class _Ticket:
+    __slots__ = ("seq", "capability", "priority", "robot_id", "tokens", "deadline", "enqueued_at", "waited_s", "usage")
+
+    def __init__(self, seq, capability, priority, robot_id, tokens, deadline, enqueued_at):
+        self.seq = seq
+        self.capability = capability
+        self.priority = priority
+        self.robot_id = robot_id
+        self.tokens = tokens
+        self.deadline = deadline
+        self.enqueued_at = enqueued_at
+        self.waited_s = 0.0
+        self.usage = None
+
+
+class RequestScheduler:
+    """
+    Admits model calls under RPM/TPM budgets in priority and fair-share
+    order. `call` is for blocking call sites and `acall` for coroutines;
+    both may be mixed on one instance. `clock` is injectable for tests.
+    """
+
+    def __init__(self, rpm=None, tpm=None, max_in_flight=None, max_attempts=1, backoff_s=0.5, max_backoff_s=8.0,
+                 hedge_after_s=None, burst_s=60.0, default_tokens=DEFAULT_REQUEST_TOKENS, clock=time.monotonic,
+                 seed=None):
+        self.rpm = TokenBucket(rpm, burst_s, clock) if rpm else None
+        self.tpm = TokenBucket(tpm, burst_s, clock) if tpm else None
+        self.max_in_flight = max_in_flight
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.hedge_after_s = hedge_after_s
+        self.default_tokens = default_tokens
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._served = defaultdict(int)          # robot_id -> grants, for fair share
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._random = random.Random(seed)
+        self._waits = defaultdict(lambda: deque(maxlen=WAIT_WINDOW))   # capability -> recent waits
+        self._wait_totals = defaultdict(float)
+        self._admitted = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.max_queue_depth = 0
+        self._hedge_pool = None
+
+    # --- admission -------------------------------------------------------
+
+    def _ticket(self, capability, robot_id, tokens, deadline):
+        robot_id = _robot_id.get() if robot_id is None else robot_id
+        return _Ticket(next(self._seq), capability, PRIORITIES.get(capability, len(PRIORITY_NAMES) - 1),
+                       robot_id, tokens or self.default_tokens, deadline, self.clock())
+
+    def _enqueue(self, ticket):
+        # A robot returning from idle starts level with the robots already waiting
+        waiting = [self._served[t.robot_id] for t in self._waiting if t.robot_id != ticket.robot_id]
+        if waiting and not any(t.robot_id == ticket.robot_id for t in self._waiting):
+            self._served[ticket.robot_id] = max(self._served[ticket.robot_id], min(waiting))
+        self._waiting.append(ticket)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiting))
+        self._cond.notify_all()
+
+    def _drop(self, ticket):
+        if ticket in self._waiting:
+            self._waiting.remove(ticket)
+            self._cond.notify_all()
+
+    def _head(self):
+        top = min(t.priority for t in self._waiting)
+        return min((t for t in self._waiting if t.priority == top),
+                   key=lambda t: (self._served[t.robot_id], t.seq))
+
+    def _try_admit(self, ticket, now):
+        """Under the lock: 0.0 once granted, seconds to wait for budget, or None if not this ticket's turn."""
+        if self._head() is not ticket:
+            return None
+        if self.max_in_flight is not None and self._in_flight >= self.max_in_flight:
+            return None
+        wait = 0.0
+        if self.rpm is not None:
+            wait = max(wait, self.rpm.wait_time(1, now))
+        if self.tpm is not None:
+            wait = max(wait, self.tpm.wait_time(ticket.tokens, now))
+        if wait > 0:
+            return wait
+        if self.rpm is not None:
+            self.rpm.take(1, now)
+        if self.tpm is not None:
+            self.tpm.take(ticket.tokens, now)
+        self._waiting.remove(ticket)
+        self._in_flight += 1
+        self._served[ticket.robot_id] += 1
+        ticket.waited_s = now - ticket.enqueued_at
+        self._waits[ticket.capability].append(ticket.waited_s)
+        self._wait_totals[ticket.capability] += ticket.waited_s
+        self._admitted[ticket.capability] += 1
+        self._cond.notify_all()
+        return 0.0
+
+    def _timeout(self, ticket, wait, now):
+        """How long to wait before checking again; raises if the deadline can't be met."""
+        if ticket.deadline is None:
+            return wait
+        remaining = ticket.deadline - now
+        if remaining <= 0 or (wait is not None and wait > remaining):
+            self._drop(ticket)
+            self.counters["deadline_exceeded"] += 1
+            raise DeadlineExceeded(f"{ticket.capability} call could not be admitted before its deadline")
+        return remaining if wait is None else wait
+
+    def _admit(self, ticket):
+        with self._cond:
+            self._enqueue(ticket)
+            try:
+                while True:
+                    now = self.clock()
+                    wait = self._try_admit(ticket, now)
+                    if wait == 0.0:
+                        return
+                    self._cond.wait(self._timeout(ticket, wait, now))
+            except BaseException:
+                self._drop(ticket)
+                raise
+
+    async def _admit_async(self, ticket):
+        with self._cond:
+            self._enqueue(ticket)
+        try:
+            while True:
+                with self._cond:
+                    now = self.clock()
+                    wait = self._try_admit(ticket, now)
+                    if wait == 0.0:
+                        return
+                    timeout = self._timeout(ticket, wait, now)
+                # Grants from other threads don't wake coroutines, so poll when it isn't our turn
+                await asyncio.sleep(ASYNC_POLL_S if wait is None else min(timeout, wait))
+        except BaseException:
+            with self._cond:
+                self._drop(ticket)
+            raise
+
+    def _release(self, ticket, usage=None, error=None):
+        with self._cond:
+            self._in_flight -= 1
+            now = self.clock()
+            if self.tpm is not None:
+                actual = getattr(usage, "total_token_count", None)
+                if actual is not None:
+                    if actual > ticket.tokens:
+                        self.tpm.take(actual - ticket.tokens, now)
+                    else:
+                        self.tpm.give(ticket.tokens - actual)
+                elif error is not None:
+                    self.tpm.give(ticket.tokens)
+            if getattr(error, "code", None) == 429:
+                # The server disagrees with our budget: everyone waits for the next refill
+                self.counters["throttled"] += 1
+                if self.rpm is not None:
+                    self.rpm.drain(now)
+            self._cond.notify_all()
+
+    def _backoff(self, attempt, deadline):
+        """Jittered exponential delay before the next attempt, or None if it would overrun the deadline."""
+        delay = min(self.max_backoff_s, self.backoff_s * 2 ** attempt) * self._random.uniform(0.5, 1.0)
+        if deadline is not None and self.clock() + delay >= deadline:
+            return None
+        with self._cond:
+            self.counters["retries"] += 1
+        return delay
+
+    def _try_hedge(self, ticket):
+        """Admits a hedge only if it can go right now, so hedges never delay waiting requests."""
+        hedge = self._ticket(ticket.capability, ticket.robot_id, ticket.tokens, ticket.deadline)
+        with self._cond:
+            self._enqueue(hedge)
+            if self._try_admit(hedge, self.clock()) == 0.0:
+                self.counters["hedges"] += 1
+                return hedge
+            self._drop(hedge)
+        return None
+
+    # --- blocking calls --------------------------------------------------
+
+    def _attempt(self, fn, ticket):
+        try:
+            response = fn()
+        except BaseException as e:
+            self._release(ticket, error=e)
+            raise
+        self._release(ticket, getattr(response, "usage_metadata", None))
+        return response
+
+    def _hedged(self, fn, ticket):
+        if self._hedge_pool is None:
+            with self._cond:
+                if self._hedge_pool is None:
+                    self._hedge_pool = ThreadPoolExecutor(thread_name_prefix="gemini-hedge")
+        primary = self._hedge_pool.submit(self._attempt, fn, ticket)
+        done, _ = wait_futures([primary], timeout=self.hedge_after_s)
+        hedge = self._try_hedge(ticket) if not done else None
+        if hedge is None:
+            return primary.result()
+        secondary = self._hedge_pool.submit(self._attempt, fn, hedge)
+        pending = {primary, secondary}
+        error = None
+        while pending:
+            done, pending = wait_futures(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is secondary:
+                        with self._cond:
+                            self.counters["hedge_wins"] += 1
+                    # The loser finishes in the background and releases its own budget
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def call(self, fn, capability, robot_id=None, tokens=None, deadline_s=None, hedge=None, trace=None,
+             max_attempts=None):
+        """
+        Runs `fn()` (one model request) once admitted and returns its result.
+        `tokens` is the request's estimated total tokens; `deadline_s` bounds
+        queueing and retries (DeadlineExceeded if it can't be admitted in
+        time). Pass the call's `trace` to record "queue" and "model" spans.
+        Call sites that retry on their own pass `max_attempts=1`.
+        """
+        deadline = None if deadline_s is None else self.clock() + deadline_s
+        attempts = max_attempts or self.max_attempts
+        hedge = self.hedge_after_s is not None if hedge is None else hedge and self.hedge_after_s is not None
+        for attempt in range(attempts):
+            ticket = self._ticket(capability, robot_id, tokens, deadline)
+            self._admit(ticket)
+            if trace is not None:
+                trace.add_span("queue", ticket.waited_s)
+            try:
+                start = time.perf_counter()
+                try:
+                    return self._hedged(fn, ticket) if hedge else self._attempt(fn, ticket)
+                finally:
+                    if trace is not None:
+                        trace.add_span("model", time.perf_counter() - start)
+            except Exception as e:
+                delay = self._backoff(attempt, deadline) if attempt + 1 < attempts and is_transient(e) else None
+                if delay is None:
+                    raise
+                if trace is not None:
+                    trace.set(attempts=attempt + 2)
+                time.sleep(delay)
+
+    @contextmanager
+    def slot(self, capability, robot_id=None, tokens=None, deadline_s=None, trace=None):
+        """
+        Holds one admission while the caller runs the request itself (e.g. a
+        stream). Set `usage` on the yielded ticket to settle the token budget.
+        """
+        deadline = None if deadline_s is None else self.clock() + deadline_s
+        ticket = self._ticket(capability, robot_id, tokens, deadline)
+        self._admit(ticket)
+        if trace is not None:
+            trace.add_span("queue", ticket.waited_s)
+        try:
+            yield ticket
+        except BaseException as e:
+            self._release(ticket, ticket.usage, error=e)
+            raise
+        self._release(ticket, ticket.usage)
+
+    # --- coroutine calls -------------------------------------------------
+
+    async def _aattempt(self, coro_fn, ticket):
+        try:
+            response = await coro_fn()
+        except BaseException as e:
+            self._release(ticket, error=e)
+            raise
+        self._release(ticket, getattr(response, "usage_metadata", None))
+        return response
+
+    async def _ahedged(self, coro_fn, ticket):
+        primary = asyncio.ensure_future(self._aattempt(coro_fn, ticket))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after_s)
+        hedge = self._try_hedge(ticket) if not done else None
+        if hedge is None:
+            return await primary
+        secondary = asyncio.ensure_future(self._aattempt(coro_fn, hedge))
+        pending = {primary, secondary}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary:
+                            with self._cond:
+                                self.counters["hedge_wins"] += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def acall(self, coro_fn, capability, robot_id=None, tokens=None, deadline_s=None, hedge=None, trace=None,
+                    max_attempts=None):
+        """`call` for coroutines: `coro_fn()` must return an awaitable request."""
+        deadline = None if deadline_s is None else self.clock() + deadline_s
+        attempts = max_attempts or self.max_attempts
+        hedge = self.hedge_after_s is not None if hedge is None else hedge and self.hedge_after_s is not None
+        for attempt in range(attempts):
+            ticket = self._ticket(capability, robot_id, tokens, deadline)
+            await self._admit_async(ticket)
+            if trace is not None:
+                trace.add_span("queue", ticket.waited_s)
+            try:
+                start = time.perf_counter()
+                try:
+                    return await (self._ahedged(coro_fn, ticket) if hedge else self._aattempt(coro_fn, ticket))
+                finally:
+                    if trace is not None:
+                        trace.add_span("model", time.perf_counter() - start)
+            except Exception as e:
+                delay = self._backoff(attempt, deadline) if attempt + 1 < attempts and is_transient(e) else None
+                if delay is None:
+                    raise
+                if trace is not None:
+                    trace.set(attempts=attempt + 2)
+                await asyncio.sleep(delay)
+
+    # --- metrics ---------------------------------------------------------
+
+    def queue_depth(self):
+        """Requests waiting right now, by priority class."""
+        with self._cond:
+            depth = dict.fromkeys(PRIORITY_NAMES, 0)
+            for ticket in self._waiting:
+                depth[PRIORITY_NAMES[ticket.priority]] += 1
+            return depth
+
+    def stats(self):
+        depth = self.queue_depth()
+        with self._cond:
+            wait = {}
+            for cap, waits in sorted(self._waits.items()):
+                ordered = sorted(waits)
+                wait[cap] = {
+                    "admitted": self._admitted[cap],
+                    "p50_s": ordered[(len(ordered) - 1) // 2],
+                    "p95_s": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                    "max_s": ordered[-1],
+                }
+            now = self.clock()
+            if self.rpm is not None:
+                self.rpm.wait_time(0, now)
+            if self.tpm is not None:
+                self.tpm.wait_time(0, now)
+            return {
+                "queue_depth": depth,
+                "max_queue_depth": self.max_queue_depth,
+                "in_flight": self._in_flight,
+                "admitted": sum(self._admitted.values()),
+                "retries": self.counters["retries"],
+                "hedges": self.counters["hedges"],
+                "hedge_wins": self.counters["hedge_wins"],
+                "throttled": self.counters["throttled"],
+                "deadline_exceeded": self.counters["deadline_exceeded"],
+                "requests_available": self.rpm.level if self.rpm is not None else None,
+                "tokens_available": self.tpm.level if self.tpm is not None else None,
+                "wait": wait,
+                "grants_by_robot": {str(k): v for k, v in self._served.items()},
+            }
+
+    def prometheus_text(self):
+        """Queue depth, wait time and event counters in the Prometheus text format."""
+        depth = self.queue_depth()
+        lines = [
+            "# HELP gemini_scheduler_queue_depth Requests waiting for admission.",
+            "# TYPE gemini_scheduler_queue_depth gauge",
+        ]
+        lines += [f"gemini_scheduler_queue_depth{_labels(priority=name)} {n}" for name, n in depth.items()]
+        with self._cond:
+            lines += [
+                "# HELP gemini_scheduler_in_flight Admitted requests not finished yet.",
+                "# TYPE gemini_scheduler_in_flight gauge",
+                f"gemini_scheduler_in_flight {self._in_flight}",
+                "# HELP gemini_scheduler_wait_seconds Time spent queued before admission.",
+                "# TYPE gemini_scheduler_wait_seconds summary",
+            ]
+            for cap in sorted(self._admitted):
+                lines.append(f"gemini_scheduler_wait_seconds_sum{_labels(capability=cap)} {self._wait_totals[cap]:.6f}")
+                lines.append(f"gemini_scheduler_wait_seconds_count{_labels(capability=cap)} {self._admitted[cap]}")
+            lines += [
+                "# HELP gemini_scheduler_events_total Retries, hedges, 429s and deadline misses.",
+                "# TYPE gemini_scheduler_events_total counter",
+            ]
+            for event in ("retries", "hedges", "hedge_wins", "throttled", "deadline_exceeded"):
+                lines.append(f"gemini_scheduler_events_total{_labels(event=event)} {self.counters[event]}")
+        return "\n".join(lines) + "\n"
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def _env_number(name, cast=float):
+    value = os.getenv(name)
+    return cast(value) if value else None
+
+
+def scheduler_from_env(share=1):
+    """
+    Builds a RequestScheduler from the GEMINI_* limits above. Worker
+    processes that each build their own pass `share` (the number of
+    processes) so that together they stay within the configured budget.
+    """
+    load_env()
+    rpm, tpm = _env_number("GEMINI_RPM"), _env_number("GEMINI_TPM")
+    max_in_flight = _env_number("GEMINI_MAX_IN_FLIGHT", int)
+    return RequestScheduler(
+        rpm=rpm / share if rpm else None,
+        tpm=tpm / share if tpm else None,
+        max_in_flight=max(1, max_in_flight // share) if max_in_flight else None,
+        max_attempts=_env_number("GEMINI_MAX_ATTEMPTS", int) or 1,
+        hedge_after_s=_env_number("GEMINI_HEDGE_AFTER_S"),
+    )
+
+
+def get_scheduler():
+    """Returns the process-wide scheduler, configured from the GEMINI_* limits above."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = scheduler_from_env()
+    return _scheduler
+
+
+def set_scheduler(scheduler):
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
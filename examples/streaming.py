@@ -0,0 +1,249 @@
+import json
+import time
+from dataclasses import dataclass
+
+try:
+    from examples.scheduler import get_scheduler
+except ImportError:
+    from scheduler import get_scheduler
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: STREAMING DETECTIONS & PLAN STEPS
+# -------------------------------------------------------------------------
+# Perception and planning both answer with a JSON array. Instead of waiting
+# for the whole response and then regexing out the ```json block, we stream
+# it with `generate_content_stream` and hand each array element downstream
+# the moment its closing brace arrives, so motion code can start on the
+# first object while the rest are still being generated.
+# -------------------------------------------------------------------------
+
+
+class JSONArrayStreamParser:
+    """
+    Incrementally parses the result JSON array in a text stream. Anything
+    around it (preamble prose, markdown fences) is ignored. The first array
+    inside a ```json (or bare ```) fence, or the first array of objects or
+    arrays, is the result and its elements are returned by `feed` as soon as
+    they are complete. A bare array of scalars outside a fence, such as the
+    "[1]" in "See [1] below", is held back: `close()` returns it at the end
+    of the stream only if nothing better turned up. A `[` not followed by a
+    JSON value ("[the]") is skipped, and so is a candidate whose first
+    element does not parse.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0           # next character of _buf to scan
+        self._item_start = None  # offset in _buf where the current element begins
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._fence = None       # language of the open ``` fence, None outside one
+        self._held = None        # elements of the current scalar candidate, None when streaming
+        self._fallback = None    # first complete scalar array outside a fence
+        self.started = False
+        self.done = False
+        self.items_emitted = 0
+
+    def feed(self, text):
+        if self.done or not text:
+            return []
+        self._buf += text
+        items = []
+        while self.started or self._find_start():
+            try:
+                closed = self._scan(items)
+            except ValueError:
+                if self.items_emitted and self._held is None:
+                    raise
+                # Bracketed prose looked like an array: resume the search after its '['
+                self._buf, self._pos = self._buf[self._item_start:], 0
+                self._reset_candidate()
+                continue
+            if not closed:
+                break
+            if self._held is None:
+                self.done = True
+                self._buf, self._pos = "", 0
+                break
+            if self._fallback is None:
+                self._fallback = self._held
+            self._reset_candidate()
+        return items
+
+    def close(self):
+        """Ends the stream; returns the held-back scalar array if no other array was found."""
+        if self.done:
+            return []
+        self.done = True
+        items = self._fallback or []
+        self.items_emitted += len(items)
+        return items
+
+    def _reset_candidate(self):
+        self._depth, self._in_string, self._escape = 0, False, False
+        self._held = None
+        self.started = False
+
+    def _find_start(self):
+        buf = self._buf
+        n = len(buf)
+        i = self._pos
+        while True:
+            starts = [j for j in (buf.find("[", i), buf.find("`", i)) if j >= 0]
+            if not starts:
+                # Keep nothing: the preamble can never contain the array start
+                self._buf, self._pos = "", 0
+                return False
+            i = min(starts)
+            if buf[i] == "`":
+                if not buf.startswith("```", i):
+                    if "```".startswith(buf[i:]):
+                        # Possibly a fence split across chunks
+                        self._buf, self._pos = buf[i:], 0
+                        return False
+                    i += 1
+                    continue
+                j = i + 3
+                if self._fence is None:
+                    while j < n and buf[j].isalnum():
+                        j += 1
+                    if j == n:
+                        # The fence language may continue in the next chunk
+                        self._buf, self._pos = buf[i:], 0
+                        return False
+                    self._fence = buf[i + 3:j].lower()
+                else:
+                    self._fence = None
+                i = j
+                continue
+
+            j = i + 1
+            while j < n and buf[j].isspace():
+                j += 1
+            if j == n:
+                # Cannot tell yet: keep the candidate for the next chunk
+                self._buf, self._pos = buf[i:], 0
+                return False
+            ch = buf[j]
+            scalar = ch in '"]-' or ch.isdigit()
+            if ch in "{[" or scalar:
+                fenced = self._fence in ("", "json")
+                if scalar and not fenced:
+                    if self._fallback is not None:
+                        i += 1
+                        continue
+                    self._held = []
+                self.started = True
+                self._depth = 1
+                self._item_start = self._pos = i + 1
+                return True
+            i += 1
+
+    def _scan(self, items):
+        """Scans the open candidate; returns True once its closing `]` was consumed."""
+        target = items if self._held is None else self._held
+        buf = self._buf
+        i = self._pos
+        n = len(buf)
+        while i < n:
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buf[self._item_start:i], target)
+                    self._buf, self._pos = buf[i + 1:], 0
+                    return True
+            elif ch == "," and self._depth == 1:
+                self._emit(buf[self._item_start:i], target)
+                self._item_start = i + 1
+            i += 1
+
+        # Drop the consumed prefix so the buffer only holds the open element
+        self._buf = buf[self._item_start:]
+        self._pos = i - self._item_start
+        self._item_start = 0
+        return False
+
+    def _emit(self, raw, items):
+        raw = raw.strip()
+        if raw:
+            items.append(json.loads(raw))
+            if self._held is None:
+                self.items_emitted += 1
+
+
+def iter_json_items(chunks):
+    """Yields array elements from an iterable of text chunks."""
+    parser = JSONArrayStreamParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.done:
+            return
+    yield from parser.close()
+
+
+@dataclass
+class StreamStats:
+    items: int = 0
+    time_to_first_item_s: float = None
+    total_s: float = None
+
+    def summary(self):
+        ttfi = f"{self.time_to_first_item_s * 1000:.0f} ms" if self.time_to_first_item_s is not None else "n/a"
+        total = f"{self.total_s * 1000:.0f} ms" if self.total_s is not None else "n/a"
+        return f"⏱️  {self.items} items, first item after {ttfi}, total {total}"
+
+
+def stream_items(client, model, contents, config=None, stats=None, trace=None):
+    """
+    Calls `generate_content_stream` and yields each JSON array element as
+    soon as it is complete. Pass a StreamStats to collect time-to-first-item
+    and total latency; `total_s` is set once the stream is exhausted.
+    Pass an `instrumentation.CallTrace` as `trace` to record time spent
+    waiting on the model vs parsing, and the final usage_metadata.
+    """
+    stats = stats if stats is not None else StreamStats()
+    start = time.perf_counter()
+    parser = JSONArrayStreamParser()
+    usage = None
+    # Admission is held until the stream ends; the final usage settles the token budget
+    capability = trace.record.capability if trace is not None else None
+    with get_scheduler().slot(capability, trace=trace) as ticket:
+        try:
+            chunks = iter(client.models.generate_content_stream(model=model, contents=contents, config=config))
+            while True:
+                # Only time spent inside the SDK and the parser is attributed;
+                # whatever the consumer does between items is not
+                waited = time.perf_counter()
+                chunk = next(chunks, None)
+                if trace is not None:
+                    trace.add_span("model", time.perf_counter() - waited)
+                if chunk is not None and chunk.usage_metadata is not None:
+                    usage = ticket.usage = chunk.usage_metadata
+                parsed = time.perf_counter()
+                items = parser.feed(chunk.text or "") if chunk is not None else parser.close()
+                if trace is not None:
+                    trace.add_span("parse", time.perf_counter() - parsed)
+                for item in items:
+                    if stats.time_to_first_item_s is None:
+                        stats.time_to_first_item_s = time.perf_counter() - start
+                    stats.items += 1
+                    yield item
+                if chunk is None:
+                    break
+        finally:
+            stats.total_s = time.perf_counter() - start
+            if trace is not None and usage is not None:
+                trace.record_usage(usage)
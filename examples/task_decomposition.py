@@ -1,25 +1,40 @@
-from google import genai
 from google.genai import types
-import os
+import contextlib
+import io
 import json
-from dotenv import load_dotenv
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+try:
+    from examples.gemini_client import get_client
+    from examples.response_cache import make_key
+    from examples.streaming import stream_items
+    from examples.instrumentation import Telemetry, get_telemetry, set_telemetry
+    from examples.scheduler import get_scheduler
+    from examples.plan_cache import parse_primitives, validate_plan
+    from examples.thinking_budget import thinking_tokens
+except ImportError:
+    from gemini_client import get_client
+    from response_cache import make_key
+    from streaming import stream_items
+    from instrumentation import Telemetry, get_telemetry, set_telemetry
+    from scheduler import get_scheduler
+    from plan_cache import parse_primitives, validate_plan
+    from thinking_budget import thinking_tokens
 
 # -------------------------------------------------------------------------
 # GEMINI ROBOTICS: TASK DECOMPOSITION (THE "BRAIN")
 # -------------------------------------------------------------------------
 # This script shows how to use Gemini Robotics ER 1.5 as a high-level planner 
 # that breaks complex Natural Language commands into low-level primitives.
+#
+# At shift start a dispatcher issues dozens of commands at once;
+# `plan_missions_batch` packs them into one request (the system prompt is
+# sent once per batch instead of once per command) and re-plans only the
+# commands whose plans fail validation.
 # -------------------------------------------------------------------------
 
-load_dotenv()
-api_key = os.getenv("GEMINI_API_KEY") or os.environ.get("GEMINI_API_KEY")
-
-if not api_key:
-    print("⚠️  Warning: GEMINI_API_KEY not set.")
-    client = None
-else:
-    client = genai.Client(api_key=api_key)
-
 # This is the "System Prompt" that defines the robot's capabilities
 ROBOT_SYSTEM_PROMPT = """
 You are a robot planner for a mobile manipulator (Arm + Wheels).
@@ -36,40 +51,303 @@ Each step must use ONLY the primitives above.
 Return ONLY valid JSON.
 """
 
-def plan_mission(user_command):
+BATCH_PROMPT = """{system_prompt}
+Plan each of the following commands independently. Return ONLY a JSON object
+that maps every command key to that command's JSON list of steps, e.g.
+{{"c1": [...], "c2": [...]}}
+
+Commands:
+{commands}
+
+JSON Plans:"""
+
+MODEL_ID = "gemini-robotics-er-1.5-preview"
+
+def parse_plan(plan_text):
+    """Parses a plan response, tolerating ```json fences. Raises ValueError."""
+    # Cleanup markdown formatting if present
+    if "```json" in plan_text:
+        plan_text = plan_text.split("```json")[1].split("```")[0].strip()
+    elif "```" in plan_text:
+        plan_text = plan_text.split("```")[1].split("```")[0].strip()
+    return json.loads(plan_text)
+
+def plan_is_valid(plan_text):
+    """True if `plan_text` parses into a plan using only ROBOT_SYSTEM_PROMPT's primitives."""
+    try:
+        validate_plan(parse_plan(plan_text), parse_primitives(ROBOT_SYSTEM_PROMPT))
+        return True
+    except (TypeError, ValueError, IndexError):
+        return False
+
+def plan_mission(user_command, cache=None, plan_cache=None, budget_controller=None, deadline_s=None):
+    """
+    Breaks a natural language command into primitive steps.
+    Pass a `response_cache.ResponseCache` as `cache` to reuse plans for
+    commands that were already answered with the same config, and a
+    `plan_cache.PlanCache` as `plan_cache` to serve commands of an already
+    seen shape ("find the X on the Y ...") by slot substitution.
+    Pass a `thinking_budget.ThinkingBudgetController` as `budget_controller`
+    to adapt the thinking budget to plan validity and latency.
+    Returns the parsed plan, or None if the simulated fallback was used.
+    """
     print(f"User Command: '{user_command}'")
-    
-    full_prompt = f"{ROBOT_SYSTEM_PROMPT}\n\nUser Command: {user_command}\nJSON Plan:"
 
-    if client:
-        try:
-            response = client.models.generate_content(
-                model="gemini-robotics-er-1.5-preview",
-                contents=full_prompt,
-                config=types.GenerateContentConfig(
+    with get_telemetry().trace("planning", model=MODEL_ID) as call:
+        if plan_cache is not None:
+            plan_cache.sync_primitives(ROBOT_SYSTEM_PROMPT)
+            plan = plan_cache.lookup(user_command)
+            if plan is not None:
+                call.set(cache="template")
+                print("\n⚡ Plan Template Hit (no model call):")
+                for i, step in enumerate(plan):
+                    print(f"  {i+1}. {step}")
+                return plan
+
+        full_prompt = f"{ROBOT_SYSTEM_PROMPT}\n\nUser Command: {user_command}\nJSON Plan:"
+
+        client = get_client()
+        if client:
+            try:
+                budget = budget_controller.choose("planning", deadline_s) if budget_controller is not None else None
+                config = types.GenerateContentConfig(
                     temperature=0.2, # Lower temperature for deterministic planning
-                    thinking_config=types.ThinkingConfig(thinking_budget=1024)
+                    thinking_config=types.ThinkingConfig(thinking_budget=budget.budget if budget else 1024)
                 )
-            )
-            plan_text = response.text
-            
-            # Cleanup markdown formatting if present
-            if "```json" in plan_text:
-                plan_text = plan_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in plan_text:
-                plan_text = plan_text.split("```")[1].split("```")[0].strip()
-                
-            plan = json.loads(plan_text)
-            
-            print("\n📋 Generated Robot Plan (Gemini Robotics ER 1.5):")
-            for i, step in enumerate(plan):
-                print(f"  {i+1}. {step}")
+
+                cache_key = None
+                plan_text = None
+                from_model = False
+                if cache is not None:
+                    cache_key = make_key(MODEL_ID, full_prompt, config=config)
+                    plan_text = cache.get(cache_key)
+                    if plan_text is not None:
+                        print("⚡ Cache hit: reusing previous plan.")
+                        call.set(cache="response")
+
+                if plan_text is None:
+                    call.add_bytes(len(full_prompt.encode("utf-8")))
+                    response = get_scheduler().call(
+                        lambda: client.models.generate_content(
+                            model=MODEL_ID,
+                            contents=full_prompt,
+                            config=config
+                        ),
+                        "planning",
+                        trace=call,
+                    )
+                    model_latency_s = call.record.spans["model"]
+                    call.record_usage(response)
+                    plan_text = response.text
+                    from_model = True
+                    if budget is not None:
+                        call.set(thinking_budget=budget.budget)
+                        budget_controller.record(budget, model_latency_s, valid=plan_is_valid(plan_text),
+                                                 thinking_tokens=thinking_tokens(response))
+                with call.span("parse"):
+                    plan = parse_plan(plan_text)
+                # Only fresh model text that is a valid plan (known primitives, right
+                # arity) is stored; putting a cache hit back would restart its TTL
+                if cache is not None and from_model and plan_is_valid(plan_text):
+                    cache.put(cache_key, plan_text)
+                if plan_cache is not None and not plan_cache.store(user_command, plan):
+                    print("⚠️ Plan uses unknown primitives; not cached as a template.")
                 
-        except Exception as e:
-            print(f"Planner Error: {e}")
+                print("\n📋 Generated Robot Plan (Gemini Robotics ER 1.5):")
+                for i, step in enumerate(plan):
+                    print(f"  {i+1}. {step}")
+                return plan
+
+            except Exception as e:
+                call.fail(e)
+                print(f"Planner Error: {e}")
+                fallback_demo()
+        else:
+            call.fail("No Gemini client available")
             fallback_demo()
-    else:
-        fallback_demo()
+
+def plan_mission_stream(user_command, stats=None):
+    """
+    Streaming variant of `plan_mission`: yields each plan step as soon as
+    the model has finished writing it, so execution can begin on step 1
+    while later steps are still being generated.
+    """
+    full_prompt = f"{ROBOT_SYSTEM_PROMPT}\n\nUser Command: {user_command}\nJSON Plan:"
+    with get_telemetry().trace("planning", model=MODEL_ID, streaming=True) as call:
+        call.add_bytes(len(full_prompt.encode("utf-8")))
+        yield from stream_items(
+            get_client(),
+            MODEL_ID,
+            contents=full_prompt,
+            config=types.GenerateContentConfig(
+                temperature=0.2,
+                thinking_config=types.ThinkingConfig(thinking_budget=1024)
+            ),
+            stats=stats,
+            trace=call,
+        )
+
+@dataclass
+class BatchPlanResult:
+    plans: dict = field(default_factory=dict)      # command -> parsed plan
+    errors: dict = field(default_factory=dict)     # command -> last validation error
+    calls: int = 0
+    replanned: int = 0
+    template_hits: int = 0
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    total_tokens: int = 0
+    wall_s: float = 0.0
+
+    @property
+    def plans_per_s(self):
+        return len(self.plans) / self.wall_s if self.wall_s else 0.0
+
+    @property
+    def tokens_per_plan(self):
+        return self.total_tokens / len(self.plans) if self.plans else 0.0
+
+    def summary(self):
+        return (f"📦 {len(self.plans)} plan(s), {len(self.errors)} failed, {self.calls} call(s), "
+                f"{self.replanned} re-planned, {self.template_hits} template hit(s): "
+                f"{self.plans_per_s:.2f} plans/s, {self.tokens_per_plan:.0f} tokens/plan")
+
+
+def _plan_batch(client, commands, config, primitives):
+    """One request for `commands`. Returns ({command: plan or error string}, usage_metadata)."""
+    keys = {f"c{i + 1}": command for i, command in enumerate(commands)}
+    prompt = BATCH_PROMPT.format(system_prompt=ROBOT_SYSTEM_PROMPT,
+                                 commands="\n".join(f"{key}: {command}" for key, command in keys.items()))
+    outcome = {}
+    with get_telemetry().trace("planning", model=MODEL_ID, batch=len(commands)) as call:
+        call.add_bytes(len(prompt.encode("utf-8")))
+        try:
+            response = get_scheduler().call(
+                lambda: client.models.generate_content(model=MODEL_ID, contents=prompt, config=config),
+                "planning", trace=call)
+        except Exception as e:
+            call.fail(e)
+            return {command: f"Request failed: {e}" for command in commands}, None
+        call.record_usage(response)
+
+        with call.span("parse"):
+            try:
+                plans = parse_plan(response.text or "")
+            except (IndexError, ValueError):
+                plans = None
+            if not isinstance(plans, dict):
+                return ({command: "Response was not a JSON object of plans" for command in commands},
+                        response.usage_metadata)
+            for key, command in keys.items():
+                try:
+                    validate_plan(plans.get(key), primitives)
+                    outcome[command] = plans[key]
+                except (TypeError, ValueError, IndexError) as e:
+                    outcome[command] = str(e) if key in plans else f"No plan returned for {key}"
+    return outcome, response.usage_metadata
+
+
+def plan_missions_batch(commands, batch_size=16, max_replans=2, max_in_flight=4, thinking_budget=1024,
+                        plan_cache=None, client=None):
+    """
+    Plans many commands with one model call per `batch_size` commands.
+    Each plan is validated on its own; only commands whose plan is missing
+    or invalid are re-planned, for up to `max_replans` more rounds.
+    Pass a `plan_cache.PlanCache` to serve already seen command shapes
+    without the model. Returns a BatchPlanResult.
+    """
+    start = time.perf_counter()
+    result = BatchPlanResult()
+    client = client or get_client()
+    primitives = parse_primitives(ROBOT_SYSTEM_PROMPT)
+    pending = list(dict.fromkeys(commands))
+
+    if plan_cache is not None:
+        plan_cache.sync_primitives(ROBOT_SYSTEM_PROMPT)
+        for command in list(pending):
+            plan = plan_cache.lookup(command)
+            if plan is not None:
+                result.plans[command] = plan
+                result.template_hits += 1
+                pending.remove(command)
+
+    if client is None:
+        result.errors = {command: "No Gemini client available" for command in pending}
+        result.wall_s = time.perf_counter() - start
+        return result
+
+    config = types.GenerateContentConfig(
+        temperature=0.2,
+        thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget),
+    )
+    for round_index in range(max_replans + 1):
+        if not pending:
+            break
+        if round_index:
+            result.replanned += len(pending)
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        with ThreadPoolExecutor(max_workers=max(1, min(max_in_flight, len(batches)))) as pool:
+            outcomes = list(pool.map(lambda batch: _plan_batch(client, batch, config, primitives), batches))
+        result.calls += len(batches)
+
+        pending = []
+        for outcome, usage in outcomes:
+            if usage is not None:
+                result.prompt_tokens += usage.prompt_token_count or 0
+                result.output_tokens += usage.candidates_token_count or 0
+                result.total_tokens += usage.total_token_count or 0
+            for command, plan in outcome.items():
+                if isinstance(plan, list):
+                    result.plans[command] = plan
+                    result.errors.pop(command, None)
+                    if plan_cache is not None:
+                        plan_cache.store(command, plan)
+                else:
+                    result.errors[command] = plan
+                    pending.append(command)
+
+    result.wall_s = time.perf_counter() - start
+    return result
+
+
+def compare_batched_planning(commands, batch_size=16, max_in_flight=1):
+    """
+    Plans `commands` once with `plan_mission` per command and once with
+    `plan_missions_batch`, and prints plans/sec and tokens/plan for both.
+    Tokens are read from a private Telemetry so other calls don't count.
+    """
+    previous = get_telemetry()
+    report = {}
+    try:
+        for mode in ("per_command", "batched"):
+            telemetry = Telemetry()
+            set_telemetry(telemetry)
+            start = time.perf_counter()
+            if mode == "per_command":
+                # plan_mission narrates every plan; keep the comparison readable
+                with contextlib.redirect_stdout(io.StringIO()):
+                    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+                        planned = sum(1 for plan in pool.map(plan_mission, commands) if plan is not None)
+            else:
+                planned = len(plan_missions_batch(commands, batch_size=batch_size, max_in_flight=max_in_flight).plans)
+            wall_s = time.perf_counter() - start
+            stats = telemetry.summary().get("planning", {})
+            tokens = stats.get("tokens", {}).get("total", 0)
+            report[mode] = {
+                "plans": planned,
+                "calls": stats.get("calls", 0),
+                "wall_s": round(wall_s, 3),
+                "plans_per_s": round(planned / wall_s, 3) if wall_s else None,
+                "tokens_per_plan": round(tokens / planned, 1) if planned else None,
+            }
+    finally:
+        set_telemetry(previous)
+
+    print(f"{'mode':<14}{'plans':>7}{'calls':>7}{'plans/s':>10}{'tokens/plan':>13}")
+    for mode, m in report.items():
+        print(f"{mode:<14}{m['plans']:>7}{m['calls']:>7}{m['plans_per_s'] or 0:>10.2f}{m['tokens_per_plan'] or 0:>13.1f}")
+    return report
+
 
 def fallback_demo():
     # Demonstrating what it WOULD look like
@@ -0,0 +1,187 @@
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: ADAPTIVE THINKING BUDGET
+# -------------------------------------------------------------------------
+# A fixed `thinking_budget=1024` is far too slow for per-frame pointing and
+# sometimes too small for long-horizon planning. This controller picks the
+# budget per query class and adapts it from what it observes:
+#   - the smoothed latency at the current budget exceeds the class target
+#     -> halve the budget (down to the class minimum)
+#   - the output was invalid while latency has headroom -> double it
+#   - a per-call deadline the current budget cannot meet -> budget 0
+# Every decision and its outcome is kept in an audit log (optionally JSONL).
+#
+#   controller = ThinkingBudgetController(audit_path="budget_audit.jsonl")
+#   robot_perception_query(path, prompt, budget_controller=controller, deadline_s=1.0)
+# -------------------------------------------------------------------------
+
+QUERY_CLASSES = ("pointing", "boxes", "planning", "safety")
+
+
+@dataclass
+class BudgetPolicy:
+    initial: int
+    min_budget: int
+    max_budget: int
+    target_latency_s: float
+    # Drop straight to budget 0 when a deadline is tighter than expected latency
+    zero_fallback: bool = True
+
+
+DEFAULT_POLICIES = {
+    "pointing": BudgetPolicy(initial=0, min_budget=0, max_budget=512, target_latency_s=1.5),
+    "boxes": BudgetPolicy(initial=256, min_budget=0, max_budget=2048, target_latency_s=3.0),
+    "planning": BudgetPolicy(initial=1024, min_budget=128, max_budget=8192, target_latency_s=10.0),
+    "safety": BudgetPolicy(initial=1024, min_budget=128, max_budget=8192, target_latency_s=30.0),
+}
+
+# Smallest non-zero budget tried when growing from 0
+MIN_THINKING_STEP = 128
+
+
+@dataclass
+class BudgetDecision:
+    query_class: str
+    budget: int
+    reason: str                 # "policy" or "deadline"
+    target_latency_s: float
+    deadline_s: float = None
+    decided_at: float = field(default_factory=time.time)
+
+
+class _ClassState:
+    def __init__(self, policy):
+        self.budget = policy.initial
+        self.ewma_latency = {}  # budget -> smoothed latency in seconds
+        self.calls = 0
+        self.invalid = 0
+        self.fallbacks = 0
+
+
+def classify_prompt(prompt_text):
+    """Guesses the query class of a free-form spatial prompt."""
+    text = prompt_text.lower()
+    if "box_2d" in text or "bounding box" in text:
+        return "boxes"
+    if "point" in text:
+        return "pointing"
+    return "boxes"
+
+
+class ThinkingBudgetController:
+    """
+    Chooses and adapts `thinking_budget` per query class. Thread-safe, so a
+    single controller can serve a perception engine and a planner at once.
+    """
+
+    def __init__(self, policies=None, audit_path=None, alpha=0.3, headroom=0.7, growth=2, max_audit=1000):
+        self.policies = dict(DEFAULT_POLICIES)
+        self.policies.update(policies or {})
+        self.audit_path = audit_path
+        self.alpha = alpha          # EWMA weight of the newest latency sample
+        self.headroom = headroom    # only grow the budget while latency < headroom * target
+        self.growth = growth
+        self._state = {name: _ClassState(policy) for name, policy in self.policies.items()}
+        self._audit = deque(maxlen=max_audit)
+        self._lock = threading.Lock()
+
+    def _policy(self, query_class):
+        if query_class not in self.policies:
+            raise ValueError(f"Unknown query class '{query_class}'. Expected one of {sorted(self.policies)}")
+        return self.policies[query_class]
+
+    def expected_latency(self, query_class, budget):
+        """Smoothed latency seen at `budget`, or None if it was never tried."""
+        with self._lock:
+            return self._state[query_class].ewma_latency.get(budget)
+
+    def choose(self, query_class, deadline_s=None):
+        """Returns the BudgetDecision for the next call of `query_class`."""
+        policy = self._policy(query_class)
+        with self._lock:
+            state = self._state[query_class]
+            budget, reason = state.budget, "policy"
+            if deadline_s is not None and budget > 0:
+                # Untried budgets are assumed to land on the class target
+                expected = state.ewma_latency.get(budget, policy.target_latency_s)
+                if expected > deadline_s:
+                    budget = 0 if policy.zero_fallback else policy.min_budget
+                    reason = "deadline"
+                    state.fallbacks += 1
+        return BudgetDecision(query_class, budget, reason, policy.target_latency_s, deadline_s)
+
+    def record(self, decision, latency_s, valid, thinking_tokens=None):
+        """
+        Feeds back the outcome of a call made with `decision` and returns the
+        audit entry. Deadline fallbacks update the latency estimate for their
+        budget but never move the class budget.
+        """
+        policy = self._policy(decision.query_class)
+        with self._lock:
+            state = self._state[decision.query_class]
+            state.calls += 1
+            if not valid:
+                state.invalid += 1
+
+            previous = state.ewma_latency.get(decision.budget)
+            ewma = latency_s if previous is None else self.alpha * latency_s + (1 - self.alpha) * previous
+            state.ewma_latency[decision.budget] = ewma
+
+            adjustment = "hold"
+            if decision.reason == "policy" and decision.budget == state.budget:
+                if ewma > policy.target_latency_s and state.budget > policy.min_budget:
+                    smaller = state.budget // self.growth
+                    state.budget = max(policy.min_budget, smaller if smaller >= MIN_THINKING_STEP else 0)
+                    adjustment = "decrease"
+                elif not valid and ewma < self.headroom * policy.target_latency_s and state.budget < policy.max_budget:
+                    state.budget = min(policy.max_budget, max(MIN_THINKING_STEP, state.budget * self.growth))
+                    adjustment = "increase"
+
+            entry = {
+                "ts": time.time(),
+                "query_class": decision.query_class,
+                "budget": decision.budget,
+                "reason": decision.reason,
+                "deadline_s": decision.deadline_s,
+                "target_latency_s": policy.target_latency_s,
+                "latency_s": round(latency_s, 4),
+                "ewma_latency_s": round(ewma, 4),
+                "valid": bool(valid),
+                "thinking_tokens": thinking_tokens,
+                "adjustment": adjustment,
+                "next_budget": state.budget,
+            }
+            self._audit.append(entry)
+            if self.audit_path:
+                with open(self.audit_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+        return entry
+
+    def audit_log(self, query_class=None):
+        with self._lock:
+            return [e for e in self._audit if query_class is None or e["query_class"] == query_class]
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {
+                    "budget": state.budget,
+                    "calls": state.calls,
+                    "invalid": state.invalid,
+                    "deadline_fallbacks": state.fallbacks,
+                    "ewma_latency_s": {b: round(v, 4) for b, v in sorted(state.ewma_latency.items())},
+                    "policy": asdict(self.policies[name]),
+                }
+                for name, state in self._state.items()
+            }
+
+
+def thinking_tokens(response):
+    """Thinking tokens reported in a response's usage_metadata, if any."""
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "thoughts_token_count", None) if usage is not None else None
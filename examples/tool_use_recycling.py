@@ -1,50 +1,330 @@
-from google import genai
 from google.genai import types
-import os
+import json
+import re
+import threading
 import time
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+try:
+    from examples.gemini_client import get_client
+    from examples.response_cache import ResponseCache, make_key
+    from examples.instrumentation import get_telemetry
+    from examples.scheduler import DeadlineExceeded, get_scheduler
+except ImportError:
+    from gemini_client import get_client
+    from response_cache import ResponseCache, make_key
+    from instrumentation import get_telemetry
+    from scheduler import DeadlineExceeded, get_scheduler
 
 # -------------------------------------------------------------------------
 # GEMINI ROBOTICS: AGENTIC TOOL USE
 # -------------------------------------------------------------------------
 # Robots often face lack of knowledge (e.g. "Is this bottle recyclable?").
-# This script demonstrates using Gemini's "Tools" (like Google Search) to 
-# ground robot decisions in real-world data.
+# This script demonstrates using Gemini's function calling to ground robot
+# decisions in real-world data:
+#   - Python functions are registered as tools with a JSON schema.
+#   - All tool calls from one model turn run concurrently.
+#   - Tool results are cached with a TTL, keyed by normalized arguments, so
+#     repeated "is #5 plastic recyclable" lookups along a sorting line are free.
+#   - Each decision has a deadline covering model turns and tools alike.
 # -------------------------------------------------------------------------
 
-load_dotenv()
-api_key = os.getenv("GEMINI_API_KEY")
+MODEL_ID = "gemini-robotics-er-1.5-preview"
+
+SEARCH_LATENCY_S = 1.0
+TOOL_CACHE_TTL_S = 15 * 60
+DEFAULT_DEADLINE_S = 15.0
+FALLBACK_DECISION = "Hold for manual sort: no decision before the deadline."
+
+AGENT_PROMPT = """
+You are a recycling robot on a sorting line.
+Object: {object_description}
+
+Decide whether it goes in 'Recycling' or 'Trash'. If you are unsure, use the
+tools to check; request independent lookups in the same turn. Answer with the
+bin and a one sentence reason.
+"""
+
+RESIN_CODES = {1: "PET", 2: "HDPE", 3: "PVC", 4: "LDPE", 5: "PP", 6: "PS", 7: "Other"}
+CURBSIDE_CODES = (1, 2, 5)
+
 
 # Mock tool output for demonstration
 def mock_search_tool(query):
     print(f"\n[Tool Execution] Searching Google for: '{query}'...")
-    time.sleep(1)
+    time.sleep(SEARCH_LATENCY_S)
     if "recyclable" in query.lower():
         return "Search Result: Plastic #5 (PP) is generally recyclable in most modern curbside programs."
     return "No specific info found."
 
-def run_agentic_robot(object_description):
+
+def lookup_resin_code(code):
+    """Local lookup of a resin identification code (the number in the recycling triangle)."""
+    code = int(float(str(code).strip().lstrip("#")))
+    return {"code": code, "resin": RESIN_CODES.get(code, "Unknown"), "curbside": code in CURBSIDE_CODES}
+
+
+def normalize_args(value):
+    """Canonical form of tool arguments: case, whitespace and trailing punctuation don't matter."""
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value.strip().lower()).rstrip("?.! ")
+    if isinstance(value, dict):
+        return {k: normalize_args(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [normalize_args(v) for v in value]
+    return value
+
+
+@dataclass
+class ToolCall:
+    name: str
+    args: dict
+    result: object = None
+    error: str = None
+    cached: bool = False
+    wall_s: float = 0.0
+
+    def response(self):
+        """Payload for the matching function_response part."""
+        return {"error": self.error} if self.error else {"result": self.result}
+
+
+class ToolRegistry:
+    """
+    Python functions exposed to the model as tools. Results of cacheable
+    tools are kept in a `response_cache.ResponseCache` with a TTL.
+    """
+
+    def __init__(self, cache=None, ttl_s=TOOL_CACHE_TTL_S, max_workers=8):
+        self.cache = cache if cache is not None else ResponseCache(max_items=1024, ttl_s=ttl_s)
+        self._tools = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="robot-tool")
+        # Calls already running, shared by every dispatch that asks for the same key
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def register(self, fn, description, parameters, name=None, cacheable=True):
+        """
+        Registers `fn` as a tool. `parameters` maps argument names to JSON
+        schema snippets, e.g. {"query": {"type": "string"}}; all are required.
+        """
+        name = name or fn.__name__
+        declaration = types.FunctionDeclaration(
+            name=name,
+            description=description,
+            parameters_json_schema={"type": "object", "properties": parameters, "required": list(parameters)},
+        )
+        self._tools[name] = (fn, declaration, cacheable)
+        return fn
+
+    def tool(self):
+        return types.Tool(function_declarations=[declaration for _, declaration, _ in self._tools.values()])
+
+    def _cache_key(self, name, args):
+        return make_key("tool:" + name, json.dumps(normalize_args(args), sort_keys=True))
+
+    def _run(self, key, name, args):
+        fn, _, cacheable = self._tools[name]
+        start = time.perf_counter()
+        try:
+            result = fn(**args)
+            if cacheable:
+                self.cache.put(key, result)
+            return result, time.perf_counter() - start
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _submit(self, key, name, args):
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._pool.submit(self._run, key, name, args)
+                self._inflight[key] = future
+            return future
+
+    def dispatch(self, calls, timeout=None):
+        """
+        Executes [(name, args)] concurrently and returns a ToolCall per entry,
+        in order. Cached results cost nothing, and a call that is already
+        running (in this batch or another decision) is joined rather than
+        repeated. Calls still running after `timeout` seconds report an error.
+        """
+        start = time.perf_counter()
+        results = [ToolCall(name, dict(args or {})) for name, args in calls]
+        futures = {}
+        pending = []
+        for call in results:
+            if call.name not in self._tools:
+                call.error = f"Unknown tool '{call.name}'"
+                continue
+            key = self._cache_key(call.name, call.args)
+            if self._tools[call.name][2]:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    call.result, call.cached = cached, True
+                    continue
+            if key not in futures:
+                futures[key] = self._submit(key, call.name, call.args)
+            pending.append((call, futures[key]))
+
+        if futures:
+            wait(futures.values(), timeout=timeout)
+        for call, future in pending:
+            if not future.done():
+                call.error = "Tool timed out before the decision deadline"
+                call.wall_s = time.perf_counter() - start
+            elif future.exception() is not None:
+                call.error = str(future.exception()) or type(future.exception()).__name__
+            else:
+                call.result, call.wall_s = future.result()
+        return results
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+@dataclass
+class AgentDecision:
+    item: str
+    decision: str = None
+    turns: int = 0
+    tool_calls: list = field(default_factory=list)
+    model_s: float = 0.0
+    tool_s: float = 0.0
+    total_s: float = 0.0
+    deadline_exceeded: bool = False
+
+    def summary(self):
+        cached = sum(1 for c in self.tool_calls if c.cached)
+        return (f"⏱️  {self.turns} model turn(s): model {self.model_s * 1000:.0f} ms, "
+                f"tools {self.tool_s * 1000:.0f} ms wall ({len(self.tool_calls)} calls, {cached} cached), "
+                f"total {self.total_s * 1000:.0f} ms" + (" ⚠️ deadline exceeded" if self.deadline_exceeded else ""))
+
+
+_default_registry = None
+_registry_lock = threading.Lock()
+
+
+def default_registry():
+    """The shared registry with the recycling tools, so its cache spans decisions."""
+    global _default_registry
+    with _registry_lock:
+        if _default_registry is None:
+            registry = ToolRegistry()
+            registry.register(mock_search_tool, "Search the web for local recycling rules.",
+                              {"query": {"type": "string", "description": "Search query"}})
+            registry.register(lookup_resin_code, "Look up the plastic type of a resin identification code.",
+                              {"code": {"type": "integer", "description": "Number in the recycling triangle"}})
+            _default_registry = registry
+    return _default_registry
+
+
+def decide(object_description, registry=None, deadline_s=DEFAULT_DEADLINE_S, max_turns=4, client=None):
+    """
+    Runs the function-calling loop for one object until the model answers
+    without tool calls, `max_turns` is reached or `deadline_s` passes.
+    Returns an AgentDecision with model vs tool timing.
+    """
+    registry = registry or default_registry()
+    client = client or get_client()
+    decision = AgentDecision(object_description)
+    start = time.perf_counter()
+    deadline = start + deadline_s
+    contents = [types.Content(role="user", parts=[types.Part.from_text(
+        text=AGENT_PROMPT.format(object_description=object_description))])]
+
+    with get_telemetry().trace("tool_use", model=MODEL_ID) as call:
+        while decision.turns < max_turns:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                decision.deadline_exceeded = True
+                break
+            config = types.GenerateContentConfig(
+                temperature=0.2,
+                tools=[registry.tool()],
+                # The model call may only use what is left of the decision deadline
+                http_options=types.HttpOptions(timeout=max(1, int(remaining * 1000))),
+            )
+            model_start = time.perf_counter()
+            try:
+                response = get_scheduler().call(
+                    lambda: client.models.generate_content(model=MODEL_ID, contents=contents, config=config),
+                    "tool_use", deadline_s=remaining, trace=call)
+            except DeadlineExceeded:
+                # Could not be admitted in time under the shared rate limits
+                decision.model_s += time.perf_counter() - model_start
+                decision.deadline_exceeded = True
+                break
+            except Exception:
+                # A request cut off by the deadline timeout falls back instead of failing
+                if time.perf_counter() < deadline:
+                    raise
+                decision.model_s += time.perf_counter() - model_start
+                decision.deadline_exceeded = True
+                break
+            decision.model_s += time.perf_counter() - model_start
+            decision.turns += 1
+            call.record_usage(response)
+
+            function_calls = response.function_calls or []
+            if not function_calls:
+                decision.decision = (response.text or "").strip()
+                break
+
+            tool_start = time.perf_counter()
+            with call.span("tool"):
+                results = registry.dispatch([(fc.name, fc.args) for fc in function_calls],
+                                            timeout=max(0.0, deadline - tool_start))
+            decision.tool_s += time.perf_counter() - tool_start
+            decision.tool_calls.extend(results)
+
+            contents.append(response.candidates[0].content)
+            contents.append(types.Content(role="user", parts=[
+                types.Part.from_function_response(name=r.name, response=r.response()) for r in results
+            ]))
+
+        if decision.decision is None:
+            decision.deadline_exceeded = decision.deadline_exceeded or time.perf_counter() >= deadline
+            decision.decision = FALLBACK_DECISION
+        decision.total_s = time.perf_counter() - start
+        call.set(turns=decision.turns, tool_calls=len(decision.tool_calls),
+                 cached_tool_calls=sum(1 for c in decision.tool_calls if c.cached))
+    return decision
+
+
+def run_agentic_robot(object_description, registry=None, deadline_s=DEFAULT_DEADLINE_S):
     print(f"🤖 Robot Camera detected: {object_description}")
     print("🤔 Robot Reasoning: I need to decide which bin to put this in.")
-    
-    # NOTE: In the new google.genai API, tools are configured slightly differently:
-    # tool = types.Tool(google_search=types.ToolGoogleSearch())
-    # client.models.generate_content(..., config=types.GenerateContentConfig(tools=[tool]))
-    
-    # For this standalone script, we simulate the 'thought process':
-    
+
+    if get_client() is None:
+        return simulated_demo(object_description, registry)
+
+    print("\n🧠 Gemini Deciding (function calling)...")
+    try:
+        decision = decide(object_description, registry=registry, deadline_s=deadline_s)
+    except Exception as e:
+        print(f"❌ API Error: {e}")
+        return None
+
+    for c in decision.tool_calls:
+        status = "cache" if c.cached else (f"error: {c.error}" if c.error else f"{c.wall_s * 1000:.0f} ms")
+        print(f"   🛠️  {c.name}({json.dumps(c.args)}) -> {status}")
+    print(f"--> {decision.decision}")
+    print(decision.summary())
+    return decision
+
+
+def simulated_demo(object_description, registry=None):
+    # For this standalone script without an API key, we simulate the 'thought process':
+    registry = registry or default_registry()
     query = f"Is {object_description} recyclable?"
-    search_result = mock_search_tool(query)
-    
-    # Now interact with the LLM with the context
-    prompt = f"""
-    You are a recycling robot.
-    Object: {object_description}
-    Knowledge Base Context: {search_result}
-    
-    Decision: Should I put this in 'Recycling' or 'Trash'? Explain briefly.
-    """
-    
+    with get_telemetry().trace("tool_use", simulated=True) as call:
+        with call.span("tool"):
+            (search,) = registry.dispatch([("mock_search_tool", {"query": query})])
+    search_result = search.result if search.result is not None else search.error
+
     print("\n🧠 Gemini Deciding (Simulated context integration)...")
     # Simulated response
     print(f"--> Based on search results ('{search_result}'), this item ({object_description}) should go to RECYCLING because it is Polypropylene.")
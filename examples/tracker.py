@@ -0,0 +1,266 @@
+import time
+
+import numpy as np
+
+try:
+    from examples.overlay import detections_to_arrays
+except ImportError:
+    from overlay import detections_to_arrays
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: TEMPORAL DETECTION TRACKER
+# -------------------------------------------------------------------------
+# A spatial query takes far longer than a camera frame, so the model is
+# only called every few frames. The tracker fills the gaps: detections are
+# associated across model results (IoU for `box_2d`, distance for `point`)
+# into tracks with stable IDs, and a constant-velocity model predicts where
+# each track is on frames without a model result. Confidence halves every
+# `half_life_s` without a fresh observation; once it drops below
+# `refresh_confidence` the tracker asks for a new model call.
+#
+#   tracker = DetectionTracker(max_predicted_frames=5)
+#   for frame in camera:
+#       detections = tracker.process(frame, lambda f: query_model(f))
+#       visualize_results(frame, None, output_path=None, detections=detections)
+# -------------------------------------------------------------------------
+
+
+def box_iou(a, b):
+    """(K, 4) x (M, 4) [ymin, xmin, ymax, xmax] boxes -> (K, M) IoU matrix."""
+    a = np.concatenate([np.minimum(a[:, :2], a[:, 2:]), np.maximum(a[:, :2], a[:, 2:])], axis=1)
+    b = np.concatenate([np.minimum(b[:, :2], b[:, 2:]), np.maximum(b[:, :2], b[:, 2:])], axis=1)
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def greedy_match(scores, min_score):
+    """
+    Pairs rows and columns of a score matrix, best score first, ignoring
+    pairs below `min_score`. Returns [(row, col)].
+    """
+    scores = np.array(scores, dtype=np.float64)
+    pairs = []
+    while scores.size:
+        row, col = np.unravel_index(np.argmax(scores), scores.shape)
+        if scores[row, col] < min_score:
+            break
+        pairs.append((int(row), int(col)))
+        scores[row, :] = -np.inf
+        scores[:, col] = -np.inf
+    return pairs
+
+
+class _TrackSet:
+    """Tracks of one geometry as parallel arrays: coords (K, dim) in 0-1000 units."""
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.coords = np.zeros((0, dim), dtype=np.float32)
+        self.velocity = np.zeros((0, dim), dtype=np.float32)   # units per second
+        self.confidence = np.zeros(0, dtype=np.float32)       # at the last observation
+        self.observed_at = np.zeros(0, dtype=np.float64)
+        self.misses = np.zeros(0, dtype=np.int32)
+        self.hits = np.zeros(0, dtype=np.int32)
+        self.labels = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def keep(self, mask):
+        for name in ("ids", "coords", "velocity", "confidence", "observed_at", "misses", "hits"):
+            setattr(self, name, getattr(self, name)[mask])
+        self.labels = [label for label, k in zip(self.labels, mask) if k]
+
+    def add(self, ids, coords, labels, t):
+        n = len(ids)
+        self.ids = np.concatenate([self.ids, ids])
+        self.coords = np.concatenate([self.coords, coords.astype(np.float32)])
+        self.velocity = np.concatenate([self.velocity, np.zeros((n, self.dim), dtype=np.float32)])
+        self.confidence = np.concatenate([self.confidence, np.ones(n, dtype=np.float32)])
+        self.observed_at = np.concatenate([self.observed_at, np.full(n, t)])
+        self.misses = np.concatenate([self.misses, np.zeros(n, dtype=np.int32)])
+        self.hits = np.concatenate([self.hits, np.ones(n, dtype=np.int32)])
+        self.labels.extend(labels)
+
+    def predicted(self, t, max_predict_s):
+        dt = np.clip(t - self.observed_at, 0.0, max_predict_s)[:, None]
+        return np.clip(self.coords + self.velocity * dt, 0.0, 1000.0)
+
+
+class DetectionTracker:
+    """
+    Multi-object tracker over normalized `box_2d` / `point` detections.
+    Detections only match tracks with the same label (case-insensitive).
+    `t` arguments are frame timestamps in seconds; `clock` is used when
+    they are omitted and is injectable for tests.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_point_distance=60.0, max_misses=2, half_life_s=1.0,
+                 refresh_confidence=0.5, velocity_smoothing=0.5, max_predict_s=2.0, max_predicted_frames=None,
+                 clock=time.monotonic):
+        self.iou_threshold = iou_threshold
+        self.max_point_distance = max_point_distance
+        self.max_misses = max_misses
+        self.half_life_s = half_life_s
+        self.refresh_confidence = refresh_confidence
+        self.velocity_smoothing = velocity_smoothing
+        self.max_predict_s = max_predict_s
+        self.max_predicted_frames = max_predicted_frames
+        self.clock = clock
+        self.boxes = _TrackSet(4)
+        self.points = _TrackSet(2)
+        self.model_frames = 0
+        self.predicted_frames = 0
+        self.tracks_started = 0
+        self.tracks_ended = 0
+        self.last_update_at = None
+        self._next_id = 1
+        self._predicted_in_row = 0
+
+    def _match_scores(self, tracks, predicted, coords, labels):
+        if tracks is self.boxes:
+            scores = box_iou(predicted, coords)
+            min_score = self.iou_threshold
+        else:
+            distance = np.linalg.norm(predicted[:, None, :] - coords[None, :, :], axis=2)
+            # Closer is better; anything beyond max_point_distance scores below 0
+            scores = 1.0 - distance / self.max_point_distance
+            min_score = 0.0
+        same_label = np.array([[str(a).lower() == str(b).lower() for b in labels] for a in tracks.labels],
+                              dtype=bool).reshape(len(tracks), len(labels))
+        return np.where(same_label, scores, -np.inf), min_score
+
+    def _update_set(self, tracks, coords, labels, t):
+        predicted = tracks.predicted(t, self.max_predict_s)
+        pairs = []
+        if len(tracks) and len(coords):
+            scores, min_score = self._match_scores(tracks, predicted, coords, labels)
+            pairs = greedy_match(scores, min_score)
+
+        matched_tracks = np.zeros(len(tracks), dtype=bool)
+        matched_dets = np.zeros(len(coords), dtype=bool)
+        for k, m in pairs:
+            dt = t - tracks.observed_at[k]
+            if dt > 0:
+                observed_velocity = (coords[m] - tracks.coords[k]) / dt
+                a = self.velocity_smoothing
+                tracks.velocity[k] = a * observed_velocity + (1 - a) * tracks.velocity[k]
+            tracks.coords[k] = coords[m]
+            tracks.confidence[k] = 1.0
+            tracks.observed_at[k] = t
+            tracks.misses[k] = 0
+            tracks.hits[k] += 1
+            matched_tracks[k] = matched_dets[m] = True
+
+        # Tracks the model did not see this time keep their prediction but lose confidence
+        missed = ~matched_tracks
+        tracks.misses[missed] += 1
+        alive = tracks.misses <= self.max_misses
+        self.tracks_ended += int((~alive).sum())
+        tracks.keep(alive)
+
+        new = np.flatnonzero(~matched_dets)
+        ids = np.arange(self._next_id, self._next_id + len(new), dtype=np.int64)
+        self._next_id += len(new)
+        tracks.add(ids, coords[new], [labels[i] for i in new], t)
+        self.tracks_started += len(new)
+
+    def update(self, detections, t=None):
+        """Folds a model result into the tracks. Returns the tracked detections at `t`."""
+        t = self.clock() if t is None else t
+        arrays = detections_to_arrays(detections)
+        self._update_set(self.boxes, arrays.boxes, arrays.box_labels, t)
+        self._update_set(self.points, arrays.points, arrays.point_labels, t)
+        self.last_update_at = t
+        self._predicted_in_row = 0
+        self.model_frames += 1
+        return self.detections(t)
+
+    def predict(self, t=None):
+        """Tracked detections for a frame without a model result."""
+        t = self.clock() if t is None else t
+        self._predicted_in_row += 1
+        self.predicted_frames += 1
+        return self.detections(t)
+
+    def confidence(self, tracks, t):
+        age = np.maximum(t - tracks.observed_at, 0.0)
+        return tracks.confidence * np.power(0.5, age / self.half_life_s)
+
+    def detections(self, t=None, show_ids=True):
+        """
+        Current tracks as overlay-ready dicts: `box_2d` or `point`, label
+        (with " #<id>" appended when `show_ids`), track_id, confidence and
+        whether the position is predicted.
+        """
+        t = self.clock() if t is None else t
+        out = []
+        for tracks, key in ((self.boxes, "box_2d"), (self.points, "point")):
+            coords = tracks.predicted(t, self.max_predict_s)
+            confidence = self.confidence(tracks, t)
+            for i in range(len(tracks)):
+                label = tracks.labels[i]
+                out.append({
+                    key: [round(float(v), 1) for v in coords[i]],
+                    "label": f"{label} #{tracks.ids[i]}" if show_ids else label,
+                    "track_id": int(tracks.ids[i]),
+                    "confidence": round(float(confidence[i]), 3),
+                    "predicted": bool(t > tracks.observed_at[i]),
+                })
+        return out
+
+    def refresh_reason(self, t=None):
+        """Why a fresh model call is needed now, or None."""
+        t = self.clock() if t is None else t
+        if self.last_update_at is None:
+            return "no model result yet"
+        if self.max_predicted_frames is not None and self._predicted_in_row >= self.max_predicted_frames:
+            return "max predicted frames"
+        if t - self.last_update_at >= self.max_predict_s:
+            return "prediction horizon"
+        lowest = min((float(self.confidence(s, t).min()) for s in (self.boxes, self.points) if len(s)), default=1.0)
+        if lowest < self.refresh_confidence:
+            return "confidence decayed"
+        return None
+
+    def needs_refresh(self, t=None):
+        return self.refresh_reason(t) is not None
+
+    def process(self, frame, query_fn, t=None):
+        """
+        Returns tracked detections for `frame`, calling `query_fn(frame)`
+        only when `needs_refresh`. A None result (failed call) keeps
+        predicting.
+        """
+        t = self.clock() if t is None else t
+        if self.needs_refresh(t):
+            result = query_fn(frame)
+            if result is not None:
+                return self.update(result, t)
+        return self.predict(t)
+
+    def reset(self):
+        self.boxes = _TrackSet(4)
+        self.points = _TrackSet(2)
+        self.last_update_at = None
+        self._predicted_in_row = 0
+
+    def __len__(self):
+        return len(self.boxes) + len(self.points)
+
+    def stats(self):
+        total = self.model_frames + self.predicted_frames
+        return {
+            "model_frames": self.model_frames,
+            "predicted_frames": self.predicted_frames,
+            "model_call_rate": self.model_frames / total if total else 0.0,
+            "active_tracks": len(self),
+            "tracks_started": self.tracks_started,
+            "tracks_ended": self.tracks_ended,
+        }
@@ -1,42 +1,384 @@
-from google import genai
 from google.genai import types
+import asyncio
+import difflib
+import json
 import time
 import os
-from dotenv import load_dotenv
+from collections import deque
+from dataclasses import dataclass, field
+
+try:
+    from examples.basic_spatial_query import parse_json_response
+    from examples.context_cache import default_context_cache
+    from examples.gemini_client import get_async_client, get_client, run_with_async_client
+    from examples.instrumentation import get_telemetry
+    from examples.scheduler import get_scheduler
+    from examples.thinking_budget import thinking_tokens
+except ImportError:
+    from basic_spatial_query import parse_json_response
+    from context_cache import default_context_cache
+    from gemini_client import get_async_client, get_client, run_with_async_client
+    from instrumentation import get_telemetry
+    from scheduler import get_scheduler
+    from thinking_budget import thinking_tokens
 
 # -------------------------------------------------------------------------
 # GEMINI ROBOTICS: VIDEO ANOMALY DETECTION
 # -------------------------------------------------------------------------
 # Gemini Robotics ER 1.5 can reason about long-horizon robot tasks (minutes to hours)
 # and identify safety violations or anomalies in video streams.
+#
+# Incident logs are often 30-90 minutes long, far too big to send whole.
+# We decode the video as a stream, sample frames at a fixed rate, cut the
+# timeline into overlapping windows, audit windows in parallel and merge
+# the violations back onto the absolute timeline.
+#
+# Follow-up questions about one incident ("what was the operator holding
+# at 02:12?") go through a managed context cache instead: the video and
+# guidelines are uploaded and tokenized once, each question sends only
+# its own text (see context_cache.py).
 # -------------------------------------------------------------------------
 
-load_dotenv()
-api_key = os.getenv("GEMINI_API_KEY")
+MODEL_ID = "gemini-robotics-er-1.5-preview"
+
+WINDOW_PROMPT = """
+You are a robot safety auditor. The images above are frames sampled from a
+{duration:.0f} second window of a robot work cell video. Each frame is preceded
+by its offset in seconds from the start of the window.
+
+Safety Guidelines:
+{guidelines}
+
+List every violation of the guidelines you can see. Return ONLY JSON:
+{{"violations": [{{"offset_s": <seconds from window start>, "rule": "<guideline number>", "reason": "<short explanation>"}}]}}
+Return {{"violations": []}} if the window is safe.
+"""
+
+
+@dataclass
+class VideoWindow:
+    index: int
+    start_s: float
+    end_s: float
+    frames: list = field(default_factory=list)  # [(timestamp_s, jpeg_bytes)]
+
+
+def format_timecode(seconds):
+    seconds = max(0, int(round(seconds)))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def parse_timecode(value):
+    """Accepts seconds (int/float/"12.5") or "MM:SS" / "HH:MM:SS" strings."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    parts = str(value).strip().split(":")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def sample_frames(video_path, sample_fps=1.0, max_edge=768, jpeg_quality=80):
+    """
+    Yields (timestamp_s, jpeg_bytes) at roughly `sample_fps`, decoding the
+    video as a stream. Skipped frames are only grabbed, never converted,
+    and at most one decoded frame is held at a time.
+    """
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video '{video_path}'")
+    try:
+        native_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        step = max(1, round(native_fps / sample_fps))
+        frame_index = 0
+        while cap.grab():
+            if frame_index % step == 0:
+                ok, frame = cap.retrieve()
+                if not ok:
+                    break
+                h, w = frame.shape[:2]
+                scale = max_edge / max(h, w)
+                if scale < 1:
+                    frame = cv2.resize(frame, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+                ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+                if ok:
+                    yield frame_index / native_fps, encoded.tobytes()
+            frame_index += 1
+    finally:
+        cap.release()
+
+
+def iter_windows(frames, window_s=60.0, overlap_s=10.0):
+    """
+    Groups (timestamp_s, data) frames into overlapping windows of `window_s`
+    seconds, advancing by `window_s - overlap_s`. Only frames of the current
+    window are buffered.
+    """
+    if not 0 <= overlap_s < window_s:
+        raise ValueError("overlap_s must be >= 0 and smaller than window_s")
+    stride = window_s - overlap_s
+    buffered = deque()
+    start = 0.0
+    index = 0
+    fresh = False  # True once a frame arrived that no emitted window contains
+
+    for ts, data in frames:
+        while ts >= start + window_s:
+            if fresh:
+                yield VideoWindow(index, start, start + window_s, list(buffered))
+                index += 1
+            start += stride
+            while buffered and buffered[0][0] < start:
+                buffered.popleft()
+            fresh = False
+        buffered.append((ts, data))
+        fresh = True
+
+    if fresh and buffered:
+        yield VideoWindow(index, start, buffered[-1][0], list(buffered))
+
+
+def _window_contents(window, safety_guidelines):
+    contents = []
+    for ts, data in window.frames:
+        contents.append(f"[t=+{ts - window.start_s:.1f}s]")
+        contents.append(types.Part.from_bytes(data=data, mime_type="image/jpeg"))
+    contents.append(WINDOW_PROMPT.format(duration=window.end_s - window.start_s, guidelines=safety_guidelines))
+    return contents
+
+
+def window_violations(window, response_text):
+    """Converts a window's JSON answer into violations on the absolute timeline."""
+    data = parse_json_response(response_text or "")
+    if isinstance(data, dict):
+        data = data.get("violations", [])
+    if not isinstance(data, list):
+        raise ValueError("Window response was not valid violation JSON")
+
+    violations = []
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        offset = item.get("offset_s", item.get("timestamp", 0))
+        try:
+            time_s = window.start_s + parse_timecode(offset)
+        except ValueError:
+            time_s = window.start_s
+        violations.append({
+            "time_s": round(min(time_s, window.end_s), 1),
+            "rule": str(item.get("rule", "")).strip(),
+            "reason": str(item.get("reason", "")).strip(),
+            "window": window.index,
+            "window_start_s": window.start_s,
+            "window_end_s": window.end_s,
+        })
+    return violations
+
 
-if api_key:
-    client = genai.Client(api_key=api_key)
-else:
-    client = None
+def merge_violations(violations, tolerance_s=5.0, similarity=0.6):
+    """
+    Sorts violations by time and collapses duplicates within `tolerance_s`:
+    the same rule and reason reported twice, or the same rule (or a similar
+    reason) reported by two overlapping windows for a moment inside their
+    overlap. Distinct events of one rule a few seconds apart stay separate.
+    """
+    def in_overlap(v, other):
+        if v["window"] == other["window"] or "window_start_s" not in v or "window_start_s" not in other:
+            return False
+        lo = max(v["window_start_s"], other["window_start_s"])
+        hi = min(v["window_end_s"], other["window_end_s"])
+        return lo <= v["time_s"] <= hi and lo <= other["time_s"] <= hi
 
-def analyze_video_safety(video_path, safety_guidelines):
+    def is_duplicate(v, other):
+        if abs(v["time_s"] - other["time_s"]) > tolerance_s:
+            return False
+        same_rule = v["rule"] == other["rule"]
+        if same_rule and " ".join(v["reason"].lower().split()) == " ".join(other["reason"].lower().split()):
+            return True
+        similar = difflib.SequenceMatcher(None, v["reason"].lower(), other["reason"].lower()).ratio() >= similarity
+        return ((same_rule and v["rule"]) or similar) and in_overlap(v, other)
+
+    def find_duplicate(v):
+        for i in range(len(merged) - 1, -1, -1):
+            if v["time_s"] - sources[i][-1]["time_s"] > tolerance_s:
+                return None
+            if any(is_duplicate(v, other) for other in sources[i]):
+                return i
+        return None
+
+    merged = []
+    sources = []  # the raw reports behind each merged violation
+    for v in sorted(violations, key=lambda v: v["time_s"]):
+        i = find_duplicate(v)
+        if i is not None:
+            merged[i]["windows"].append(v["window"])
+            sources[i].append(v)
+        else:
+            sources.append([v])
+            merged.append({
+                "timestamp": format_timecode(v["time_s"]),
+                "time_s": v["time_s"],
+                "rule": v["rule"],
+                "reason": v["reason"],
+                "windows": [v["window"]],
+            })
+    return merged
+
+
+async def _analyze_window(aio, window, safety_guidelines, config, budget_controller=None):
+    try:
+        with get_telemetry().trace("video", model=MODEL_ID, window=window.index) as call:
+            budget = None
+            if budget_controller is not None:
+                budget = budget_controller.choose("safety")
+                config = config.model_copy(update={
+                    "thinking_config": types.ThinkingConfig(thinking_budget=budget.budget)})
+                call.set(thinking_budget=budget.budget)
+            with call.span("encode"):
+                contents = _window_contents(window, safety_guidelines)
+            call.add_bytes(sum(len(jpeg) for _, jpeg in window.frames) + len(safety_guidelines.encode("utf-8")))
+            response = await get_scheduler().acall(
+                lambda: aio.models.generate_content(
+                    model=MODEL_ID,
+                    contents=contents,
+                    config=config,
+                ),
+                "video",
+                trace=call,
+            )
+            model_latency_s = call.record.spans["model"]
+            call.record_usage(response)
+            try:
+                with call.span("parse"):
+                    found = window_violations(window, response.text)
+            except ValueError:
+                if budget is not None:
+                    budget_controller.record(budget, model_latency_s, valid=False,
+                                             thinking_tokens=thinking_tokens(response))
+                raise
+            if budget is not None:
+                budget_controller.record(budget, model_latency_s, valid=True, thinking_tokens=thinking_tokens(response))
+        return window, found, None
+    except Exception as e:
+        return window, [], str(e)
+
+
+async def _analyze_windows(windows, safety_guidelines, max_in_flight, budget_controller=None):
+    config = types.GenerateContentConfig(
+        temperature=0.2,
+        thinking_config=types.ThinkingConfig(thinking_budget=1024)
+    )
+    aio = get_async_client()
+    windows = iter(windows)
+    pending = set()
+    violations, failed = [], []
+    analyzed = 0
+    exhausted = False
+    try:
+        while True:
+            # Decode the next window off the event loop only when a slot is free,
+            # so at most `max_in_flight` windows of frames are alive at once
+            while not exhausted and len(pending) < max_in_flight:
+                window = await asyncio.to_thread(next, windows, None)
+                if window is None:
+                    exhausted = True
+                    break
+                print(f"   ⏩ Window {window.index}: {format_timecode(window.start_s)}-"
+                      f"{format_timecode(window.end_s)} ({len(window.frames)} frames)")
+                pending.add(asyncio.create_task(
+                    _analyze_window(aio, window, safety_guidelines, config, budget_controller)))
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                window, found, error = task.result()
+                analyzed += 1
+                violations.extend(found)
+                if error:
+                    failed.append({"window": window.index, "start": format_timecode(window.start_s), "error": error})
+    finally:
+        for task in pending:
+            task.cancel()
+    return violations, failed, analyzed
+
+
+def analyze_video_safety(video_path, safety_guidelines, sample_fps=1.0, window_s=60.0, overlap_s=10.0,
+                         max_in_flight=4, budget_controller=None, store=None, video_start_t=0.0):
+    """
+    Audits a video of any length against `safety_guidelines` and returns one
+    merged report with absolute timecodes. Falls back to the simulated demo
+    when no API key is configured or the video does not exist. Pass a
+    `thinking_budget.ThinkingBudgetController` to adapt the per-window
+    thinking budget under the "safety" class. Pass a
+    `detection_store.DetectionStore` as `store` to log the violations at
+    `video_start_t` (the recording's start, epoch seconds) + their offset.
+    """
+    client = get_client() if os.path.exists(video_path) else None
+    if client is None:
+        simulated_demo(video_path, safety_guidelines)
+        return None
+
+    print(f"🎬 Sampling '{video_path}' at {sample_fps:g} fps in {window_s:g}s windows ({overlap_s:g}s overlap)...")
+    print("✅ Analyzing against Safety Guidelines:")
+    print(f"   Guidelines: {safety_guidelines}")
+
+    start = time.perf_counter()
+    windows = iter_windows(sample_frames(video_path, sample_fps), window_s, overlap_s)
+    violations, failed, analyzed = run_with_async_client(
+        _analyze_windows(windows, safety_guidelines, max_in_flight, budget_controller))
+    merged = merge_violations(violations, tolerance_s=max(overlap_s / 2, 2.0))
+    if store is not None:
+        store.append_violations(merged, video_start_t)
+        store.flush()
+
+    report = {
+        "video": video_path,
+        "status": "UNSAFE" if merged else ("INCOMPLETE" if failed else "SAFE"),
+        "windows_analyzed": analyzed,
+        "violations": merged,
+        "failed_windows": failed,
+        "elapsed_s": round(time.perf_counter() - start, 2),
+    }
+
+    print("\n🧠 Gemini Safety Report:")
+    print("--------------------------------------------------")
+    print(json.dumps(report, indent=2))
+    print("--------------------------------------------------")
+    return report
+
+
+def ask_about_video(video_path, safety_guidelines, questions, context_cache=None):
+    """
+    Answers follow-up `questions` about one video through a context cache
+    (the shared one by default), so the clip is uploaded and tokenized
+    once however many questions are asked. Returns [(question, answer)].
+    """
+    context_cache = context_cache or default_context_cache()
+    answers = []
+    with context_cache.acquire(video_path, safety_guidelines) as video:
+        print(f"🎬 '{video_path}' is in Gemini Context Cache ({video.entry.cached_tokens} tokens)")
+        for question in questions:
+            try:
+                answer = video.ask(question)
+            except Exception as e:
+                print(f"❌ API Error: {e}")
+                answer = None
+            print(f"\n❓ {question}\n🧠 {answer}")
+            answers.append((question, answer))
+    stats = context_cache.stats()
+    print(f"\n💾 Cached tokens served: {stats['cached_tokens_served']}, "
+          f"saved vs re-sending the video: {stats['tokens_saved']}")
+    return answers
+
+
+def simulated_demo(video_path, safety_guidelines):
     print(f"🎬 Uploading video '{video_path}' to Gemini Context Cache...")
-    
-    # NOTE: In the new google.genai SDK
-    # with open(video_path, 'rb') as f:
-    #     video_bytes = f.read()
-    # 
-    # response = client.models.generate_content(
-    #     model='gemini-robotics-er-1.5-preview',
-    #     contents=[
-    #         types.Part.from_bytes(data=video_bytes, mime_type='video/mp4'),
-    #         "Analyze this video..."
-    #     ]
-    # )
-    
     print("✅ Video Processed. Analyzing against Safety Guidelines:")
     print(f"   Guidelines: {safety_guidelines}")
-    
+
     print("\n🧠 Gemini Output (Simulated for Demo):")
     print("--------------------------------------------------")
     print("""{
@@ -0,0 +1,13 @@
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: ROS 2 BRIDGE
+# -------------------------------------------------------------------------
+# Transport-agnostic core for feeding camera topics to Gemini Robotics ER.
+# A ROS 2 node only needs to call `GeminiBridge.publish` from its image
+# subscription and publish each BridgeResult with the source stamp.
+# Gemini query adapters live in `gemini_query` (imported on demand, since
+# they pull in the SDK).
+# -------------------------------------------------------------------------
+
+from ros2_gemini_bridge.bridge import BridgeResult, GeminiBridge, RateLimiter
+from ros2_gemini_bridge.frame_ring import FrameRef, FrameRing
+from ros2_gemini_bridge.synthetic import SyntheticCamera, synthetic_frame
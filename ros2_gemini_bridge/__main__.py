@@ -0,0 +1,41 @@
+import time
+
+from ros2_gemini_bridge import GeminiBridge, SyntheticCamera
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: BRIDGE DEMO
+# -------------------------------------------------------------------------
+# Publishes a synthetic camera into a slow stand-in model to show the
+# latest-frame-wins behaviour without ROS or an API key:
+#
+#   python -m ros2_gemini_bridge --hz 30 --model-latency 0.5
+# -------------------------------------------------------------------------
+
+
+def demo(hz, model_latency_s, seconds):
+    def slow_model(topic, frame):
+        time.sleep(model_latency_s)
+        return {"mean_intensity": float(frame.array.mean())}
+
+    def on_result(result):
+        print(f"  seq {result.seq:>4}  stamp {result.source_stamp:10.3f}  "
+              f"latency {result.latency_s * 1000:6.0f} ms  age {result.age_s * 1000:6.0f} ms  "
+              f"skipped {result.frames_skipped:>3}")
+
+    bridge = GeminiBridge()
+    bridge.add_topic("/camera/color/image_raw", slow_model, callback=on_result, max_hz=5.0)
+    print(f"📷 Publishing {hz:g} Hz into a {model_latency_s * 1000:.0f} ms model for {seconds:g}s...")
+    with bridge, SyntheticCamera(bridge, "/camera/color/image_raw", hz=hz):
+        time.sleep(seconds)
+    print(f"📊 {bridge.stats()}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Drive the bridge core with a synthetic camera.")
+    parser.add_argument("--hz", type=float, default=30.0)
+    parser.add_argument("--model-latency", type=float, default=0.5)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+    demo(args.hz, args.model_latency, args.seconds)
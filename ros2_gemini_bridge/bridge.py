@@ -0,0 +1,203 @@
+import threading
+import time
+from dataclasses import dataclass
+
+try:
+    from ros2_gemini_bridge.frame_ring import FrameRing
+except ImportError:
+    from frame_ring import FrameRing
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: FRAME-INGEST BRIDGE CORE
+# -------------------------------------------------------------------------
+# Transport-agnostic core of the ROS 2 bridge. A subscription callback only
+# calls `bridge.publish(topic, frame, stamp)`, which copies the frame into
+# that topic's ring buffer and returns immediately. One worker per topic
+# takes the newest frame when the model is free and the topic's rate limit
+# allows, so results are never more than one model call stale:
+#
+#   bridge = GeminiBridge()
+#   bridge.add_topic("/camera/color", query_fn, callback=on_result, max_hz=2.0)
+#   with bridge:
+#       bridge.publish("/camera/color", frame, stamp=header_stamp_s)
+#
+# `query_fn(topic, frame_ref)` does the model call; `callback(result)`
+# receives a BridgeResult stamped with the source frame's timestamp, so a
+# ROS node can publish it with the original header.
+# -------------------------------------------------------------------------
+
+
+@dataclass
+class BridgeResult:
+    topic: str
+    seq: int
+    source_stamp: float       # stamp passed to `publish` for the analyzed frame
+    received_at: float        # bridge clock when the frame was published
+    completed_at: float
+    latency_s: float          # time spent in query_fn
+    value: object = None
+    error: str = None
+    frames_skipped: int = 0   # frames superseded since the previous result
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def age_s(self):
+        """How stale the result is relative to when its frame arrived."""
+        return self.completed_at - self.received_at
+
+
+class RateLimiter:
+    """Allows at most `max_hz` events per second (None = unlimited)."""
+
+    def __init__(self, max_hz=None, clock=time.monotonic):
+        self.min_interval_s = 1.0 / max_hz if max_hz else 0.0
+        self.clock = clock
+        self._last = None
+
+    def wait_time(self):
+        if self._last is None or not self.min_interval_s:
+            return 0.0
+        return max(0.0, self._last + self.min_interval_s - self.clock())
+
+    def mark(self):
+        self._last = self.clock()
+
+
+class _Topic:
+    def __init__(self, name, query_fn, callback, max_hz, ring, clock):
+        self.name = name
+        self.query_fn = query_fn
+        self.callback = callback
+        self.ring = ring
+        self.limiter = RateLimiter(max_hz, clock)
+        self.received_at = {}   # seq -> bridge clock at publish
+        self.thread = None
+        self.results = 0
+        self.errors = 0
+        self.latencies = []
+
+
+class GeminiBridge:
+    """
+    Per-topic ring buffers with latest-frame-wins workers. `clock` is used
+    for receive/complete times; stamps passed to `publish` are opaque and
+    returned unchanged on the result.
+    """
+
+    def __init__(self, clock=time.monotonic, poll_s=0.05):
+        self.clock = clock
+        self.poll_s = poll_s
+        self._topics = {}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def add_topic(self, name, query_fn, callback=None, max_hz=None, capacity=4, slot_nbytes=1920 * 1080 * 3):
+        if name in self._topics:
+            raise ValueError(f"Topic '{name}' is already registered")
+        topic = _Topic(name, query_fn, callback, max_hz, FrameRing(capacity, slot_nbytes), self.clock)
+        self._topics[name] = topic
+        if self.running:
+            self._start_worker(topic)
+        return topic.ring
+
+    @property
+    def running(self):
+        return any(t.thread is not None and t.thread.is_alive() for t in self._topics.values())
+
+    def publish(self, topic, frame, stamp=None):
+        """
+        Hands a frame to the bridge without blocking on the model.
+        `frame` may be a numpy array, bytes or memoryview. Returns the
+        frame's sequence number, or None if the ring rejected it.
+        """
+        t = self._topics[topic]
+        received_at = self.clock()
+        seq = t.ring.write(frame, received_at if stamp is None else stamp)
+        if seq is not None:
+            with self._lock:
+                t.received_at[seq] = received_at
+                # Only frames that can still become "latest" need a receive time
+                for old in [s for s in t.received_at if s < seq - t.ring.capacity]:
+                    del t.received_at[old]
+        return seq
+
+    def start(self):
+        self._stop.clear()
+        for topic in self._topics.values():
+            if topic.thread is None or not topic.thread.is_alive():
+                self._start_worker(topic)
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        for topic in self._topics.values():
+            if topic.thread is not None:
+                topic.thread.join(timeout)
+                topic.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _start_worker(self, topic):
+        topic.thread = threading.Thread(target=self._worker, args=(topic,), daemon=True,
+                                        name=f"gemini-bridge{topic.name.replace('/', '-')}")
+        topic.thread.start()
+
+    def _worker(self, topic):
+        last_seq = -1
+        while not self._stop.is_set():
+            # Sleep off the rate limit first, so the frame picked afterwards is the newest one
+            wait = topic.limiter.wait_time()
+            if wait:
+                self._stop.wait(min(wait, self.poll_s))
+                continue
+            ref = topic.ring.acquire_latest(after_seq=last_seq, timeout=self.poll_s)
+            if ref is None:
+                continue
+            topic.limiter.mark()
+            with self._lock:
+                received_at = topic.received_at.get(ref.seq, self.clock())
+            skipped = ref.seq - last_seq - 1 if last_seq >= 0 else ref.seq
+            last_seq = ref.seq
+
+            start = self.clock()
+            value, error = None, None
+            try:
+                with ref:
+                    value = topic.query_fn(topic.name, ref)
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            completed_at = self.clock()
+
+            result = BridgeResult(topic.name, ref.seq, ref.stamp, received_at, completed_at,
+                                  completed_at - start, value, error, skipped)
+            with self._lock:
+                topic.results += 1
+                topic.errors += 0 if result.ok else 1
+                topic.latencies.append(result.latency_s)
+                del topic.latencies[:-1000]
+            if topic.callback is not None:
+                try:
+                    topic.callback(result)
+                except Exception as e:
+                    print(f"⚠️ Bridge callback for {topic.name} failed: {e}")
+
+    def stats(self):
+        stats = {}
+        with self._lock:
+            for name, t in self._topics.items():
+                latencies = sorted(t.latencies)
+                stats[name] = {
+                    **t.ring.stats(),
+                    "results": t.results,
+                    "errors": t.errors,
+                    "mean_latency_s": sum(latencies) / len(latencies) if latencies else None,
+                    "max_hz": 1.0 / t.limiter.min_interval_s if t.limiter.min_interval_s else None,
+                }
+        return stats
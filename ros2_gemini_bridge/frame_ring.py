@@ -0,0 +1,168 @@
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: FRAME RING BUFFER
+# -------------------------------------------------------------------------
+# A fixed set of preallocated frame slots shared between a camera callback
+# (producer) and a model worker (consumer):
+#   - `write` copies the incoming frame into a free slot once; nothing is
+#     allocated per frame.
+#   - `acquire_latest` hands the consumer a read-only numpy view (or
+#     memoryview) of the newest frame without copying, and pins that slot
+#     so the producer never overwrites it mid-read.
+#   - Latest frame wins: frames superseded before a consumer picked them up
+#     are counted as dropped instead of queued behind slow model calls.
+# -------------------------------------------------------------------------
+
+
+@dataclass
+class _Slot:
+    seq: int = -1
+    stamp: float = None
+    shape: tuple = None
+    dtype: np.dtype = None
+    nbytes: int = 0
+    pins: int = 0
+
+
+class FrameRef:
+    """A pinned, read-only view of one frame in a FrameRing. Release it when done."""
+
+    def __init__(self, ring, index, slot):
+        self._ring = ring
+        self._index = index
+        self.seq = slot.seq
+        self.stamp = slot.stamp
+        flat = ring._buffer[index, :slot.nbytes]
+        self.array = flat.view(slot.dtype).reshape(slot.shape)
+        self.array.flags.writeable = False
+        self._released = False
+
+    def memoryview(self):
+        return memoryview(self.array)
+
+    def tobytes(self):
+        """Copies the frame out (e.g. to build an upload payload)."""
+        return self.array.tobytes()
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._ring._release(self._index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class FrameRing:
+    """
+    Ring of `capacity` slots of up to `slot_nbytes` each. Frames may be any
+    numpy array, bytes or memoryview that fits; shape and dtype are kept per
+    slot, so raw images and compressed JPEG bytes both work.
+    """
+
+    def __init__(self, capacity=4, slot_nbytes=1920 * 1080 * 3):
+        if capacity < 2:
+            raise ValueError("capacity must be >= 2 so one slot can be read while another is written")
+        self.capacity = capacity
+        self.slot_nbytes = slot_nbytes
+        self._buffer = np.empty((capacity, slot_nbytes), dtype=np.uint8)
+        self._slots = [_Slot() for _ in range(capacity)]
+        self._next = 0
+        self._latest = None          # slot index of the newest committed frame
+        self._consumed_seq = -1      # newest seq handed to a consumer
+        self._seq = 0
+        self._cond = threading.Condition()
+        self.written = 0
+        self.dropped = 0             # superseded before any consumer saw them
+        self.rejected = 0            # no free slot (every slot pinned) or too large
+
+    def write(self, frame, stamp):
+        """
+        Copies `frame` into a free slot and makes it the latest frame.
+        Never blocks on consumers. Returns the frame's sequence number, or
+        None if it was rejected.
+        """
+        if isinstance(frame, np.ndarray):
+            array = np.ascontiguousarray(frame)
+        else:
+            array = np.frombuffer(frame, dtype=np.uint8)
+        if array.nbytes > self.slot_nbytes:
+            with self._cond:
+                self.rejected += 1
+            return None
+
+        with self._cond:
+            index = self._free_slot()
+            if index is None:
+                self.rejected += 1
+                return None
+            slot = self._slots[index]
+            # Pin the slot while it is written so no other writer or reader touches it
+            slot.seq = -1
+            slot.pins += 1
+            if self._latest is not None and self._slots[self._latest].seq > self._consumed_seq:
+                self.dropped += 1
+
+        # The copy happens outside the lock so readers of other slots never wait on it
+        self._buffer[index, :array.nbytes] = array.reshape(-1).view(np.uint8)
+
+        with self._cond:
+            seq = self._seq
+            self._seq += 1
+            slot.seq, slot.stamp = seq, stamp
+            slot.shape, slot.dtype, slot.nbytes = array.shape, array.dtype, array.nbytes
+            slot.pins -= 1
+            self._latest = index
+            self.written += 1
+            self._cond.notify_all()
+        return seq
+
+    def _free_slot(self):
+        for offset in range(self.capacity):
+            index = (self._next + offset) % self.capacity
+            if self._slots[index].pins == 0 and index != self._latest:
+                self._next = (index + 1) % self.capacity
+                return index
+        return None
+
+    def acquire_latest(self, after_seq=-1, timeout=None):
+        """
+        Pins and returns a FrameRef to the newest frame with seq > `after_seq`,
+        waiting up to `timeout` seconds for one. Returns None on timeout.
+        """
+        with self._cond:
+            ready = self._cond.wait_for(
+                lambda: self._latest is not None and self._slots[self._latest].seq > after_seq, timeout)
+            if not ready:
+                return None
+            index = self._latest
+            slot = self._slots[index]
+            slot.pins += 1
+            self._consumed_seq = max(self._consumed_seq, slot.seq)
+            return FrameRef(self, index, slot)
+
+    def _release(self, index):
+        with self._cond:
+            self._slots[index].pins -= 1
+
+    @property
+    def latest_seq(self):
+        with self._cond:
+            return self._slots[self._latest].seq if self._latest is not None else -1
+
+    def stats(self):
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "written": self.written,
+                "dropped": self.dropped,
+                "rejected": self.rejected,
+                "pinned": sum(1 for s in self._slots if s.pins),
+            }
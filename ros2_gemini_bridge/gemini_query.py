@@ -0,0 +1,71 @@
+import io
+
+from google.genai import types
+from PIL import Image
+
+from examples.basic_spatial_query import MODEL_ID, parse_json_response
+from examples.gemini_client import get_client
+from examples.image_payload import optimize_image
+from examples.instrumentation import get_telemetry
+from examples.scheduler import get_scheduler
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: BRIDGE QUERY FUNCTIONS
+# -------------------------------------------------------------------------
+# Adapters between a pinned FrameRef and the spatial query. The frame is
+# read straight from the ring slot; the only copy is the JPEG encode that
+# builds the upload payload.
+# -------------------------------------------------------------------------
+
+
+def encode_frame(frame_ref, max_edge=1024, quality=85):
+    """Returns (jpeg_bytes, mime_type) for a raw RGB/gray array or compressed bytes frame."""
+    array = frame_ref.array
+    if array.ndim == 1 and array.dtype.itemsize == 1:
+        # Already compressed (sensor_msgs/CompressedImage)
+        payload = optimize_image(frame_ref.memoryview().tobytes(), max_edge=max_edge, quality=quality)
+        return payload.data, payload.mime_type
+    image = Image.fromarray(array)
+    if max(image.size) > max_edge:
+        scale = max_edge / max(image.size)
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                             Image.BILINEAR)
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue(), "image/jpeg"
+
+
+def make_spatial_query(prompt_text, model=MODEL_ID, max_edge=1024, quality=85, thinking_budget=0):
+    """
+    Builds a `query_fn(topic, frame_ref)` for GeminiBridge that returns the
+    parsed detections (0-1000 normalized) for the frame. Budget 0 by
+    default: bridge topics are latency bound. Calls go through the shared
+    `scheduler` at perception priority, with the topic as the robot ID.
+    """
+    config = types.GenerateContentConfig(
+        temperature=0.5,
+        thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget),
+    )
+
+    def query(topic, frame_ref):
+        client = get_client()
+        if client is None:
+            raise RuntimeError("No Gemini client available. Check GEMINI_API_KEY.")
+        with get_telemetry().trace("perception", model=model, topic=topic, seq=frame_ref.seq) as call:
+            with call.span("encode"):
+                data, mime_type = encode_frame(frame_ref, max_edge, quality)
+            call.add_bytes(len(data) + len(prompt_text.encode("utf-8")))
+            # Shares the process-wide rate limits; each topic gets its own fair share
+            response = get_scheduler().call(
+                lambda: client.models.generate_content(
+                    model=model,
+                    contents=[types.Part.from_bytes(data=data, mime_type=mime_type), prompt_text],
+                    config=config,
+                ),
+                "perception", robot_id=topic, trace=call,
+            )
+            call.record_usage(response)
+            with call.span("parse"):
+                return parse_json_response(response.text or "")
+
+    return query
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import numpy as np
+
+# -------------------------------------------------------------------------
+# GEMINI ROBOTICS: SYNTHETIC CAMERA PUBLISHER
+# -------------------------------------------------------------------------
+# Stands in for a ROS 2 image topic so the bridge can be exercised (and
+# tested) in plain Python: a square moving across a gray frame, published
+# at a fixed rate with monotonically increasing stamps.
+# -------------------------------------------------------------------------
+
+
+def synthetic_frame(i, shape=(480, 640, 3), size=60):
+    h, w = shape[:2]
+    frame = np.full(shape, 90, dtype=np.uint8)
+    x = (i * 8) % max(1, w - size)
+    y = h // 2 - size // 2
+    frame[y:y + size, x:x + size] = 230
+    return frame
+
+
+class SyntheticCamera:
+    """Publishes `synthetic_frame`s to `bridge` on `topic` at `hz` from a background thread."""
+
+    def __init__(self, bridge, topic, hz=30.0, shape=(480, 640, 3), max_frames=None, clock=time.monotonic):
+        self.bridge = bridge
+        self.topic = topic
+        self.period_s = 1.0 / hz
+        self.shape = shape
+        self.max_frames = max_frames
+        self.clock = clock
+        self.published = 0
+        self.stamps = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.join()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        next_at = self.clock()
+        i = 0
+        while not self._stop.is_set() and (self.max_frames is None or i < self.max_frames):
+            stamp = self.clock()
+            self.bridge.publish(self.topic, synthetic_frame(i, self.shape), stamp=stamp)
+            self.stamps.append(stamp)
+            self.published += 1
+            i += 1
+            next_at += self.period_s
+            self._stop.wait(max(0.0, next_at - self.clock()))
@@ -0,0 +1,70 @@
+import json
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from examples.mock_gemini_server import MockGeminiServer
+
+try:
+    from google import genai
+    from google.genai import types
+except ImportError:
+    genai = None
+
+COMMANDS = ["Go to the table", "Go to the moon", "Go to the door", "Go to the shelf"]
+BATCH_ANSWER = {f"c{i + 1}": [{"action": "move_to", "target": f"spot {i}"}] for i in range(len(COMMANDS))}
+BATCH_ANSWER["c2"] = [{"action": "teleport", "target": "moon"}]
+REPLAN_ANSWER = {"c1": [{"action": "move_to", "target": "moon"}]}
+
+
+@unittest.skipIf(genai is None, "google-genai is not installed")
+class TestBatchPlanning(unittest.TestCase):
+    def setUp(self):
+        from examples import gemini_client
+
+        self.gemini_client = gemini_client
+        self.server = MockGeminiServer(
+            responses=[("c1: Go to the moon", json.dumps(REPLAN_ANSWER)), ("JSON Plans:", json.dumps(BATCH_ANSWER))],
+            response_text='[{"action": "move_to", "target": "table"}]').start()
+        gemini_client.set_client(
+            genai.Client(api_key="mock", http_options=types.HttpOptions(base_url=self.server.base_url)))
+
+    def tearDown(self):
+        self.server.stop()
+        self.gemini_client.reset_client()
+
+    def test_only_invalid_plans_are_replanned(self):
+        from examples.task_decomposition import plan_missions_batch
+
+        result = plan_missions_batch(COMMANDS + ["Go to the table"])
+        self.assertEqual(set(result.plans), set(COMMANDS))
+        self.assertEqual(result.plans["Go to the moon"], REPLAN_ANSWER["c1"])
+        self.assertEqual(result.errors, {})
+        self.assertEqual((result.calls, result.replanned), (2, 1))
+        self.assertEqual(self.server.stats()["requests"], 2)
+
+    def test_plans_that_stay_invalid_are_reported(self):
+        from examples.task_decomposition import plan_missions_batch
+
+        result = plan_missions_batch(["Go to the door", "Go to the moon"], max_replans=0)
+        self.assertEqual(list(result.plans), ["Go to the door"])
+        self.assertIn("teleport", result.errors["Go to the moon"])
+
+    def test_batching_beats_one_call_per_command(self):
+        from examples.task_decomposition import compare_batched_planning
+
+        commands = [c for c in COMMANDS if c != "Go to the moon"]
+        answer = {f"c{i + 1}": [{"action": "move_to", "target": c[9:]}] for i, c in enumerate(commands)}
+        self.server.responses = [("JSON Plans:", json.dumps(answer))]
+        report = compare_batched_planning(commands, batch_size=8)
+        self.assertEqual(report["per_command"]["calls"], 3)
+        self.assertEqual(report["batched"]["calls"], 1)
+        self.assertEqual(report["batched"]["plans"], 3)
+        # The system prompt is sent once per batch instead of once per command
+        self.assertLess(report["batched"]["tokens_per_plan"], report["per_command"]["tokens_per_plan"])
+
+
+if __name__ == '__main__':
+    unittest.main()
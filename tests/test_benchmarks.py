@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+import unittest
+import urllib.error
+import urllib.request
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from examples.mock_gemini_server import MockGeminiServer
+
+
+def post(server, body, method="generateContent"):
+    request = urllib.request.Request(
+        f"{server.base_url}v1beta/models/mock:{method}",
+        data=json.dumps(body).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())
+
+
+def text_request(text):
+    return {"contents": [{"role": "user", "parts": [{"text": text}]}]}
+
+
+class TestMockServer(unittest.TestCase):
+    def test_canned_responses_route_by_prompt_substring(self):
+        responses = [("JSON Plan:", "plan"), ("safety auditor", "audit")]
+        with MockGeminiServer(response_text="default", responses=responses) as server:
+            answer = lambda t: post(server, text_request(t))["candidates"][0]["content"]["parts"][0]["text"]
+            self.assertEqual(answer("User Command: x\nJSON Plan:"), "plan")
+            self.assertEqual(answer("You are a safety auditor."), "audit")
+            self.assertEqual(answer("Detect robots."), "default")
+
+    def test_usage_metadata_and_byte_counters(self):
+        body = {"contents": [{"parts": [{"text": "a" * 40}, {"inlineData": {"mimeType": "image/jpeg", "data": ""}}]}]}
+        with MockGeminiServer(response_text="x" * 20) as server:
+            usage = post(server, body)["usageMetadata"]
+            stats = server.stats()
+        self.assertEqual(usage["promptTokenCount"], 10 + 258)
+        self.assertEqual(usage["candidatesTokenCount"], 5)
+        self.assertEqual(stats["requests"], 1)
+        self.assertEqual(stats["bytes_received"], len(json.dumps(body).encode("utf-8")))
+
+    def test_error_injection(self):
+        with MockGeminiServer(error_rate=1.0, error_status=429) as server:
+            with self.assertRaises(urllib.error.HTTPError) as ctx:
+                post(server, text_request("hi"))
+            self.assertEqual(ctx.exception.code, 429)
+            self.assertEqual(json.loads(ctx.exception.read())["error"]["status"], "RESOURCE_EXHAUSTED")
+            self.assertEqual(server.stats()["errors"], 1)
+
+
+class TestCompareResults(unittest.TestCase):
+    def setUp(self):
+        from benchmarks.run_benchmarks import compare_results, percentile
+
+        self.compare = compare_results
+        self.percentile = percentile
+
+    def result(self, ops_per_s, p95, bytes_per_op=1000):
+        return {"scenarios": {"perception": {
+            "ops_per_s": ops_per_s,
+            "latency_ms": {"p50": p95 / 2, "p95": p95, "p99": p95},
+            "bytes_per_op": bytes_per_op,
+            "parse_ms": {"mean": 0.01},
+            "error_rate": 0.0,
+        }}}
+
+    def test_flags_latency_and_throughput_regressions(self):
+        regressions = self.compare(self.result(10, 100), self.result(7, 150), threshold=0.2)
+        flagged = " ".join(regressions)
+        self.assertIn("perception.ops_per_s", flagged)
+        self.assertIn("perception.latency_ms.p95", flagged)
+
+    def test_improvements_and_noise_pass(self):
+        self.assertEqual(self.compare(self.result(10, 100), self.result(12, 80), threshold=0.2), [])
+        # +50% of a tiny absolute value is below the noise floor
+        self.assertEqual(self.compare(self.result(10, 1.0), self.result(10, 1.5), threshold=0.2), [])
+
+    def test_nearest_rank_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(self.percentile(values, 50), 50)
+        self.assertEqual(self.percentile(values, 99), 99)
+        self.assertIsNone(self.percentile([], 95))
+
+
+if __name__ == '__main__':
+    unittest.main()
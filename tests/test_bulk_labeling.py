@@ -0,0 +1,136 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PIL import Image
+
+from examples.mock_gemini_server import MockGeminiServer
+
+try:
+    from examples import scheduler
+    from examples.bulk_labeling import _init_worker, in_shard, load_checkpoint, run_labeling_job
+except ImportError:
+    run_labeling_job = None
+
+
+def write_dataset(folder, count):
+    manifest = os.path.join(folder, "manifest.jsonl")
+    with open(manifest, "w") as f:
+        for i in range(count):
+            Image.new("RGB", (64, 48), (i * 20 % 255, 80, 120)).save(os.path.join(folder, f"{i:03d}.jpg"))
+            f.write(json.dumps({"id": f"frame-{i:03d}", "image": f"{i:03d}.jpg"}) + "\n")
+    return manifest
+
+
+def read_output(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+@unittest.skipIf(run_labeling_job is None, "google-genai is not installed")
+class TestBulkLabeling(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manifest = write_dataset(self.tmp.name, 8)
+        self.output = os.path.join(self.tmp.name, "labels.jsonl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_job(self, server, **kwargs):
+        env = {"GEMINI_API_KEY": "mock", "GEMINI_BASE_URL": server.base_url}
+        with mock.patch.dict(os.environ, env):
+            return run_labeling_job(self.manifest, self.output, workers=2, backoff_s=0.01,
+                                    progress_every_s=None, **kwargs)
+
+    def test_resumes_where_the_previous_run_stopped(self):
+        with MockGeminiServer() as server:
+            first = self.run_job(server, max_items=3)
+            self.assertEqual(first.processed, 3)
+            second = self.run_job(server)
+            self.assertEqual((second.skipped, second.ok), (3, 5))
+            self.assertEqual(server.stats()["requests"], 8)
+
+        records = read_output(self.output)
+        self.assertEqual(sorted(r["id"] for r in records), [f"frame-{i:03d}" for i in range(8)])
+        self.assertTrue(all(r["detections"][0]["label"] == "robot" for r in records))
+
+    def test_transient_errors_are_retried(self):
+        with MockGeminiServer(error_rate=0.4, error_status=503, seed=3) as server:
+            stats = self.run_job(server, max_attempts=10)
+            self.assertGreater(server.stats()["errors"], 0)
+        self.assertEqual((stats.ok, stats.failed), (8, 0))
+        self.assertEqual(stats.retries, server.stats()["errors"])
+
+    def test_permanent_failures_are_recorded_once(self):
+        with open(self.manifest, "a") as f:
+            f.write(json.dumps({"id": "missing", "image": "nope.jpg"}) + "\n")
+        with MockGeminiServer() as server:
+            stats = self.run_job(server)
+            self.assertEqual((stats.ok, stats.failed), (8, 1))
+            self.assertEqual(self.run_job(server).processed, 0)
+            self.assertEqual(self.run_job(server, retry_failed=True).failed, 1)
+        records = read_output(self.output)
+        self.assertEqual(len(records), 9)
+        failed = [r for r in records if r["status"] == "failed"]
+        self.assertEqual([r["attempts"] for r in failed], [0])
+
+
+class TestCheckpoint(unittest.TestCase):
+    @unittest.skipIf(run_labeling_job is None, "google-genai is not installed")
+    def test_partial_last_line_is_truncated(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "labels.jsonl")
+            with open(path, "w") as f:
+                f.write(json.dumps({"id": "a", "status": "ok"}) + "\n" + '{"id": "b", "sta')
+            self.assertEqual(load_checkpoint(path), {"a"})
+            with open(path) as f:
+                self.assertTrue(f.read().endswith("\n"))
+
+    @unittest.skipIf(run_labeling_job is None, "google-genai is not installed")
+    def test_retry_failed_compacts_to_one_record_per_id(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "labels.jsonl")
+            records = [{"id": "a", "status": "ok"}, {"id": "b", "status": "failed"},
+                       {"id": "b", "status": "failed"}, {"id": "c", "status": "failed"},
+                       {"id": "c", "status": "ok", "attempts": 2}]
+            with open(path, "w") as f:
+                f.writelines(json.dumps(r) + "\n" for r in records)
+            self.assertEqual(load_checkpoint(path), {"a", "b", "c"})
+            self.assertEqual(len(read_output(path)), 5)
+
+            self.assertEqual(load_checkpoint(path, retry_failed=True), {"a", "c"})
+            self.assertEqual(read_output(path), [records[0], records[4]])
+            self.assertFalse(os.path.exists(path + ".tmp"))
+
+    @unittest.skipIf(run_labeling_job is None, "google-genai is not installed")
+    def test_shards_partition_ids(self):
+        ids = [f"frame-{i}" for i in range(200)]
+        shards = [[i for i in ids if in_shard(i, k, 3)] for k in range(3)]
+        self.assertEqual(sorted(sum(shards, [])), sorted(ids))
+        self.assertTrue(all(shards))
+
+
+
+@unittest.skipIf(run_labeling_job is None, "google-genai is not installed")
+class TestWorkerBudget(unittest.TestCase):
+    def tearDown(self):
+        scheduler.set_scheduler(None)
+
+    def test_workers_split_the_rate_limits(self):
+        env = {"GEMINI_RPM": "60", "GEMINI_TPM": "100000", "GEMINI_MAX_IN_FLIGHT": "8"}
+        with mock.patch.dict(os.environ, env):
+            _init_worker(4)
+        worker = scheduler.get_scheduler()
+        self.assertAlmostEqual(worker.rpm.rate * 60, 15)
+        self.assertAlmostEqual(worker.tpm.rate * 60, 25_000)
+        self.assertEqual(worker.max_in_flight, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
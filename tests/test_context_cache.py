@@ -0,0 +1,132 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from examples.mock_gemini_server import FILE_BYTES_PER_TOKEN, MockGeminiServer
+
+try:
+    from google import genai
+    from google.genai import errors, types
+except ImportError:
+    genai = None
+
+GUIDELINES = "1. Max speed 0.5m/s. 2. No humans in Red Zone."
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@unittest.skipIf(genai is None, "google-genai is not installed")
+class TestContextCache(unittest.TestCase):
+    def setUp(self):
+        from examples.context_cache import ContextCache
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.video = os.path.join(self.tmp.name, "incident.mp4")
+        with open(self.video, "wb") as f:
+            f.write(os.urandom(50_000))
+        self.server = MockGeminiServer(responses=[("Red Zone", "At 02:12 a hand enters the red zone.")]).start()
+        self.client = genai.Client(api_key="mock", http_options=types.HttpOptions(base_url=self.server.base_url))
+        self.clock = FakeClock()
+        self.cache = ContextCache(client=self.client, ttl_s=600, refresh_margin_s=60, clock=self.clock)
+
+    def tearDown(self):
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def test_follow_up_questions_reuse_one_upload(self):
+        with self.cache.acquire(self.video, GUIDELINES) as video:
+            answers = [video.ask(q) for q in ("When is the red zone entered?", "Who is at fault?", "Was it slow?")]
+        self.assertEqual(answers[0], "At 02:12 a hand enters the red zone.")
+        self.assertEqual((self.server.stats()["uploads"], self.server.stats()["caches_created"]), (1, 1))
+
+        stats = self.cache.stats()
+        tokens = stats["tokens_cached"]
+        self.assertGreaterEqual(tokens, 50_000 // FILE_BYTES_PER_TOKEN)
+        self.assertEqual(stats["cached_tokens_served"], 3 * tokens)
+        self.assertEqual(stats["tokens_saved"], 2 * tokens)
+        self.assertGreater(stats["cached_token_ratio"], 0.9)
+        # Only the questions travel with each query
+        self.assertLess(self.server.stats()["bytes_received"], 50_000 + 10_000)
+
+    def test_concurrent_acquires_share_one_upload_and_refcount(self):
+        leases = []
+        threads = [threading.Thread(target=lambda: leases.append(self.cache.acquire(self.video, GUIDELINES)))
+                   for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.server.stats()["uploads"], 1)
+        self.assertEqual(leases[0].entry.refcount, 4)
+        for lease in leases:
+            lease.release()
+        self.assertEqual(leases[0].entry.refcount, 0)
+
+    def test_ttl_is_extended_near_expiry_and_recreated_after(self):
+        with self.cache.acquire(self.video, GUIDELINES):
+            pass
+        self.clock.now += 570
+        with self.cache.acquire(self.video, GUIDELINES) as video:
+            self.assertEqual(self.cache.stats()["refreshes"], 1)
+            self.assertEqual(video.entry.remaining_s(self.clock()), 600)
+        self.clock.now += 601
+        with self.cache.acquire(self.video, GUIDELINES):
+            pass
+        self.assertEqual(self.server.stats()["uploads"], 2)
+        # The upload behind the expired cache was deleted
+        self.assertEqual(self.server.stats()["files"], 1)
+
+    def test_lease_held_across_expiry_keeps_its_upload(self):
+        old = self.cache.acquire(self.video, GUIDELINES)
+        self.clock.now += 601
+        with self.cache.acquire(self.video, GUIDELINES) as fresh:
+            self.assertIsNot(fresh.entry, old.entry)
+            self.assertEqual(self.server.stats()["uploads"], 2)
+        # The old upload is still referenced by `old`
+        self.assertEqual(self.server.stats()["files"], 2)
+        self.assertEqual(len(self.cache), 1)
+
+        old.release()
+        self.assertEqual(old.entry.refcount, 0)
+        self.assertEqual(self.server.stats()["files"], 1)
+        self.assertEqual(len(self.cache), 1)
+        with self.cache.acquire(self.video, GUIDELINES) as again:
+            self.assertIs(again.entry, fresh.entry)
+
+    def test_leased_caches_survive_eviction_and_close(self):
+        self.cache.max_entries = 0
+        other = os.path.join(self.tmp.name, "other.mp4")
+        with open(other, "wb") as f:
+            f.write(os.urandom(1000))
+        lease = self.cache.acquire(self.video, GUIDELINES)
+        with self.cache.acquire(other, GUIDELINES):
+            pass
+        self.assertEqual(len(self.cache), 1)
+        self.cache.close()
+        # Canned responses also match against the cached guidelines
+        self.assertEqual(lease.ask("Is it safe?"), "At 02:12 a hand enters the red zone.")
+        lease.release()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.server.stats()["cached_contents"], 0)
+        self.assertEqual(self.server.stats()["files"], 0)
+
+    def test_mock_rejects_unknown_caches(self):
+        with self.assertRaises(errors.ClientError) as ctx:
+            self.client.models.generate_content(
+                model="gemini-robotics-er-1.5-preview", contents="hi",
+                config=types.GenerateContentConfig(cached_content="cachedContents/missing"))
+        self.assertEqual(ctx.exception.code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from examples.detection_store import DetectionStore
+from examples.mock_gemini_server import MockGeminiServer
+from examples.scheduler import robot_scope
+
+try:
+    from google import genai
+    from google.genai import types
+except ImportError:
+    genai = None
+
+HUMAN = {"box_2d": [100, 200, 300, 400], "label": "human"}
+HANDLE = {"point": [500, 600], "label": "Handle"}
+
+
+class TestDetectionStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "detections")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fill(self, store, seconds=100, fps=10):
+        for i in range(seconds * fps):
+            store.append([HUMAN, HANDLE] if i % 10 == 0 else [HANDLE], t=1000 + i / fps, robot_id=f"amr-{i % 2}")
+
+    def test_round_trip_with_dictionary_encoding(self):
+        with DetectionStore(self.path, block_rows=128) as store:
+            self.fill(store, seconds=10)
+            self.assertEqual(store.append([HUMAN, "junk", {"label": "no geometry"}], t=2000), 1)
+
+        store = DetectionStore(self.path)
+        self.assertEqual(len(store), 111)
+        self.assertEqual(store.block_rows, 128)
+        with open(os.path.join(self.path, "dictionary.json")) as f:
+            self.assertEqual(json.load(f)["labels"], ["", "human", "Handle"])
+        record = store.query(t_start=2000)[0]
+        self.assertEqual((record["label"], record["box_2d"], record["robot_id"]), ("human", [100, 200, 300, 400], None))
+        point = store.query(labels=["handle"], robot_id="amr-1")[0]
+        self.assertEqual((point["point"], point["t"]), ([500, 600], 1000.1))
+        # One fixed-width row per detection, no strings
+        self.assertLess(store.stats()["bytes_per_row"], 50)
+
+    def test_index_limits_the_blocks_read(self):
+        store = DetectionStore(self.path, block_rows=100)
+        self.fill(store)
+        blocks = store.stats()["blocks"]
+
+        window = store.query(1050.0, 1051.0)
+        self.assertEqual(len(window), 11 + 2)
+        self.assertLessEqual(store.blocks_scanned, 2)
+
+        # A label that only appears in the last block is found without scanning the rest
+        store.append([{"point": [1, 1], "label": "forklift"}], t=1099.95)
+        self.assertEqual(store.query(labels=["forklift"]).labels, ["forklift"])
+        self.assertEqual(store.blocks_scanned, 1)
+        self.assertGreater(blocks, 10)
+
+    def test_out_of_order_timestamps_are_still_found(self):
+        store = DetectionStore(self.path, block_rows=50)
+        self.fill(store, seconds=20)
+        # A late upload from a robot that was offline
+        store.append([HUMAN], t=1001.05, robot_id="amr-9")
+        found = store.query(1001.02, 1001.08, labels=["human"])
+        self.assertEqual(found.robot_ids, ["amr-9"])
+
+    def test_humans_near_a_violation(self):
+        store = DetectionStore(self.path, block_rows=100)
+        self.fill(store)
+        store.append_violations([{"time_s": 42.0, "rule": "2", "reason": "Human in red zone"}], video_start_t=1000)
+
+        violation = store.query(kind="violation")[0]
+        self.assertEqual((violation["t"], violation["reason"]), (1042.0, "Human in red zone"))
+        humans = store.near(violation["t"], window_s=2.0, labels=["human"])
+        np.testing.assert_allclose(humans.t, [1040, 1041, 1042, 1043, 1044])
+        self.assertTrue(all(r["kind"] == "box" for r in humans.to_records()))
+
+    def test_robot_scope_tags_appends(self):
+        store = DetectionStore(self.path)
+        with robot_scope("amr-7"):
+            store.append([HUMAN], t=1.0)
+        self.assertEqual(store.query(robot_id="amr-7").robot_ids, ["amr-7"])
+        self.assertEqual(len(store.query(robot_id="amr-8")), 0)
+
+    def test_recovers_from_a_crashed_writer(self):
+        store = DetectionStore(self.path, block_rows=64)
+        self.fill(store, seconds=10)
+        store.close()
+        # Rows written after the last commit, and a lost index
+        with open(os.path.join(self.path, "t.f64"), "ab") as f:
+            f.write(b"\x01" * 13)
+        os.remove(os.path.join(self.path, "blocks.f64"))
+
+        store = DetectionStore(self.path)
+        self.assertEqual(len(store), 110)
+        self.assertEqual(os.path.getsize(os.path.join(self.path, "t.f64")), 110 * 8)
+        self.assertEqual(len(store.query(1005.0, 1005.95, labels=["human"])), 1)
+        store.append([HUMAN], t=1200.0)
+        self.assertEqual(len(store.query(t_start=1100)), 1)
+
+    def test_reader_opened_during_a_flush_leaves_the_writer_alone(self):
+        writer = DetectionStore(self.path, block_rows=4, flush_rows=100)
+        writer.append([HUMAN, HANDLE], t=1.0)
+        writer.flush()
+        reader = DetectionStore(self.path, read_only=True)
+        seen = []
+        write_index = writer._write_index
+
+        def open_mid_flush():
+            # Columns are appended, meta.json is not committed yet
+            late = DetectionStore(self.path, read_only=True)
+            seen.append((len(late), len(late.query()), len(reader.query())))
+            with self.assertRaises(RuntimeError):
+                DetectionStore(self.path)
+            write_index()
+
+        writer._write_index = open_mid_flush
+        writer.append([HUMAN], t=2.0)
+        writer.flush()
+
+        self.assertEqual(seen, [(2, 2, 2)])
+        self.assertEqual(os.path.getsize(os.path.join(self.path, "t.f64")), 3 * 8)
+        # Readers pick up the commit on their next query
+        self.assertEqual(len(reader.query()), 3)
+        self.assertEqual(reader.query(labels=["human"]).t.tolist(), [1.0, 2.0])
+        with self.assertRaises(RuntimeError):
+            reader.append([HUMAN], t=3.0)
+        writer.close()
+        self.assertEqual(len(DetectionStore(self.path).query()), 3)
+
+    def test_reader_never_maps_past_the_end_of_a_column(self):
+        with DetectionStore(self.path) as store:
+            store.append([HUMAN, HANDLE], t=1.0)
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump({"version": 1, "rows": 5, "block_rows": 4096}, f)
+        reader = DetectionStore(self.path, read_only=True)
+        self.assertEqual(len(reader.query()), 2)
+        self.assertEqual(os.path.getsize(os.path.join(self.path, "t.f64")), 2 * 8)
+
+
+@unittest.skipIf(genai is None, "google-genai is not installed")
+class TestPerceptionQueryLogging(unittest.TestCase):
+    def setUp(self):
+        from examples import gemini_client
+
+        self.gemini_client = gemini_client
+        self.tmp = tempfile.TemporaryDirectory()
+        self.image = os.path.join(self.tmp.name, "frame.jpg")
+        Image.new("RGB", (64, 48), "gray").save(self.image)
+        self.server = MockGeminiServer(response_text=json.dumps([HUMAN])).start()
+        gemini_client.set_client(
+            genai.Client(api_key="mock", http_options=types.HttpOptions(base_url=self.server.base_url)))
+
+    def tearDown(self):
+        self.server.stop()
+        self.gemini_client.reset_client()
+        self.tmp.cleanup()
+
+    def test_rows_are_logged_at_the_frame_stamp(self):
+        from examples import basic_spatial_query
+
+        store = DetectionStore(os.path.join(self.tmp.name, "store"))
+        with mock.patch.object(basic_spatial_query, "visualize_results"):
+            basic_spatial_query.robot_perception_query(self.image, "Detect humans.", store=store,
+                                                       stamp=1234.5, robot_id="amr-3")
+            before = time.time()
+            basic_spatial_query.robot_perception_query(self.image, "Detect humans.", store=store)
+
+        stamped = store.query(t_end=2000)
+        self.assertEqual((stamped.t.tolist(), stamped.robot_ids), ([1234.5], ["amr-3"]))
+        # Without a stamp the row is logged at the time the frame was read
+        read_at = store.query(t_start=2000)
+        self.assertEqual(len(read_at), 1)
+        self.assertGreaterEqual(read_at.t[0], before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import io
+import unittest
+import os
+import sys
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from examples import frame_gate
+from examples.frame_gate import FrameGate, change_score, frame_signature
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _frame(value, noise=0):
+    rng = np.random.default_rng(noise)
+    base = np.full((240, 320, 3), value, dtype=np.int16)
+    return np.clip(base + rng.integers(-2, 3, base.shape), 0, 255).astype(np.uint8)
+
+
+class TestFrameGate(unittest.TestCase):
+    def test_scores(self):
+        a, b = frame_signature(_frame(100)), frame_signature(_frame(100, noise=1))
+        self.assertLess(change_score(a, b), 0.01)
+        self.assertGreater(change_score(a, frame_signature(_frame(200))), 0.3)
+
+    def test_skips_near_duplicates_and_counts(self):
+        calls = []
+        gate = FrameGate(threshold=0.02, max_staleness_s=None)
+        for i, value in enumerate([100, 100, 101, 180, 180]):
+            gate.process(_frame(value, noise=i), lambda f: calls.append(f) or len(calls))
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(gate.stats(), {"frames_sent": 2, "frames_skipped": 3, "skip_rate": 0.6})
+        self.assertEqual(gate.last_result, 2)
+
+    def test_staleness_and_skip_bounds_force_refresh(self):
+        clock = FakeClock()
+        gate = FrameGate(max_staleness_s=5.0, clock=clock)
+        gate.process(_frame(100), lambda f: "a")
+        self.assertFalse(gate.check(_frame(100)).send)
+        clock.now = 6.0
+        self.assertEqual(gate.check(_frame(100)).reason, "stale")
+
+        gate = FrameGate(max_staleness_s=None, max_skipped=2)
+        results = [gate.process(_frame(100), lambda f: "fresh") for _ in range(4)]
+        self.assertEqual(gate.frames_sent, 2)
+        self.assertEqual(results, ["fresh"] * 4)
+
+    def test_jpeg_bytes_are_draft_decoded_before_exif_rotation(self):
+        array = np.zeros((1200, 1600, 3), dtype=np.uint8)
+        array[:, 800:] = 255
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotate 90 CW on display
+        buf = io.BytesIO()
+        Image.fromarray(array).save(buf, format="JPEG", exif=exif)
+        data = buf.getvalue()
+
+        decoded = []
+        transpose = ImageOps.exif_transpose
+
+        def record(img):
+            out = transpose(img)
+            decoded.append((out or img).size)
+            return out
+
+        with mock.patch.object(frame_gate.ImageOps, "exif_transpose", side_effect=record):
+            signature = frame_signature(data)
+        # 1/8-scale decode, already rotated to portrait
+        self.assertEqual(decoded, [(150, 200)])
+        full = np.asarray(transpose(Image.open(io.BytesIO(data))).convert("L"))
+        self.assertLess(change_score(frame_signature(full), signature), 0.02)
+
+        with mock.patch.object(frame_gate.ImageOps, "exif_transpose", side_effect=record):
+            self.assertLess(change_score(frame_signature(memoryview(data)), signature), 1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import io
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PIL import Image
+
+from examples.image_payload import optimize_image, sniff_mime
+
+
+def _encode(img, fmt, **kwargs):
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, **kwargs)
+    return buf.getvalue()
+
+
+class TestImagePayload(unittest.TestCase):
+    def test_sniff_mime(self):
+        img = Image.new("RGB", (8, 8), "gray")
+        self.assertEqual(sniff_mime(_encode(img, "JPEG")), "image/jpeg")
+        self.assertEqual(sniff_mime(_encode(img, "PNG")), "image/png")
+        self.assertEqual(sniff_mime(_encode(img, "WEBP")), "image/webp")
+        self.assertIsNone(sniff_mime(b"not an image"))
+
+    def test_large_png_is_downsized_to_jpeg(self):
+        data = _encode(Image.effect_noise((3000, 2000), 50).convert("RGB"), "PNG")
+        prepared = optimize_image(data, max_edge=1024)
+
+        self.assertEqual(prepared.mime_type, "image/jpeg")
+        self.assertEqual(prepared.original_size, (3000, 2000))
+        self.assertEqual(prepared.sent_size, (1024, 683))
+        self.assertLess(prepared.bytes_after, prepared.bytes_before)
+        self.assertEqual(Image.open(io.BytesIO(prepared.data)).size, (1024, 683))
+
+    def test_small_jpeg_passes_through(self):
+        data = _encode(Image.new("RGB", (640, 480), "gray"), "JPEG")
+        prepared = optimize_image(data, max_edge=1024)
+        self.assertIs(prepared.data, data)
+
+    def test_exif_orientation_is_applied(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotated 90 degrees
+        data = _encode(Image.new("RGB", (2000, 1000), "gray"), "JPEG", exif=exif)
+        prepared = optimize_image(data, max_edge=1000)
+
+        self.assertEqual(prepared.original_size, (1000, 2000))
+        self.assertEqual(prepared.sent_size, (500, 1000))
+        self.assertEqual(prepared.to_original_pixels(500, 500), (1000, 500))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+import urllib.request
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from examples.instrumentation import Telemetry, render_dashboard, set_telemetry
+from examples.mock_gemini_server import MockGeminiServer
+
+try:
+    from google import genai
+    from google.genai import types
+except ImportError:
+    genai = None
+
+
+class TestTelemetry(unittest.TestCase):
+    def setUp(self):
+        self.telemetry = Telemetry(uplink_mbps=None)
+
+    def test_spans_accumulate_and_usage_is_recorded(self):
+        with self.telemetry.trace("perception", model="m") as call:
+            call.add_span("parse", 0.01)
+            call.add_span("parse", 0.02)
+            call.add_bytes(1000)
+            call.record_usage({"prompt_token_count": 300, "candidates_token_count": 20,
+                               "thoughts_token_count": 100})
+
+        record = self.telemetry.records()[0]
+        self.assertEqual(record.status, "ok")
+        self.assertAlmostEqual(record.spans["parse"], 0.03)
+        self.assertEqual(record.tokens, {"prompt": 300, "output": 20, "thinking": 100})
+        self.assertEqual(record.bytes_uploaded, 1000)
+
+    def test_exceptions_are_recorded_and_reraised(self):
+        with self.assertRaises(RuntimeError):
+            with self.telemetry.trace("planning"):
+                raise RuntimeError("quota")
+        record = self.telemetry.records()[0]
+        self.assertEqual((record.status, record.error), ("error", "quota"))
+
+    def test_upload_estimate_is_taken_out_of_model_span(self):
+        telemetry = Telemetry(uplink_mbps=8)  # 1 MB/s
+        with telemetry.trace("perception") as call:
+            call.add_span("model", 1.0)
+            call.add_bytes(250_000)
+        spans = telemetry.records()[0].spans
+        self.assertAlmostEqual(spans["upload"], 0.25)
+        self.assertAlmostEqual(spans["model"], 0.75)
+
+    def test_jsonl_export(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "calls.jsonl")
+            telemetry = Telemetry(jsonl_path=path)
+            for cap in ("perception", "video"):
+                with telemetry.trace(cap, window=3):
+                    pass
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual([l["capability"] for l in lines], ["perception", "video"])
+        self.assertEqual(lines[1]["attrs"], {"window": 3})
+
+    def test_prometheus_text_and_endpoint(self):
+        with self.telemetry.trace("perception") as call:
+            call.add_span("model", 0.2)
+            call.record_usage({"prompt_token_count": 10})
+        with self.assertRaises(ValueError):
+            with self.telemetry.trace("perception"):
+                raise ValueError("bad json")
+
+        text = self.telemetry.prometheus_text()
+        self.assertIn('gemini_calls_total{capability="perception",status="ok"} 1', text)
+        self.assertIn('gemini_calls_total{capability="perception",status="error"} 1', text)
+        self.assertIn('gemini_call_latency_seconds_count{capability="perception"} 2', text)
+        self.assertIn('gemini_tokens_total{capability="perception",kind="prompt"} 10', text)
+
+        server = self.telemetry.serve_metrics(port=0)
+        try:
+            with urllib.request.urlopen(server.url, timeout=5) as response:
+                self.assertEqual(response.read().decode("utf-8"), self.telemetry.prometheus_text())
+        finally:
+            server.stop()
+
+    def test_summary_and_dashboard(self):
+        with self.telemetry.trace("perception") as call:
+            call.add_span("encode", 0.01)
+            call.add_span("model", 0.5)
+        summary = self.telemetry.summary()["perception"]
+        self.assertEqual(summary["calls"], 1)
+        self.assertEqual(summary["dominant_span"], "model")
+        self.assertEqual(len(render_dashboard(self.telemetry).rows), 1)
+
+
+@unittest.skipIf(genai is None, "google-genai is not installed")
+class TestCallSiteInstrumentation(unittest.TestCase):
+    def setUp(self):
+        from examples import gemini_client
+
+        self.gemini_client = gemini_client
+        self.telemetry = Telemetry()
+        set_telemetry(self.telemetry)
+        self.server = MockGeminiServer(
+            response_text='[{"action": "move_to", "target": "table"}]').start()
+        gemini_client.set_client(
+            genai.Client(api_key="mock", http_options=types.HttpOptions(base_url=self.server.base_url)))
+
+    def tearDown(self):
+        self.server.stop()
+        self.gemini_client.reset_client()
+        set_telemetry(None)
+
+    def test_plan_mission_records_usage_and_spans(self):
+        from examples.task_decomposition import plan_mission
+
+        plan_mission("Go to the table")
+        record = self.telemetry.records("planning")[0]
+        self.assertEqual(record.status, "ok")
+        self.assertIn("model", record.spans)
+        self.assertIn("parse", record.spans)
+        self.assertGreater(record.tokens["prompt"], 0)
+        self.assertGreater(record.bytes_uploaded, 0)
+
+    def test_streamed_plan_records_usage(self):
+        from examples.task_decomposition import plan_mission_stream
+
+        steps = list(plan_mission_stream("Go to the table"))
+        self.assertEqual(len(steps), 1)
+        record = self.telemetry.records("planning")[0]
+        self.assertEqual(record.attrs, {"streaming": True})
+        self.assertGreater(record.tokens["output"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from PIL import Image
+
+from examples.overlay import (
+    boxes_to_pixels,
+    detections_to_arrays,
+    normalized_to_pixels,
+    render_detections,
+    render_sequence,
+)
+
+DETECTIONS = [
+    {"point": [500, 250], "label": "mug"},
+    {"box_2d": [100, 200, 300, 400], "label": "robot"},
+    {"box_2d": [1, 2]},  # malformed, skipped
+]
+
+
+class TestOverlay(unittest.TestCase):
+    def test_arrays_split_by_geometry(self):
+        arrays = detections_to_arrays(DETECTIONS)
+        self.assertEqual(arrays.points.shape, (1, 2))
+        self.assertEqual(arrays.boxes.shape, (1, 4))
+        self.assertEqual(arrays.box_labels, ["robot"])
+
+    def test_vectorized_transform_matches_scalar_formula(self):
+        points = np.array([[500, 250], [0, 1000]])
+        self.assertEqual(normalized_to_pixels(points, 640, 480).tolist(), [[160, 240], [639, 0]])
+        boxes = np.array([[300, 400, 100, 200]])  # inverted corners are normalized
+        self.assertEqual(boxes_to_pixels(boxes, 1000, 1000).tolist(), [[200, 100, 400, 300]])
+
+    def test_render_from_array_returns_bytes_and_leaves_source(self):
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        jpeg = render_detections(frame, DETECTIONS, output_format="JPEG")
+        self.assertTrue(jpeg.startswith(b"\xff\xd8"))
+        self.assertEqual(frame.sum(), 0)
+
+        img = render_detections(Image.fromarray(frame), DETECTIONS)
+        self.assertEqual(img.getpixel((160, 240)), (255, 0, 0))
+
+    def test_render_sequence_to_directory(self):
+        frames = (np.zeros((120, 160, 3), dtype=np.uint8) for _ in range(3))
+        with tempfile.TemporaryDirectory() as d:
+            written = render_sequence(frames, [DETECTIONS] * 3, output_dir=d)
+            self.assertEqual(written, 3)
+            self.assertEqual(sorted(os.listdir(d))[0], "frame_000000.jpg")
+
+
+if __name__ == '__main__':
+    unittest.main()
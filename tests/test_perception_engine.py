@@ -0,0 +1,99 @@
+import asyncio
+import unittest
+import os
+import sys
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from examples.mock_gemini_server import MockGeminiServer
+
+try:
+    from google import genai
+    from google.genai import types
+except ImportError:
+    genai = None
+
+
+@unittest.skipIf(genai is None, "google-genai is not installed")
+class TestPerceptionEngine(unittest.TestCase):
+    def setUp(self):
+        from examples.perception_engine import PerceptionEngine
+
+        self.server = MockGeminiServer(latency_s=0.1).start()
+        client = genai.Client(api_key="mock", http_options=types.HttpOptions(base_url=self.server.base_url))
+        self.engine = PerceptionEngine(client=client, max_in_flight=4)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_results_in_order_with_bounded_concurrency(self):
+        frames = [b"\xff\xd8frame-%d" % i for i in range(12)]
+        results = self.engine.run(frames, "Detect robots.")
+
+        self.assertEqual([r.index for r in results], list(range(12)))
+        self.assertTrue(all(r.ok for r in results), [r.error for r in results])
+        self.assertEqual(results[0].detections[0]["label"], "robot")
+        self.assertLessEqual(self.server.max_in_flight, 4)
+        self.assertGreater(self.server.max_in_flight, 1)
+
+    def test_as_completed_yields_every_frame(self):
+        results = self.engine.run([b"a", b"b", b"c"], "Detect robots.", ordered=False)
+        self.assertEqual(sorted(r.index for r in results), [0, 1, 2])
+
+    def test_cache_skips_repeat_frames(self):
+        from examples.response_cache import ResponseCache
+
+        self.engine.cache = ResponseCache()
+        first = self.engine.run([b"same-frame"], "Detect robots.")
+        second = self.engine.run([b"same-frame"], "Detect robots.")
+        self.assertFalse(first[0].cached)
+        self.assertTrue(second[0].cached)
+        self.assertEqual(self.server.request_count, 1)
+
+    def test_missing_file_is_reported_per_frame(self):
+        results = self.engine.run(["does_not_exist.jpg"], "Detect robots.")
+        self.assertFalse(results[0].ok)
+
+
+
+@unittest.skipIf(genai is None, "google-genai is not installed")
+class TestAsyncClientLifetime(unittest.TestCase):
+    def setUp(self):
+        from examples import gemini_client
+
+        self.gemini_client = gemini_client
+        self.server = MockGeminiServer().start()
+        self.env = mock.patch.dict(os.environ, {"GEMINI_API_KEY": "mock", "GEMINI_BASE_URL": self.server.base_url})
+        self.env.start()
+        gemini_client.reset_client()
+
+    def tearDown(self):
+        self.gemini_client.reset_client()
+        self.env.stop()
+        self.server.stop()
+
+    def test_per_loop_clients_are_closed(self):
+        from examples.perception_engine import PerceptionEngine
+
+        engine = PerceptionEngine(max_in_flight=2)
+        for _ in range(3):
+            self.assertTrue(engine.run([b"a", b"b"], "Detect robots.")[0].ok)
+        self.assertEqual(len(self.gemini_client._loop_clients), 0)
+
+        # A loop that ended without closing its client is cleaned up by the next one
+        loops = []
+
+        async def leak():
+            loops.append(asyncio.get_running_loop())
+            self.gemini_client.get_async_client()
+
+        asyncio.run(leak())
+        self.assertEqual(len(self.gemini_client._loop_clients), 1)
+        self.gemini_client.run_with_async_client(leak())
+        self.assertEqual(len(self.gemini_client._loop_clients), 0)
+        self.assertEqual(len(loops), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
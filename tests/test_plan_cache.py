@@ -0,0 +1,68 @@
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from examples.plan_cache import PlanCache, PlanValidationError, canonicalize_command, validate_plan
+from examples.task_decomposition import ROBOT_SYSTEM_PROMPT
+
+PLAN = [
+    {"action": "move_to", "target": "kitchen_table"},
+    {"action": "find_object", "target": "apple"},
+    "pick_object(apple)",
+    {"primitive": "move_to", "args": ["trash_bin"]},
+    {"action": "place_object", "target": "trash_bin"},
+    {"action": "open_gripper"},
+]
+
+
+class TestPlanCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = PlanCache(ROBOT_SYSTEM_PROMPT)
+        self.assertTrue(self.cache.store("Find the apple on the kitchen table and throw it away.", PLAN))
+
+    def test_canonicalize(self):
+        self.assertEqual(canonicalize_command("  Please, find the Apple!  "), "find the apple")
+
+    def test_template_substitution(self):
+        plan = self.cache.lookup("please find the red cup on the office desk and throw it away")
+        self.assertEqual(plan[0], {"action": "move_to", "target": "office_desk"})
+        self.assertEqual(plan[2], {"action": "pick_object", "target": "red cup"})
+        self.assertEqual(plan[3], {"action": "move_to", "target": "trash_bin"})
+        self.assertEqual(self.cache.lookup("bring me the apple"), None)
+        self.assertEqual(self.cache.stats()["hit_rate"], 0.5)
+
+    def test_slots_do_not_swallow_extra_clauses(self):
+        self.assertTrue(self.cache.store("Go to the kitchen", [{"action": "move_to", "target": "kitchen"}]))
+        self.assertTrue(self.cache.store("pick up the apple", ["find_object(apple)", "pick_object(apple)"]))
+
+        self.assertIsNone(self.cache.lookup("go to the kitchen and open gripper"))
+        self.assertIsNone(self.cache.lookup("go to the kitchen, then open gripper"))
+        self.assertIsNone(self.cache.lookup("pick up the apple and the knife"))
+        # Trailing modifiers are not part of the object or location
+        self.assertIsNone(self.cache.lookup("go to the kitchen slowly"))
+        self.assertIsNone(self.cache.lookup("go to the kitchen now"))
+        self.assertIsNone(self.cache.lookup("pick up the knife carefully"))
+        # Single noun phrases still fill the slot
+        self.assertEqual(self.cache.lookup("go to the loading dock"), [{"action": "move_to", "target": "loading dock"}])
+        self.assertEqual(self.cache.lookup("pick up the knife")[0], {"action": "find_object", "target": "knife"})
+
+    def test_rejects_unknown_primitives(self):
+        with self.assertRaises(PlanValidationError):
+            validate_plan([{"action": "teleport", "target": "moon"}], self.cache.primitives)
+        with self.assertRaises(PlanValidationError):
+            validate_plan([{"action": "open_gripper", "target": "x"}], self.cache.primitives)
+        self.assertFalse(self.cache.store("fly to the moon", [{"action": "teleport", "target": "moon"}]))
+
+    def test_primitive_change_invalidates(self):
+        self.cache.sync_primitives(ROBOT_SYSTEM_PROMPT)
+        self.assertEqual(len(self.cache), 1)
+        self.cache.sync_primitives(ROBOT_SYSTEM_PROMPT + "\n7. wave_hand()\n")
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
+        self.assertIn("wave_hand", self.cache.primitives)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from examples.mock_gemini_server import MockGeminiServer
+from examples.response_cache import ResponseCache, make_key
+
+try:
+    from google import genai
+    from google.genai import types
+except ImportError:
+    genai = None
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_key_depends_on_every_input(self):
+        base = make_key("model", "prompt", b"img", {"temperature": 0.5})
+        self.assertEqual(base, make_key("model", "prompt", b"img", {"temperature": 0.5}))
+        self.assertNotEqual(base, make_key("other", "prompt", b"img", {"temperature": 0.5}))
+        self.assertNotEqual(base, make_key("model", "prompt!", b"img", {"temperature": 0.5}))
+        self.assertNotEqual(base, make_key("model", "prompt", b"img2", {"temperature": 0.5}))
+        self.assertNotEqual(base, make_key("model", "prompt", b"img", {"temperature": 0.2}))
+
+    def test_memory_lru_eviction_and_counters(self):
+        cache = ResponseCache(max_items=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)  # evicts "b", the least recently used
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["memory_hits"], 2)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_disk_tier_survives_new_instance(self):
+        with tempfile.TemporaryDirectory() as d:
+            ResponseCache(disk_dir=d).put("k", "cached text")
+            cache = ResponseCache(disk_dir=d)
+            self.assertEqual(cache.get("k"), "cached text")
+            self.assertEqual(cache.disk_hits, 1)
+            self.assertEqual(cache.get("k"), "cached text")
+            self.assertEqual(cache.memory_hits, 1)
+
+    def test_disk_size_bound_evicts_oldest(self):
+        with tempfile.TemporaryDirectory() as d:
+            cache = ResponseCache(max_items=1, disk_dir=d, max_disk_bytes=300)
+            for i in range(5):
+                cache.put(f"key{i}", "x" * 100)
+                time.sleep(0.01)
+            self.assertLessEqual(cache.stats()["disk_bytes"], 300)
+            self.assertEqual(cache.get("key4"), "x" * 100)
+            self.assertIsNone(cache.get("key0"))
+
+    def test_ttl_expiry(self):
+        with tempfile.TemporaryDirectory() as d:
+            cache = ResponseCache(disk_dir=d, ttl_s=0.05)
+            cache.put("k", "v")
+            time.sleep(0.1)
+            self.assertIsNone(cache.get("k"))
+            self.assertEqual(cache.stats()["disk_bytes"], 0)
+
+
+@unittest.skipIf(genai is None, "google-genai is not installed")
+class TestPlanMissionCaching(unittest.TestCase):
+    def setUp(self):
+        from examples import gemini_client
+
+        self.gemini_client = gemini_client
+        self.server = MockGeminiServer(response_text='[{"action": "move_to", "target": "table"}]').start()
+        gemini_client.set_client(
+            genai.Client(api_key="mock", http_options=types.HttpOptions(base_url=self.server.base_url)))
+
+    def tearDown(self):
+        self.server.stop()
+        self.gemini_client.reset_client()
+
+    def test_hits_do_not_refresh_the_ttl(self):
+        from examples.task_decomposition import plan_mission
+
+        cache = ResponseCache(ttl_s=60)
+        with mock.patch.object(cache, "put", wraps=cache.put) as put:
+            self.assertEqual(plan_mission("Go to the table", cache=cache), plan_mission("Go to the table", cache=cache))
+        self.assertEqual(put.call_count, 1)
+        self.assertEqual(self.server.stats()["requests"], 1)
+
+    def test_responses_that_are_not_plans_are_not_stored(self):
+        from examples.task_decomposition import plan_mission
+
+        self.server.response_text = '{"error": "no plan"}'
+        cache = ResponseCache()
+        plan_mission("Go to the table", cache=cache)
+        self.assertEqual(len(cache), 0)
+        # Parsed plans with unknown primitives are rejected like template entries are
+        self.server.response_text = '[{"action": "teleport", "target": "moon"}]'
+        plan_mission("Go to the moon", cache=cache)
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import json
+import os
+import sys
+import unittest
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from examples.mock_gemini_server import MockGeminiServer
+
+try:
+    from google import genai
+    from google.genai import types
+    from examples.roi_query import (compare_with_full_resolution, coarse_to_fine_query, expand_rois,
+                                    merge_detections, remap_detections)
+except ImportError:
+    genai = None
+
+ROIS = [{"box_2d": [100, 100, 300, 300], "label": "region"}, {"box_2d": [150, 150, 250, 250], "label": "region"},
+        {"box_2d": [650, 650, 850, 850], "label": "region"}]
+CROP_ANSWER = [{"box_2d": [250, 250, 750, 750], "label": "screw"}]
+
+
+@unittest.skipIf(genai is None, "google-genai is not installed")
+class TestRoiGeometry(unittest.TestCase):
+    def test_remap_crop_coordinates_to_full_frame(self):
+        roi = [200, 500, 400, 1000]
+        remapped = remap_detections([{"box_2d": [0, 0, 1000, 1000], "label": "a"},
+                                     {"point": [500, 500], "label": "b"}, "junk"], roi)
+        self.assertEqual(remapped[0]["box_2d"], [200.0, 500.0, 400.0, 1000.0])
+        self.assertEqual(remapped[1]["point"], [300.0, 750.0])
+        self.assertEqual(len(remapped), 2)
+
+    def test_expand_rois_pads_clips_and_merges(self):
+        rois = expand_rois([[100, 100, 200, 200], [105, 105, 205, 205], [0, 960, 10, 1000]],
+                           padding=0.5, min_size=80, merge_iou=0.5)
+        self.assertEqual(len(rois), 2)
+        np.testing.assert_allclose(rois[0], [50, 50, 250, 250])
+        # Tiny boxes grow to min_size, clipped at the frame edge
+        np.testing.assert_allclose(rois[1], [0, 940, 45, 1000])
+
+    def test_max_rois_keeps_the_largest_regions(self):
+        rois = expand_rois([[0, 0, 10, 10], [500, 500, 900, 900], [100, 100, 300, 300]],
+                           padding=0, min_size=0, max_rois=2)
+        np.testing.assert_allclose(rois, [[500, 500, 900, 900], [100, 100, 300, 300]])
+
+    def test_nms_prefers_whole_boxes_and_respects_labels(self):
+        whole = {"box_2d": [100, 100, 200, 200], "label": "screw"}
+        clipped = {"box_2d": [100, 100, 200, 150], "label": "screw"}
+        other = {"box_2d": [100, 100, 200, 200], "label": "nut"}
+        points = [{"point": [500, 500], "label": "hole"}, {"point": [505, 505], "label": "hole"}]
+        merged = merge_detections([clipped, whole, other] + points)
+        self.assertEqual(merged, [whole, other, points[0]])
+
+
+@unittest.skipIf(genai is None, "google-genai is not installed")
+class TestCoarseToFine(unittest.TestCase):
+    def setUp(self):
+        self.server = MockGeminiServer(responses=[("closer, high-resolution look", json.dumps(ROIS))],
+                                       response_text=json.dumps(CROP_ANSWER)).start()
+        self.client = genai.Client(api_key="mock", http_options=types.HttpOptions(base_url=self.server.base_url))
+        rng = np.random.default_rng(0)
+        self.frame = Image.fromarray(rng.integers(0, 255, (1500, 2000, 3), dtype=np.uint8))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_crops_are_queried_remapped_and_merged(self):
+        result = coarse_to_fine_query(self.frame, "Identify every screw.", padding=0.0, min_roi_size=0,
+                                      client=self.client)
+        self.assertEqual(len(result.rois), 3)
+        self.assertEqual((result.calls, self.server.stats()["requests"]), (4, 4))
+        # The screw seen by both overlapping crops is reported once, in full-frame coordinates
+        boxes = sorted(d["box_2d"] for d in result.detections)
+        np.testing.assert_allclose(boxes, [[150, 150, 250, 250], [700, 700, 800, 800]], atol=1)
+
+    def test_empty_coarse_pass_falls_back_to_the_full_frame(self):
+        self.server.responses = [("closer, high-resolution look", "[]")]
+        result = coarse_to_fine_query(self.frame, "Identify every screw.", client=self.client)
+        self.assertTrue(result.full_frame)
+        self.assertEqual((result.rois, result.calls), ([[0, 0, 1000, 1000]], 2))
+        np.testing.assert_allclose(result.detections[0]["box_2d"], [250, 250, 750, 750], atol=1)
+
+    def test_reports_against_full_resolution(self):
+        report = compare_with_full_resolution(self.frame, "Identify every screw.", client=self.client)
+        self.assertEqual(report["full_resolution"]["calls"], 1)
+        # Noise does not compress, so the small crops upload far less than the whole frame
+        self.assertLess(report["bytes_ratio"], 0.5)
+        self.assertGreater(report["latency_ratio"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ros2_gemini_bridge import FrameRing, GeminiBridge, RateLimiter, SyntheticCamera, synthetic_frame
+from examples.mock_gemini_server import MockGeminiServer
+
+try:
+    from google import genai
+    from google.genai import types
+except ImportError:
+    genai = None
+
+
+class TestFrameRing(unittest.TestCase):
+    def test_latest_frame_is_a_zero_copy_read_only_view(self):
+        ring = FrameRing(capacity=3, slot_nbytes=64 * 64 * 3)
+        frame = synthetic_frame(1, shape=(64, 64, 3), size=10)
+        ring.write(frame, stamp=12.5)
+
+        with ring.acquire_latest() as ref:
+            self.assertTrue(np.shares_memory(ref.array, ring._buffer))
+            np.testing.assert_array_equal(ref.array, frame)
+            self.assertEqual(ref.stamp, 12.5)
+            self.assertFalse(ref.array.flags.writeable)
+            self.assertEqual(ref.memoryview().nbytes, frame.nbytes)
+
+    def test_bytes_frames_keep_their_length(self):
+        ring = FrameRing(capacity=2, slot_nbytes=16)
+        ring.write(b"\xff\xd8jpeg", stamp=0)
+        with ring.acquire_latest() as ref:
+            self.assertEqual(ref.tobytes(), b"\xff\xd8jpeg")
+
+    def test_superseded_frames_are_dropped_not_queued(self):
+        ring = FrameRing(capacity=3, slot_nbytes=8)
+        for i in range(10):
+            ring.write(np.full(8, i, dtype=np.uint8), stamp=i)
+        with ring.acquire_latest() as ref:
+            self.assertEqual((ref.seq, ref.stamp), (9, 9))
+        self.assertEqual(ring.stats()["dropped"], 9)
+        self.assertIsNone(ring.acquire_latest(after_seq=9, timeout=0.01))
+
+    def test_pinned_slot_is_never_overwritten(self):
+        ring = FrameRing(capacity=2, slot_nbytes=8)
+        ring.write(np.zeros(8, dtype=np.uint8), stamp=0)
+        ref = ring.acquire_latest()
+        # Slot 0 is pinned and slot 1 becomes latest, so the next write has nowhere to go
+        ring.write(np.ones(8, dtype=np.uint8), stamp=1)
+        self.assertIsNone(ring.write(np.full(8, 2, dtype=np.uint8), stamp=2))
+        np.testing.assert_array_equal(ref.array, np.zeros(8))
+        ref.release()
+        self.assertEqual(ring.write(np.full(8, 3, dtype=np.uint8), stamp=3), 2)
+
+    def test_oversized_frames_are_rejected(self):
+        ring = FrameRing(capacity=2, slot_nbytes=4)
+        self.assertIsNone(ring.write(b"too large", stamp=0))
+        self.assertEqual(ring.stats()["rejected"], 1)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_min_interval(self):
+        now = [0.0]
+        limiter = RateLimiter(max_hz=4, clock=lambda: now[0])
+        self.assertEqual(limiter.wait_time(), 0.0)
+        limiter.mark()
+        now[0] = 0.1
+        self.assertAlmostEqual(limiter.wait_time(), 0.15)
+
+
+class TestGeminiBridge(unittest.TestCase):
+    def test_slow_model_sees_fresh_frames_with_source_stamps(self):
+        results = []
+        done = threading.Event()
+
+        def slow_model(topic, frame):
+            time.sleep(0.1)
+            return int(frame.array.sum())
+
+        def on_result(result):
+            results.append(result)
+            if len(results) >= 4:
+                done.set()
+
+        bridge = GeminiBridge(poll_s=0.01)
+        bridge.add_topic("/cam", slow_model, callback=on_result, slot_nbytes=120 * 160 * 3)
+        with bridge, SyntheticCamera(bridge, "/cam", hz=100, shape=(120, 160, 3)) as camera:
+            self.assertTrue(done.wait(5))
+        stamps = set(camera.stamps)
+
+        self.assertTrue(all(r.ok for r in results))
+        self.assertTrue(all(r.source_stamp in stamps for r in results))
+        # Latest frame wins: the model skips frames instead of falling behind
+        self.assertGreater(sum(r.frames_skipped for r in results[1:]), 0)
+        self.assertTrue(all(r.age_s < 0.25 for r in results))
+        self.assertGreater(bridge.stats()["/cam"]["dropped"], 0)
+
+    def test_per_topic_rate_limit(self):
+        calls = {"fast": [], "slow": []}
+
+        def record(topic, frame):
+            calls[topic].append(time.monotonic())
+
+        bridge = GeminiBridge(poll_s=0.005)
+        bridge.add_topic("fast", record, slot_nbytes=16)
+        bridge.add_topic("slow", record, max_hz=10, slot_nbytes=16)
+        with bridge:
+            end = time.monotonic() + 0.5
+            while time.monotonic() < end:
+                bridge.publish("fast", np.zeros(16, dtype=np.uint8))
+                bridge.publish("slow", np.zeros(16, dtype=np.uint8))
+                time.sleep(0.005)
+
+        self.assertLessEqual(len(calls["slow"]), 6)
+        self.assertGreater(len(calls["fast"]), len(calls["slow"]) * 2)
+        gaps = np.diff(calls["slow"])
+        self.assertTrue((gaps >= 0.095).all(), gaps)
+
+    def test_query_errors_reach_the_callback(self):
+        results = []
+        done = threading.Event()
+
+        def failing(topic, frame):
+            raise RuntimeError("model unavailable")
+
+        bridge = GeminiBridge(poll_s=0.01)
+        bridge.add_topic("/cam", failing, callback=lambda r: (results.append(r), done.set()), slot_nbytes=16)
+        with bridge:
+            bridge.publish("/cam", b"frame", stamp=42.0)
+            self.assertTrue(done.wait(2))
+        self.assertEqual((results[0].error, results[0].source_stamp), ("model unavailable", 42.0))
+
+
+@unittest.skipIf(genai is None, "google-genai is not installed")
+class TestSpatialQueryFunction(unittest.TestCase):
+    def test_frames_are_encoded_and_detections_parsed(self):
+        from examples import gemini_client
+        from ros2_gemini_bridge.gemini_query import make_spatial_query
+
+        ring = FrameRing(capacity=2, slot_nbytes=480 * 640 * 3)
+        ring.write(synthetic_frame(3), stamp=1.0)
+        with MockGeminiServer() as server:
+            gemini_client.set_client(
+                genai.Client(api_key="mock", http_options=types.HttpOptions(base_url=server.base_url)))
+            try:
+                with ring.acquire_latest() as ref:
+                    detections = make_spatial_query("Detect robots.", max_edge=320)("/cam", ref)
+            finally:
+                gemini_client.reset_client()
+            # 320 px JPEG of a mostly flat frame, far below the raw 900 KB
+            self.assertLess(server.stats()["bytes_received"], 40_000)
+        self.assertEqual(detections[0]["label"], "robot")
+
+    def test_queries_go_through_the_scheduler(self):
+        from examples import gemini_client
+        from examples.instrumentation import Telemetry, set_telemetry
+        from examples.scheduler import RequestScheduler, set_scheduler
+        from ros2_gemini_bridge.gemini_query import make_spatial_query
+
+        scheduler, telemetry = RequestScheduler(), Telemetry()
+        set_scheduler(scheduler)
+        set_telemetry(telemetry)
+        ring = FrameRing(capacity=2, slot_nbytes=120 * 160 * 3)
+        ring.write(synthetic_frame(1, shape=(120, 160, 3)), stamp=1.0)
+        with MockGeminiServer() as server:
+            gemini_client.set_client(
+                genai.Client(api_key="mock", http_options=types.HttpOptions(base_url=server.base_url)))
+            try:
+                query = make_spatial_query("Detect robots.")
+                for topic in ("/front", "/front", "/rear"):
+                    with ring.acquire_latest() as ref:
+                        query(topic, ref)
+            finally:
+                gemini_client.reset_client()
+                set_scheduler(None)
+                set_telemetry(None)
+
+        stats = scheduler.stats()
+        self.assertEqual(stats["admitted"], 3)
+        self.assertEqual(stats["wait"]["perception"]["admitted"], 3)
+        self.assertEqual(stats["grants_by_robot"], {"/front": 2, "/rear": 1})
+        self.assertEqual(len(telemetry.records("perception")), 3)
+        for record in telemetry.records("perception"):
+            self.assertIn("queue", record.spans)
+            self.assertIn("model", record.spans)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,271 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from examples.mock_gemini_server import MockGeminiServer
+from examples.scheduler import DeadlineExceeded, RequestScheduler, TokenBucket, is_transient, robot_scope, set_scheduler
+
+try:
+    from google import genai
+    from google.genai import types
+except ImportError:
+    genai = None
+
+
+class ApiError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail(code):
+    raise ApiError(code)
+
+
+def response_with_tokens(total):
+    return SimpleNamespace(usage_metadata=SimpleNamespace(total_token_count=total))
+
+
+def wait_for(predicate, timeout_s=5.0):
+    deadline = time.monotonic() + timeout_s
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.005)
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_refills_continuously_up_to_burst(self):
+        clock = FakeClock()
+        bucket = TokenBucket(per_minute=60, burst_s=2.0, clock=clock)
+        self.assertEqual(bucket.wait_time(2), 0.0)
+        bucket.take(2)
+        self.assertAlmostEqual(bucket.wait_time(1), 1.0)
+        clock.now += 10
+        self.assertEqual(bucket.level, 0.0)
+        bucket.wait_time(0)
+        self.assertEqual(bucket.level, 2.0)
+        # More than the burst waits for a full bucket instead of forever
+        bucket.take(5)
+        self.assertAlmostEqual(bucket.wait_time(100), 5.0)
+
+
+class TestRequestScheduler(unittest.TestCase):
+    def _hold_slot(self, scheduler):
+        """Occupies the only in-flight slot until the returned event is set."""
+        release, started = threading.Event(), threading.Event()
+
+        def fn():
+            started.set()
+            release.wait(5)
+
+        thread = threading.Thread(target=scheduler.call, args=(fn, "perception"))
+        thread.start()
+        started.wait(5)
+        return release, thread
+
+    def _queue(self, scheduler, order, calls):
+        threads = []
+        for capability, robot_id in calls:
+            def fn(tag=(capability, robot_id)):
+                order.append(tag)
+            threads.append(threading.Thread(target=scheduler.call, args=(fn, capability),
+                                            kwargs={"robot_id": robot_id}))
+            threads[-1].start()
+            wait_for(lambda: sum(scheduler.queue_depth().values()) == len(threads))
+        return threads
+
+    def test_safety_goes_before_planning_before_perception(self):
+        scheduler = RequestScheduler(max_in_flight=1)
+        release, holder = self._hold_slot(scheduler)
+        order = []
+        threads = self._queue(scheduler, order, [("perception", None), ("planning", None), ("video", None)])
+        self.assertEqual(scheduler.queue_depth(), {"safety": 1, "planning": 1, "perception": 1})
+        release.set()
+        for t in threads + [holder]:
+            t.join(5)
+        self.assertEqual([c for c, _ in order], ["video", "planning", "perception"])
+        self.assertEqual(scheduler.stats()["max_queue_depth"], 3)
+
+    def test_robots_take_turns_within_a_priority(self):
+        scheduler = RequestScheduler(max_in_flight=1)
+        with robot_scope("amr-1"):
+            release, holder = self._hold_slot(scheduler)
+        order = []
+        threads = self._queue(scheduler, order, [("perception", "amr-1")] * 3 + [("perception", "amr-2")])
+        release.set()
+        for t in threads + [holder]:
+            t.join(5)
+        self.assertEqual([r for _, r in order], ["amr-1", "amr-2", "amr-1", "amr-1"])
+
+    def test_rpm_budget_paces_requests(self):
+        scheduler = RequestScheduler(rpm=600, burst_s=0.1)
+        start = time.monotonic()
+        for _ in range(4):
+            scheduler.call(lambda: None, "perception")
+        # One request per 100 ms after the first
+        self.assertGreater(time.monotonic() - start, 0.25)
+        self.assertGreater(scheduler.stats()["wait"]["perception"]["max_s"], 0.05)
+
+    def test_token_estimate_is_settled_from_usage(self):
+        clock = FakeClock()
+        scheduler = RequestScheduler(tpm=6000, default_tokens=1000, clock=clock)
+        scheduler.call(lambda: response_with_tokens(4000), "planning")
+        self.assertEqual(scheduler.stats()["tokens_available"], 2000)
+        scheduler.call(lambda: response_with_tokens(200), "planning", tokens=1500)
+        self.assertEqual(scheduler.stats()["tokens_available"], 1800)
+        with self.assertRaises(ApiError):
+            scheduler.call(lambda: fail(400), "planning", tokens=1000)
+        # A failed request gives its estimate back
+        self.assertEqual(scheduler.stats()["tokens_available"], 1800)
+
+    def test_deadline_fails_fast_when_budget_cannot_arrive_in_time(self):
+        scheduler = RequestScheduler(rpm=6, burst_s=10)
+        scheduler.call(lambda: None, "perception")
+        calls = []
+        start = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            scheduler.call(lambda: calls.append(1), "planning", deadline_s=1.0)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(calls, [])
+        self.assertEqual(scheduler.stats()["deadline_exceeded"], 1)
+        self.assertEqual(scheduler.queue_depth(), {"safety": 0, "planning": 0, "perception": 0})
+
+    def test_transient_errors_are_retried_with_backoff(self):
+        scheduler = RequestScheduler(max_attempts=4, backoff_s=0.01, seed=1)
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise ApiError(503)
+            return "ok"
+
+        self.assertEqual(scheduler.call(flaky, "planning"), "ok")
+        self.assertEqual(scheduler.stats()["retries"], 2)
+        with self.assertRaises(ApiError):
+            scheduler.call(lambda: fail(400), "planning")
+        self.assertEqual(scheduler.stats()["retries"], 2)
+
+    def test_only_transient_httpx_errors_are_retried(self):
+        import httpx
+
+        request = httpx.Request("POST", "https://example.invalid/v1")
+
+        def status_error(code):
+            return httpx.HTTPStatusError("", request=request, response=httpx.Response(code, request=request))
+
+        self.assertTrue(is_transient(httpx.ReadTimeout("slow", request=request)))
+        self.assertTrue(is_transient(httpx.ConnectError("refused", request=request)))
+        self.assertTrue(is_transient(status_error(503)))
+        for error in (status_error(400), status_error(401), status_error(403), httpx.InvalidURL("bad")):
+            self.assertFalse(is_transient(error), error)
+
+    def test_retries_stop_at_the_deadline(self):
+        scheduler = RequestScheduler(max_attempts=10, backoff_s=0.2, max_backoff_s=0.2, seed=1)
+        attempts = []
+
+        def unavailable():
+            attempts.append(1)
+            raise ApiError(503)
+
+        with self.assertRaises(ApiError):
+            scheduler.call(unavailable, "safety", deadline_s=0.3)
+        self.assertLess(len(attempts), 4)
+
+    def test_slow_calls_are_hedged(self):
+        scheduler = RequestScheduler(hedge_after_s=0.05)
+        calls = []
+
+        def slow_first():
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(0.5)
+                return "primary"
+            return "hedge"
+
+        start = time.monotonic()
+        self.assertEqual(scheduler.call(slow_first, "planning"), "hedge")
+        self.assertLess(time.monotonic() - start, 0.4)
+        stats = scheduler.stats()
+        self.assertEqual((stats["hedges"], stats["hedge_wins"]), (1, 1))
+        self.assertEqual(scheduler.call(lambda: "fast", "planning"), "fast")
+        self.assertEqual(scheduler.stats()["hedges"], 1)
+
+    def test_async_calls_share_the_budget(self):
+        scheduler = RequestScheduler(max_in_flight=2, hedge_after_s=0.05)
+        in_flight = []
+
+        async def request(i):
+            in_flight.append(scheduler.stats()["in_flight"])
+            await asyncio.sleep(0.01)
+            return i
+
+        async def main():
+            return await asyncio.gather(*[scheduler.acall(lambda i=i: request(i), "perception") for i in range(6)])
+
+        self.assertEqual(asyncio.run(main()), list(range(6)))
+        self.assertLessEqual(max(in_flight), 2)
+        self.assertEqual(scheduler.stats()["admitted"], 6)
+
+    def test_prometheus_text(self):
+        scheduler = RequestScheduler()
+        scheduler.call(lambda: None, "planning")
+        text = scheduler.prometheus_text()
+        self.assertIn('gemini_scheduler_queue_depth{priority="safety"} 0', text)
+        self.assertIn('gemini_scheduler_wait_seconds_count{capability="planning"} 1', text)
+
+
+@unittest.skipIf(genai is None, "google-genai is not installed")
+class TestSchedulerIntegration(unittest.TestCase):
+    def setUp(self):
+        from examples import gemini_client
+        from examples.instrumentation import Telemetry, set_telemetry
+
+        self.gemini_client = gemini_client
+        self.telemetry = Telemetry()
+        set_telemetry(self.telemetry)
+        self.scheduler = RequestScheduler(tpm=100_000, clock=FakeClock())
+        set_scheduler(self.scheduler)
+        self.server = MockGeminiServer(response_text='[{"action": "move_to", "target": "table"}]').start()
+        gemini_client.set_client(
+            genai.Client(api_key="mock", http_options=types.HttpOptions(base_url=self.server.base_url)))
+
+    def tearDown(self):
+        from examples.instrumentation import set_telemetry
+
+        self.server.stop()
+        self.gemini_client.reset_client()
+        set_scheduler(None)
+        set_telemetry(None)
+
+    def test_call_sites_go_through_the_scheduler(self):
+        from examples.task_decomposition import plan_mission, plan_mission_stream
+
+        plan_mission("Go to the table")
+        list(plan_mission_stream("Go to the table"))
+        self.assertEqual(self.scheduler.stats()["admitted"], 2)
+        for record in self.telemetry.records("planning"):
+            self.assertIn("queue", record.spans)
+            self.assertIn("model", record.spans)
+        # Both estimates were replaced by the usage the mock reported
+        used = sum(r.tokens["total"] for r in self.telemetry.records("planning"))
+        self.assertAlmostEqual(self.scheduler.stats()["tokens_available"], 100_000 - used)
+
+
+if __name__ == '__main__':
+    unittest.main()
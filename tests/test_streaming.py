@@ -0,0 +1,76 @@
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from google import genai
+from google.genai import types
+
+from examples.mock_gemini_server import MockGeminiServer
+from examples.streaming import JSONArrayStreamParser, StreamStats, iter_json_items, stream_items
+
+RESPONSE = '''Here is the plan:
+```json
+[
+  {"action": "move_to", "target": "table [kitchen]"},
+  {"action": "find_object", "target": "say \\"hi\\" {x}"},
+  {"action": "pick_object", "target": "apple"}
+]
+```'''
+
+
+class TestJSONArrayStreamParser(unittest.TestCase):
+    def test_character_by_character(self):
+        items = list(iter_json_items(iter(RESPONSE)))
+        self.assertEqual([i["action"] for i in items], ["move_to", "find_object", "pick_object"])
+        self.assertEqual(items[0]["target"], "table [kitchen]")
+        self.assertEqual(items[1]["target"], 'say "hi" {x}')
+
+    def test_items_emitted_before_array_closes(self):
+        parser = JSONArrayStreamParser()
+        self.assertEqual(parser.feed('```json\n[{"point": [1, 2]}, {"poi'), [{"point": [1, 2]}])
+        self.assertEqual(parser.feed('nt": [3, 4]}]\n```'), [{"point": [3, 4]}])
+        self.assertTrue(parser.done)
+        self.assertEqual(parser.feed("[1]"), [])
+
+    def test_empty_and_scalar_arrays(self):
+        self.assertEqual(list(iter_json_items(["[", "]"])), [])
+        self.assertEqual(list(iter_json_items(["[1, ", '"a,b"', ", 3]"])), [1, "a,b", 3])
+
+    def test_brackets_in_the_preamble_are_skipped(self):
+        text = 'Here is [the] plan for [ robot 2 ]:\n```json\n[\n  {"action": "open_gripper"}\n]\n```'
+        self.assertEqual(list(iter_json_items(iter(text))), [{"action": "open_gripper"}])
+        self.assertEqual(list(iter_json_items([text])), [{"action": "open_gripper"}])
+
+    def test_next_bracket_is_tried_when_the_first_does_not_parse(self):
+        chunks = ["See [1 below", "] and [-a, b]. ", 'Plan: [{"action": "move_to", ', '"target": "table"}]']
+        self.assertEqual(list(iter_json_items(chunks)), [{"action": "move_to", "target": "table"}])
+
+    def test_numeric_prose_does_not_hide_the_plan(self):
+        text = 'See [1] below. Plan: [{"action": "open_gripper"}]'
+        self.assertEqual(list(iter_json_items([text])), [{"action": "open_gripper"}])
+        self.assertEqual(list(iter_json_items(iter(text))), [{"action": "open_gripper"}])
+        # A fenced block wins even when it only holds scalars
+        fenced = 'Steps [1, 2] were skipped.\n```json\n["move_to(table)", "open_gripper()"]\n```'
+        self.assertEqual(list(iter_json_items(iter(fenced))), ["move_to(table)", "open_gripper()"])
+        # With nothing better, the scalar array is returned once the stream ends
+        parser = JSONArrayStreamParser()
+        self.assertEqual(parser.feed("Scores: [0.9, 0.4]. Done"), [])
+        self.assertEqual(parser.close(), [0.9, 0.4])
+
+
+class TestStreamItems(unittest.TestCase):
+    def test_streams_from_generate_content_stream(self):
+        with MockGeminiServer(response_text=RESPONSE, stream_chunk_chars=7) as server:
+            client = genai.Client(api_key="mock", http_options=types.HttpOptions(base_url=server.base_url))
+            stats = StreamStats()
+            items = list(stream_items(client, "gemini-robotics-er-1.5-preview", "plan", stats=stats))
+
+        self.assertEqual(len(items), 3)
+        self.assertEqual(stats.items, 3)
+        self.assertLessEqual(stats.time_to_first_item_s, stats.total_s)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 import os
 import sys
+from unittest import mock
 
 # Add examples to path so we can import them
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -21,5 +22,16 @@ class TestExamples(unittest.TestCase):
         """Ensure requirements.txt is present for users."""
         self.assertTrue(os.path.exists("requirements.txt"))
 
+    def test_missing_dependency_is_not_hidden_by_the_fallback_import(self):
+        import cli
+
+        missing = ModuleNotFoundError("No module named 'cv2'", name="cv2")
+        with mock.patch.object(cli.importlib, "import_module", side_effect=missing) as import_module:
+            with self.assertRaises(ModuleNotFoundError) as ctx:
+                cli.load_capability("video_anomaly_detection")
+        self.assertEqual(ctx.exception.name, "cv2")
+        self.assertEqual(import_module.call_count, 1)
+        self.assertEqual(cli.load_capability("overlay").__name__, "examples.overlay")
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,109 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from examples.thinking_budget import BudgetPolicy, ThinkingBudgetController, classify_prompt
+from examples.mock_gemini_server import MockGeminiServer
+
+try:
+    from google import genai
+    from google.genai import types
+except ImportError:
+    genai = None
+
+
+class TestThinkingBudgetController(unittest.TestCase):
+    def setUp(self):
+        self.controller = ThinkingBudgetController(alpha=1.0)
+
+    def test_classify_prompt(self):
+        self.assertEqual(classify_prompt('Return [{"box_2d": [...]}]'), "boxes")
+        self.assertEqual(classify_prompt("Point to the mug handle."), "pointing")
+
+    def test_over_slo_halves_budget_down_to_minimum(self):
+        budgets = []
+        for _ in range(6):
+            decision = self.controller.choose("planning")
+            budgets.append(decision.budget)
+            self.controller.record(decision, latency_s=20.0, valid=True)
+        self.assertEqual(budgets, [1024, 512, 256, 128, 128, 128])
+
+    def test_invalid_output_with_headroom_grows_budget(self):
+        decision = self.controller.choose("pointing")
+        self.assertEqual(decision.budget, 0)
+        entry = self.controller.record(decision, latency_s=0.3, valid=False)
+        self.assertEqual((entry["adjustment"], entry["next_budget"]), ("increase", 128))
+
+        decision = self.controller.choose("pointing")
+        self.controller.record(decision, latency_s=0.3, valid=True)
+        self.assertEqual(self.controller.choose("pointing").budget, 128)
+
+    def test_invalid_output_near_target_holds(self):
+        decision = self.controller.choose("boxes")
+        entry = self.controller.record(decision, latency_s=2.5, valid=False)
+        self.assertEqual(entry["adjustment"], "hold")
+
+    def test_tight_deadline_falls_back_to_zero_without_moving_policy(self):
+        decision = self.controller.choose("safety", deadline_s=2.0)
+        self.assertEqual((decision.budget, decision.reason), (0, "deadline"))
+        entry = self.controller.record(decision, latency_s=5.0, valid=True)
+        self.assertEqual(entry["next_budget"], 1024)
+        self.assertEqual(self.controller.stats()["safety"]["deadline_fallbacks"], 1)
+
+        # Once 1024 is known to be fast enough, the deadline no longer forces a fallback
+        decision = self.controller.choose("safety")
+        self.controller.record(decision, latency_s=1.0, valid=True)
+        self.assertEqual(self.controller.choose("safety", deadline_s=2.0).budget, 1024)
+
+    def test_policy_without_zero_fallback_uses_minimum(self):
+        controller = ThinkingBudgetController(
+            policies={"planning": BudgetPolicy(1024, 256, 4096, 5.0, zero_fallback=False)})
+        self.assertEqual(controller.choose("planning", deadline_s=1.0).budget, 256)
+
+    def test_audit_log_jsonl(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "audit.jsonl")
+            controller = ThinkingBudgetController(audit_path=path)
+            controller.record(controller.choose("boxes"), latency_s=1.0, valid=True, thinking_tokens=200)
+            with open(path) as f:
+                entry = json.loads(f.readline())
+        self.assertEqual(entry["query_class"], "boxes")
+        self.assertEqual(entry["budget"], 256)
+        self.assertEqual(entry["thinking_tokens"], 200)
+        self.assertEqual(controller.audit_log("boxes")[0], entry)
+
+    def test_unknown_class_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.controller.choose("dancing")
+
+
+@unittest.skipIf(genai is None, "google-genai is not installed")
+class TestPlannerBudget(unittest.TestCase):
+    def setUp(self):
+        from examples import gemini_client
+
+        self.gemini_client = gemini_client
+        self.server = MockGeminiServer(response_text='[{"action": "teleport", "target": "moon"}]').start()
+        gemini_client.set_client(
+            genai.Client(api_key="mock", http_options=types.HttpOptions(base_url=self.server.base_url)))
+
+    def tearDown(self):
+        self.server.stop()
+        self.gemini_client.reset_client()
+
+    def test_invalid_plans_raise_the_planning_budget(self):
+        from examples.task_decomposition import plan_mission
+
+        controller = ThinkingBudgetController()
+        plan_mission("Go to the moon", budget_controller=controller)
+        entry = controller.audit_log("planning")[0]
+        self.assertFalse(entry["valid"])
+        self.assertEqual((entry["budget"], entry["next_budget"]), (1024, 2048))
+
+
+if __name__ == '__main__':
+    unittest.main()
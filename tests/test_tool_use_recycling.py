@@ -0,0 +1,131 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from examples.mock_gemini_server import MockGeminiServer
+from examples.response_cache import ResponseCache
+
+try:
+    from google import genai
+    from google.genai import types
+except ImportError:
+    genai = None
+
+TOOL_TURN = [
+    {"functionCall": {"name": "mock_search_tool", "args": {"query": "Is #5 plastic recyclable?"}}},
+    {"functionCall": {"name": "lookup_resin_code", "args": {"code": 5}}},
+]
+RESPONSES = [("functionResponse", "Recycling: #5 PP is accepted curbside."), ("recycling robot", TOOL_TURN)]
+
+
+@unittest.skipIf(genai is None, "google-genai is not installed")
+class TestToolRegistry(unittest.TestCase):
+    def setUp(self):
+        from examples.tool_use_recycling import ToolRegistry
+
+        self.calls = []
+        self.registry = ToolRegistry()
+        self.registry.register(self.slow_search, "search", {"query": {"type": "string"}})
+        self.registry.register(self.slow_lookup, "lookup", {"code": {"type": "integer"}})
+
+    def tearDown(self):
+        self.registry.close()
+
+    def slow_search(self, query):
+        self.calls.append(("search", query))
+        time.sleep(0.2)
+        return f"result for {query}"
+
+    def slow_lookup(self, code):
+        self.calls.append(("lookup", code))
+        time.sleep(0.2)
+        return {"code": code}
+
+    def test_calls_from_one_turn_run_concurrently(self):
+        start = time.perf_counter()
+        results = self.registry.dispatch([("slow_search", {"query": "a"}), ("slow_lookup", {"code": 5})])
+        self.assertLess(time.perf_counter() - start, 0.35)
+        self.assertEqual([r.result for r in results], ["result for a", {"code": 5}])
+        self.assertTrue(all(r.wall_s >= 0.2 for r in results))
+
+    def test_normalized_arguments_hit_the_cache(self):
+        self.registry.dispatch([("slow_search", {"query": "Is #5 plastic recyclable?"})])
+        (again,) = self.registry.dispatch([("slow_search", {"query": "  is #5   PLASTIC recyclable"})])
+        self.assertTrue(again.cached)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_cache_entries_expire(self):
+        from examples.tool_use_recycling import ToolRegistry
+
+        registry = ToolRegistry(cache=ResponseCache(ttl_s=0.05))
+        registry.register(self.slow_lookup, "lookup", {"code": {"type": "integer"}})
+        registry.dispatch([("slow_lookup", {"code": 1})])
+        time.sleep(0.1)
+        (again,) = registry.dispatch([("slow_lookup", {"code": 1})])
+        self.assertFalse(again.cached)
+        self.assertEqual(len(self.calls), 2)
+        registry.close()
+
+    def test_concurrent_decisions_share_one_running_call(self):
+        threads = [threading.Thread(target=self.registry.dispatch, args=([("slow_search", {"query": "x"})],))
+                   for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(self.calls), 1)
+
+    def test_timeout_and_unknown_tools_report_errors(self):
+        slow, unknown = self.registry.dispatch([("slow_search", {"query": "q"}), ("nope", {})], timeout=0.05)
+        self.assertIn("timed out", slow.error)
+        self.assertIn("Unknown tool", unknown.error)
+
+
+@unittest.skipIf(genai is None, "google-genai is not installed")
+class TestAgentLoop(unittest.TestCase):
+    def setUp(self):
+        from examples import tool_use_recycling
+
+        self.module = tool_use_recycling
+        self.original_latency = tool_use_recycling.SEARCH_LATENCY_S
+        tool_use_recycling.SEARCH_LATENCY_S = 0.2
+
+    def tearDown(self):
+        self.module.SEARCH_LATENCY_S = self.original_latency
+
+    def client(self, server):
+        return genai.Client(api_key="mock", http_options=types.HttpOptions(base_url=server.base_url))
+
+    def test_tool_calls_are_dispatched_and_answered(self):
+        registry = self.module.ToolRegistry()
+        registry.register(self.module.mock_search_tool, "search", {"query": {"type": "string"}})
+        registry.register(self.module.lookup_resin_code, "resin", {"code": {"type": "integer"}})
+        with MockGeminiServer(responses=RESPONSES) as server:
+            first = self.module.decide("Tub with #5", registry=registry, client=self.client(server))
+            second = self.module.decide("Lid with #5", registry=registry, client=self.client(server))
+
+        self.assertEqual(first.decision, "Recycling: #5 PP is accepted curbside.")
+        self.assertEqual(first.turns, 2)
+        self.assertEqual([c.name for c in first.tool_calls], ["mock_search_tool", "lookup_resin_code"])
+        self.assertEqual(first.tool_calls[1].result, {"code": 5, "resin": "PP", "curbside": True})
+        self.assertGreaterEqual(first.tool_s, 0.2)
+        self.assertGreater(first.model_s, 0)
+        # The second item's lookups are served from the TTL cache
+        self.assertTrue(all(c.cached for c in second.tool_calls))
+        self.assertLess(second.tool_s, 0.05)
+        registry.close()
+
+    def test_deadline_falls_back_to_manual_sort(self):
+        with MockGeminiServer(responses=RESPONSES, latency_s=0.5) as server:
+            decision = self.module.decide("Tub with #5", client=self.client(server), deadline_s=0.2)
+        self.assertTrue(decision.deadline_exceeded)
+        self.assertEqual(decision.decision, self.module.FALLBACK_DECISION)
+        self.assertLess(decision.total_s, 0.45)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from examples.tracker import DetectionTracker, box_iou, greedy_match
+
+
+def robot_at(x, label="robot"):
+    return {"box_2d": [400, x, 600, x + 100], "label": label}
+
+
+class TestMatching(unittest.TestCase):
+    def test_box_iou(self):
+        a = np.array([[0, 0, 100, 100]], dtype=np.float32)
+        b = np.array([[0, 0, 100, 100], [0, 50, 100, 150], [200, 200, 300, 300]], dtype=np.float32)
+        np.testing.assert_allclose(box_iou(a, b), [[1.0, 1 / 3, 0.0]], atol=1e-6)
+
+    def test_greedy_match_takes_best_pairs_first(self):
+        scores = np.array([[0.9, 0.8], [0.85, 0.1]])
+        self.assertEqual(greedy_match(scores, 0.3), [(0, 0)])
+        self.assertEqual(greedy_match(scores, 0.05), [(0, 0), (1, 1)])
+
+
+class TestDetectionTracker(unittest.TestCase):
+    def test_ids_are_stable_while_objects_move(self):
+        tracker = DetectionTracker()
+        first = tracker.update([robot_at(100), robot_at(700, "human")], t=0.0)
+        ids = {d["label"]: d["track_id"] for d in first}
+        for step in range(1, 6):
+            tracked = tracker.update([robot_at(700 - step * 20, "human"), robot_at(100 + step * 20)], t=step * 0.5)
+            self.assertEqual({d["track_id"] for d in tracked}, set(ids.values()))
+            self.assertIn(f"robot #{ids['robot #1']}", [d["label"] for d in tracked])
+        self.assertEqual(tracker.tracks_started, 2)
+
+    def test_labels_do_not_mix(self):
+        tracker = DetectionTracker()
+        tracker.update([robot_at(100)], t=0.0)
+        tracked = tracker.update([robot_at(100, "human")], t=0.5)
+        self.assertEqual(sorted(d["track_id"] for d in tracked), [1, 2])
+
+    def test_predicts_constant_velocity_between_model_calls(self):
+        tracker = DetectionTracker(velocity_smoothing=1.0)
+        tracker.update([robot_at(100)], t=0.0)
+        tracker.update([robot_at(150)], t=1.0)
+        (predicted,) = tracker.predict(t=1.5)
+        self.assertEqual(predicted["box_2d"], [400.0, 175.0, 600.0, 275.0])
+        self.assertTrue(predicted["predicted"])
+        self.assertLess(predicted["confidence"], 1.0)
+
+    def test_points_match_by_distance(self):
+        tracker = DetectionTracker(max_point_distance=50)
+        tracker.update([{"point": [500, 500], "label": "handle"}], t=0.0)
+        near = tracker.update([{"point": [510, 530], "label": "handle"}], t=0.2)
+        self.assertEqual([d["track_id"] for d in near], [1])
+        far = tracker.update([{"point": [900, 100], "label": "handle"}], t=0.4)
+        self.assertIn(2, [d["track_id"] for d in far])
+
+    def test_unseen_tracks_are_dropped_after_max_misses(self):
+        tracker = DetectionTracker(max_misses=1)
+        tracker.update([robot_at(100)], t=0.0)
+        self.assertEqual(len(tracker.update([], t=0.5)), 1)
+        self.assertEqual(len(tracker.update([], t=1.0)), 0)
+        self.assertEqual(tracker.tracks_ended, 1)
+
+    def test_confidence_decay_requests_refresh(self):
+        tracker = DetectionTracker(half_life_s=1.0, refresh_confidence=0.5, max_predict_s=10.0)
+        self.assertEqual(tracker.refresh_reason(t=0.0), "no model result yet")
+        tracker.update([robot_at(100)], t=0.0)
+        self.assertIsNone(tracker.refresh_reason(t=0.9))
+        self.assertEqual(tracker.refresh_reason(t=1.1), "confidence decayed")
+
+    def test_process_calls_the_model_every_nth_frame(self):
+        tracker = DetectionTracker(max_predicted_frames=4, half_life_s=100.0)
+        calls = []
+
+        def query(frame):
+            calls.append(frame)
+            return [robot_at(100 + frame * 10)]
+
+        for frame in range(15):
+            tracker.process(frame, query, t=frame / 30)
+        self.assertEqual(calls, [0, 5, 10])
+        self.assertAlmostEqual(tracker.stats()["model_call_rate"], 3 / 15)
+
+    def test_output_renders_with_visualize_results(self):
+        from examples.basic_spatial_query import visualize_results
+
+        tracker = DetectionTracker()
+        tracker.update([robot_at(100), {"point": [500, 500], "label": "handle"}], t=0.0)
+        image = Image.new("RGB", (200, 100), "black")
+        annotated = visualize_results(image, None, output_path=None, detections=tracker.predict(t=0.1))
+        self.assertGreater(np.asarray(annotated).sum(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+import numpy as np
+from google import genai
+from google.genai import types
+
+from examples import video_anomaly_detection as vad
+from examples.detection_store import DetectionStore
+from examples.gemini_client import reset_client, set_client
+from examples.mock_gemini_server import MockGeminiServer
+
+
+class TestVideoWindows(unittest.TestCase):
+    def test_overlapping_windows_cover_timeline(self):
+        frames = ((float(t), b"") for t in range(100))
+        windows = list(vad.iter_windows(frames, window_s=30, overlap_s=10))
+
+        self.assertEqual([(w.start_s, w.end_s) for w in windows[:3]], [(0, 30), (20, 50), (40, 70)])
+        self.assertEqual([ts for ts, _ in windows[1].frames][:2], [20.0, 21.0])
+        self.assertEqual(windows[-1].frames[-1][0], 99.0)
+
+    def test_merge_dedupes_across_overlap(self):
+        window_a = vad.VideoWindow(0, 0.0, 30.0)
+        window_b = vad.VideoWindow(1, 20.0, 50.0)
+        violations = (
+            vad.window_violations(window_a, '{"violations": [{"offset_s": 25, "rule": "2", "reason": "Human in red zone"}]}')
+            + vad.window_violations(window_b, '{"violations": [{"offset_s": "00:06", "rule": "2", "reason": "Person inside red zone"},'
+                                              ' {"offset_s": 20, "rule": "1", "reason": "Arm too fast"}]}')
+        )
+        merged = vad.merge_violations(violations, tolerance_s=3)
+
+        self.assertEqual([v["timestamp"] for v in merged], ["00:00:25", "00:00:40"])
+        self.assertEqual(merged[0]["windows"], [0, 1])
+
+    def test_distinct_same_rule_events_stay_separate(self):
+        window_a = vad.VideoWindow(0, 0.0, 30.0)
+        window_b = vad.VideoWindow(1, 20.0, 50.0)
+        violations = (
+            vad.window_violations(window_a, '{"violations": ['
+                                            '{"offset_s": 5, "rule": "2", "reason": "Operator reaches into the red zone"},'
+                                            ' {"offset_s": 8, "rule": "2", "reason": "Forklift parked in the red zone"},'
+                                            ' {"offset_s": 10, "rule": "2", "reason": "forklift parked in the  red zone"},'
+                                            ' {"offset_s": 18, "rule": "3", "reason": "Pallet blocks exit"}]}')
+            + vad.window_violations(window_b, '{"violations": [{"offset_s": 1, "rule": "3", "reason": "Cart left by door"}]}')
+        )
+        merged = vad.merge_violations(violations, tolerance_s=5)
+
+        # The repeated forklift report is one incident; the rest are separate events
+        self.assertEqual([v["timestamp"] for v in merged], ["00:00:05", "00:00:08", "00:00:18", "00:00:21"])
+        self.assertEqual(merged[1]["windows"], [0, 0])
+
+    def test_timecodes(self):
+        self.assertEqual(vad.parse_timecode("01:02:03"), 3723)
+        self.assertEqual(vad.parse_timecode(4.5), 4.5)
+        self.assertEqual(vad.format_timecode(3723.4), "01:02:03")
+
+
+class TestAnalyzeVideoSafety(unittest.TestCase):
+    def test_end_to_end_against_mock_server(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "clip.mp4")
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 10, (64, 48))
+            for _ in range(100):  # 10 seconds
+                writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+            writer.release()
+
+            response = '{"violations": [{"offset_s": 1, "rule": "2", "reason": "Human in red zone"}]}'
+            with MockGeminiServer(response_text=response) as server:
+                set_client(genai.Client(api_key="mock", http_options=types.HttpOptions(base_url=server.base_url)))
+                store = DetectionStore(os.path.join(d, "store"))
+                try:
+                    report = vad.analyze_video_safety(path, "2. No humans in Red Zone.", sample_fps=2,
+                                                      window_s=4, overlap_s=1, max_in_flight=2,
+                                                      store=store, video_start_t=1000.0)
+                finally:
+                    reset_client()
+                logged = store.query(kind="violation")
+
+        self.assertEqual(report["status"], "UNSAFE")
+        # Windows [0, 4), [3, 7) and the trailing [6, 9.5]
+        self.assertEqual(report["windows_analyzed"], 3)
+        self.assertEqual([v["timestamp"] for v in report["violations"]], ["00:00:01", "00:00:04", "00:00:07"])
+        self.assertLessEqual(server.max_in_flight, 2)
+        self.assertEqual(list(logged.t), [1001.0, 1004.0, 1007.0])
+        self.assertEqual(logged[0]["reason"], "Human in red zone")
+
+
+if __name__ == '__main__':
+    unittest.main()